@@ -20,11 +20,13 @@ API handler for Cloudkeep's Barbican
 import falcon
 from barbican.openstack.common import jsonutils as json
 from barbican.common import exception
+from barbican.common import metrics
 from barbican.common import utils
 
 
 LOG = utils.getLogger(__name__)
 MAX_BYTES_REQUEST_INPUT_ACCEPTED = 1000000
+STREAM_CHUNK_SIZE = 65536
 
 
 class ApiResource(object):
@@ -46,36 +48,121 @@ def abort(status=falcon.HTTP_500, message=None, req=None, resp=None):
     raise falcon.HTTPError(status, message)
 
 
-def load_body(req, resp=None, validator=None):
+def _request_too_large(max_bytes, req, resp):
+    LOG.debug("Request body exceeds %s bytes", max_bytes)
+    abort(falcon.HTTP_413,
+          'Request body exceeds {0} bytes'.format(max_bytes), req, resp)
+
+
+@metrics.timed('validation')
+def load_body(req, resp=None, validator=None,
+              max_bytes=MAX_BYTES_REQUEST_INPUT_ACCEPTED):
     """
     Helper function for loading an HTTP request body from JSON into a
     Python dictionary
+
+    Bodies larger than max_bytes are rejected with 413, rather than being
+    truncated, based on their Content-Length if supplied.
     """
+    content_length = req.content_length
+    if content_length is not None and content_length > max_bytes:
+        _request_too_large(max_bytes, req, resp)
+
     try:
-        raw_json = req.stream.read(MAX_BYTES_REQUEST_INPUT_ACCEPTED)
+        raw_json = req.stream.read(max_bytes + 1)
     except IOError:
         LOG.exception("Problem reading request JSON stream.")
         abort(falcon.HTTP_500, 'Read Error', req, resp)
 
+    if len(raw_json) > max_bytes:
+        _request_too_large(max_bytes, req, resp)
+
     try:
         #TODO: Investigate how to get UTF8 format via openstack jsonutils:
         #     parsed_body = json.loads(raw_json, 'utf-8')
         parsed_body = json.loads(raw_json)
     except ValueError:
-        LOG.exception("Problem loading request JSON.")
+        LOG.debug("Problem loading request JSON.")
         abort(falcon.HTTP_400, 'Malformed JSON', req, resp)
 
     if validator:
         try:
             parsed_body = validator.validate(parsed_body)
         except exception.InvalidObject as e:
-            LOG.exception("Failed to validate JSON information")
+            LOG.debug("Failed to validate JSON information")
             abort(falcon.HTTP_400, str(e), req, resp)
         except exception.UnsupportedField as e:
-            LOG.exception("Provided field value is not supported")
+            LOG.debug("Provided field value is not supported")
             abort(falcon.HTTP_400, str(e), req, resp)
         except exception.LimitExceeded as e:
-            LOG.exception("Data limit exceeded")
+            LOG.debug("Data limit exceeded")
             abort(falcon.HTTP_413, str(e), req, resp)
 
     return parsed_body
+
+
+def read_chunks(req, max_bytes, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Generator yielding an HTTP request body in chunks, so that it need not
+    be held in memory all at once.
+
+    :raises: LimitExceeded as soon as the body is known to exceed max_bytes,
+             either from its Content-Length or from the bytes read so far.
+    """
+    remaining = req.content_length
+    if remaining is not None and remaining > max_bytes:
+        raise exception.LimitExceeded()
+
+    total = 0
+    while remaining is None or remaining > 0:
+        if remaining is None:
+            chunk = req.stream.read(chunk_size)
+        else:
+            chunk = req.stream.read(min(chunk_size, remaining))
+            remaining -= len(chunk or b'')
+        if not chunk:
+            break
+
+        total += len(chunk)
+        if total > max_bytes:
+            raise exception.LimitExceeded()
+        yield chunk
+
+
+def parse_byte_range(value, length):
+    """
+    Parses a Range header value for data of the given length.
+
+    Only single byte ranges are supported. Malformed or multiple ranges
+    are ignored, in which case all of the data should be returned.
+
+    :returns: tuple -- the start and stop (exclusive) offsets of the range,
+              or None if there is no range to apply.
+    :raises: RangeNotSatisfiable if the range lies outside the data.
+    """
+    if not value:
+        return None
+
+    unit, _sep, byte_range = value.strip().partition('=')
+    first, sep, last = byte_range.strip().partition('-')
+    if unit.strip().lower() != 'bytes' or not sep or ',' in byte_range:
+        return None
+
+    try:
+        if first:
+            start = int(first)
+            stop = int(last) + 1 if last else length
+            if start < 0 or (last and stop <= start):
+                return None
+        else:
+            suffix_length = int(last)
+            if suffix_length <= 0:
+                raise exception.RangeNotSatisfiable(length=length)
+            start = max(0, length - suffix_length)
+            stop = length
+    except ValueError:
+        return None
+
+    if start >= length:
+        raise exception.RangeNotSatisfiable(length=length)
+    return start, min(stop, length)
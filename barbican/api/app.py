@@ -22,6 +22,7 @@ import falcon
 from barbican.api import resources as res
 from barbican.common import config
 from barbican.crypto import extension_manager as ext
+from barbican.model import repositories
 from barbican.openstack.common import log
 
 
@@ -32,12 +33,16 @@ def create_main_app(global_config, **local_conf):
     config.parse_args()
     log.setup('barbican')
 
+    # Establish the database engine once, up front, for all resources.
+    repositories.configure_db()
+
     # Crypto Plugin Manager
-    crypto_mgr = ext.CryptoExtensionManager()
+    crypto_mgr = ext.get_manager()
 
     # Resources
     versions = res.VersionResource()
     secrets = res.SecretsResource(crypto_mgr)
+    secrets_batch = res.SecretsBatchResource(crypto_mgr)
     secret = res.SecretResource(crypto_mgr)
     orders = res.OrdersResource()
     order = res.OrderResource()
@@ -50,6 +55,8 @@ def create_main_app(global_config, **local_conf):
     api.add_route('/', versions)
     api.add_route('/v1/{keystone_id}/secrets', secrets)
     api.add_route('/v1/{keystone_id}/secrets/{secret_id}', secret)
+    # Routes added later take precedence, so this must follow the above.
+    api.add_route('/v1/{keystone_id}/secrets/batch', secrets_batch)
     api.add_route('/v1/{keystone_id}/orders', orders)
     api.add_route('/v1/{keystone_id}/orders/{order_id}', order)
 
@@ -63,7 +70,9 @@ def create_admin_app(global_config, **local_conf):
     config.parse_args()
 
     versions = res.VersionResource()
+    metrics = res.MetricsResource()
     wsgi_app = api = falcon.API()
     api.add_route('/', versions)
+    api.add_route('/metrics', metrics)
 
     return wsgi_app
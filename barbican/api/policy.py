@@ -19,9 +19,11 @@
 
 import json
 import os.path
+import time
 
 from oslo.config import cfg
 
+from barbican.common import cache
 from barbican.common import exception
 import barbican.openstack.common.log as logging
 from barbican.openstack.common import policy
@@ -33,6 +35,9 @@ policy_opts = [
                help=_('The location of the policy file.')),
     cfg.StrOpt('policy_default_rule', default='default',
                help=_('The default policy to use.')),
+    cfg.IntOpt('policy_reload_interval', default=60,
+               help=_('Seconds between checks of the policy file for '
+                      'changes. Zero checks on every policy evaluation.')),
 ]
 
 CONF = cfg.CONF
@@ -45,23 +50,78 @@ DEFAULT_RULES = {
     'manage_re_key': policy.RoleCheck('role', 'admin'),
 }
 
+# Maximum number of memoized (rule, roles) check results per Enforcer.
+MAX_CACHED_CHECKS = 1024
+
+_ENFORCER = None
+
+
+def get_enforcer():
+    """Returns the shared, process-wide policy Enforcer."""
+    global _ENFORCER
+    if _ENFORCER is None:
+        _ENFORCER = Enforcer()
+    return _ENFORCER
+
+
+def _is_role_only(check, rules, seen=frozenset()):
+    """
+    Returns True if the outcome of the check depends only upon the
+    caller's roles, and hence may be memoized per set of roles.
+    """
+    if isinstance(check, (policy.TrueCheck, policy.FalseCheck,
+                          policy.RoleCheck)):
+        return True
+    if isinstance(check, policy.NotCheck):
+        return _is_role_only(check.rule, rules, seen)
+    if isinstance(check, (policy.AndCheck, policy.OrCheck)):
+        return all(_is_role_only(rule, rules, seen) for rule in check.rules)
+    if isinstance(check, policy.RuleCheck):
+        if check.match in seen or check.match not in rules:
+            return False
+        return _is_role_only(rules[check.match], rules,
+                             seen | set([check.match]))
+    return False
+
 
 class Enforcer(object):
-    """Responsible for loading and enforcing rules"""
+    """Responsible for loading and enforcing rules
+
+    Rules are compiled once and then only re-read if the policy file has
+    changed, which is checked for at most every policy_reload_interval
+    seconds. Results of rules that depend solely on the caller's roles are
+    memoized per (rule, roles) until the rules next change, so that typical
+    checks are pure in-memory operations.
+    """
 
     def __init__(self):
         self.default_rule = CONF.policy_default_rule
         self.policy_path = self._find_policy_file()
         self.policy_file_mtime = None
         self.policy_file_contents = None
+        self.reload_interval = CONF.policy_reload_interval
+        self.next_reload_check = 0
+        self.loaded_rules = None
+        self.rules_obj = None
+        self.role_only_rules = frozenset()
+        self.check_cache = cache.LRUCache(MAX_CACHED_CHECKS)
 
     def set_rules(self, rules):
         """Create a new Rules object based on the provided dict of rules"""
-        rules_obj = policy.Rules(rules, self.default_rule)
-        policy.set_rules(rules_obj)
+        self.rules_obj = policy.Rules(rules, self.default_rule)
+        policy.set_rules(self.rules_obj)
 
     def load_rules(self):
         """Set the rules found in the json file on disk"""
+        if policy._rules is not self.rules_obj:
+            # Rules were replaced elsewhere, so force a reload.
+            self.loaded_rules = None
+
+        now = time.time()
+        if self.loaded_rules is not None and now < self.next_reload_check:
+            return
+        self.next_reload_check = now + self.reload_interval
+
         if self.policy_path:
             rules = self._read_policy_file()
             rule_type = ""
@@ -69,11 +129,19 @@ class Enforcer(object):
             rules = DEFAULT_RULES
             rule_type = "default "
 
+        if rules is self.loaded_rules:
+            return
+
         text_rules = dict((k, str(v)) for k, v in rules.items())
         LOG.debug(_('Loaded %(rule_type)spolicy rules: %(text_rules)s') %
                   locals())
 
         self.set_rules(rules)
+        self.loaded_rules = rules
+        self.role_only_rules = frozenset(
+            name for name, check in rules.items()
+            if _is_role_only(check, rules))
+        self.check_cache.clear()
 
     @staticmethod
     def _find_policy_file():
@@ -92,7 +160,7 @@ class Enforcer(object):
         """
         mtime = os.path.getmtime(self.policy_path)
         if not self.policy_file_contents or mtime != self.policy_file_mtime:
-            LOG.debug(_("Loading policy from %s") % self.policy_path)
+            LOG.debug(_("Loading policy from %s"), self.policy_path)
             with open(self.policy_path) as fap:
                 raw_contents = fap.read()
                 rules_dict = json.loads(raw_contents)
@@ -119,7 +187,20 @@ class Enforcer(object):
             'tenant': context.tenant,
         }
 
-        return policy.check(rule, target, credentials, *args, **kwargs)
+        if rule not in self.role_only_rules:
+            return policy.check(rule, target, credentials, *args, **kwargs)
+
+        key = (rule, frozenset(role.lower() for role in context.roles))
+        result = self.check_cache.get(key)
+        if result is None:
+            result = policy.check(rule, target, credentials)
+            self.check_cache.put(key, result)
+
+        # Raise the requested exception (if any), as policy.check() would.
+        if args and result is False:
+            raise args[0](*args[1:], **kwargs)
+
+        return result
 
     def enforce(self, context, action, target):
         """Verifies that the action is valid on the target in this context.
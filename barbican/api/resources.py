@@ -17,25 +17,106 @@
 API-facing resource controllers.
 """
 
+import base64
+import hashlib
+
 import falcon
+from oslo.config import cfg
 
 from barbican import api
+from barbican.api import serializers
 from barbican.api.policy import Enforcer
 from barbican.common import resources as res
-from barbican.common import utils, validators
-from barbican.crypto.mime_types import augment_fields_with_content_types
+from barbican.common import cache, metrics, utils, validators
 from barbican.model import models
 from barbican.model import repositories as repo
 from barbican.common import exception
 from barbican.crypto import extension_manager as em
 from barbican.openstack.common.gettextutils import _
 from barbican.openstack.common import jsonutils as json
+from barbican.openstack.common import timeutils
 from barbican.queue import get_queue_api
 from barbican.version import __version__
 
 
 LOG = utils.getLogger(__name__)
 
+secret_metadata_cache_opts = [
+    cfg.IntOpt('secret_metadata_cache_max_size', default=1000,
+               help=_('Maximum number of serialized secret metadata '
+                      'documents cached per process.')),
+    cfg.IntOpt('secret_metadata_cache_ttl', default=30,
+               help=_('Seconds a cached secret metadata document is kept. '
+                      'Each use of a document is first revalidated against '
+                      'the database, so this only bounds how long unused '
+                      'documents are held. Zero disables expiry.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(secret_metadata_cache_opts)
+
+_SECRET_METADATA_CACHE = None
+
+# Allowance per secret in a batch creation body for its metadata fields
+#   and JSON syntax, on top of its payload.
+BATCH_SECRET_OVERHEAD_BYTES = 2048
+
+
+def get_secret_metadata_cache():
+    """
+    Returns the process-local cache of secret metadata, keyed by
+    (keystone_id, secret_id). Entries are (ETag, JSON document, version,
+    expiration) tuples, the version being that from _secret_version().
+    """
+    global _SECRET_METADATA_CACHE
+    if _SECRET_METADATA_CACHE is None:
+        _SECRET_METADATA_CACHE = cache.LRUCache(
+            CONF.secret_metadata_cache_max_size,
+            ttl=CONF.secret_metadata_cache_ttl or None)
+    return _SECRET_METADATA_CACHE
+
+
+def max_batch_body_bytes():
+    """
+    Returns the largest batch creation body accepted, which has room for
+    max_secrets_per_batch secrets of max_allowed_secret_in_bytes each.
+    """
+    return CONF.max_secrets_per_batch * (CONF.max_allowed_secret_in_bytes +
+                                         BATCH_SECRET_OVERHEAD_BYTES)
+
+
+def _secret_etag(secret):
+    """
+    Returns a strong ETag for the secret's metadata, which changes whenever
+    the secret is updated or has data added to it.
+    """
+    tag = hashlib.sha1(str(secret.id))
+    tag.update(str(secret.updated_at))
+    for datum in secret.encrypted_data or ():
+        tag.update(str(datum.id))
+    return '"{0}"'.format(tag.hexdigest())
+
+
+def _secret_version(secret):
+    """
+    Returns the version of a secret's metadata, as compared against
+    SecretRepo.get_version() to revalidate cached documents.
+    """
+    return (secret.updated_at, len(secret.encrypted_data or ()))
+
+
+def _etag_matches(etag, if_none_match):
+    """Tests an ETag against an If-None-Match header value."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == '*' or candidate == etag:
+            return True
+    return False
+
 
 def _general_failure(message, req, resp):
     """Throw exception a general processing failure."""
@@ -117,6 +198,13 @@ def _failed_to_decrypt_data(req, resp):
               _("Problem decrypting secret information."), req, resp)
 
 
+def _range_not_satisfiable(req, resp):
+    """Throw exception indicating the requested byte range is invalid."""
+    api.abort(falcon.HTTP_416,
+              _("The requested range does not overlap the secret's data."),
+              req, resp)
+
+
 def _secret_already_has_data(req, resp):
     """
     Throw exception that the secret already has data.
@@ -125,6 +213,32 @@ def _secret_already_has_data(req, resp):
               _("Secret already has data, cannot modify it."), req, resp)
 
 
+def _invalid_paging_marker(req, resp):
+    """Throw exception indicating the paging marker is malformed."""
+    api.abort(falcon.HTTP_400, _('Invalid paging marker.'), req, resp)
+
+
+def _secret_ids_missing(req, resp):
+    """Throw exception indicating no secret IDs were requested."""
+    api.abort(falcon.HTTP_400,
+              _("One or more secret IDs must be supplied via 'ids'."),
+              req, resp)
+
+
+def _too_many_secret_ids(req, resp):
+    """Throw exception indicating too many secret IDs were requested."""
+    api.abort(falcon.HTTP_413,
+              _("No more than {0} secrets may be requested at "
+                "once.").format(CONF.max_secrets_per_batch), req, resp)
+
+
+def _order_queue_full(req, resp):
+    """Throw exception indicating orders cannot be accepted currently."""
+    api.abort(falcon.HTTP_503,
+              _("Too many orders are being processed, please retry "
+                "later."), req, resp)
+
+
 def _secret_not_in_order(req, resp):
     """
     Throw exception that secret information is not available in the order.
@@ -140,9 +254,17 @@ def _secret_create_failed(req, resp):
     api.abort(falcon.HTTP_500, _("Unabled to create secret."), req, resp)
 
 
-def json_handler(obj):
-    """Convert objects into json-friendly equivalents."""
-    return obj.isoformat() if hasattr(obj, 'isoformat') else obj
+def _secret_creation_error(e):
+    """Returns the message describing why a batched secret wasn't created."""
+    if isinstance(e, (exception.InvalidObject, exception.UnsupportedField)):
+        return str(e)
+    if isinstance(e, exception.LimitExceeded):
+        return _("Could not add secret data as it was too large")
+    if isinstance(e, exception.NoDataToProcess):
+        return _("Could not add secret with empty 'plain_text'")
+    if isinstance(e, em.CryptoMimeTypeNotSupportedException):
+        return _("Mime-type of '{0}' is not supported.").format(e.mime_type)
+    return _('Secret creation failed - unknown')
 
 
 def convert_secret_to_href(keystone_id, secret_id):
@@ -163,82 +285,123 @@ def convert_order_to_href(keystone_id, order_id):
     return utils.hostname_for_refs(keystone_id=keystone_id, resource=resource)
 
 
-def convert_to_hrefs(keystone_id, fields):
-    """Convert id's within a fields dict to HATEOS-style hrefs"""
-    if 'secret_id' in fields:
-        fields['secret_ref'] = convert_secret_to_href(keystone_id,
-                                                      fields['secret_id'])
-        del fields['secret_id']
-    if 'order_id' in fields:
-        fields['order_ref'] = convert_order_to_href(keystone_id,
-                                                    fields['order_id'])
-        del fields['order_id']
-    return fields
-
-
-def convert_list_to_href(resources_name, keystone_id, offset, limit):
+def convert_list_to_href(resources_name, keystone_id, offset, limit,
+                         marker=None):
     """
     Convert the tenant ID and offset/limit info to a HATEOS-style href
-    suitable for use in a list navigation paging interface.
+    suitable for use in a list navigation paging interface. If a paging
+    marker is provided, it is used in place of the offset.
     """
-    resource = '{0}?limit={1}&offset={2}'.format(resources_name, limit,
-                                                 offset)
+    if marker:
+        resource = '{0}?limit={1}&marker={2}'.format(resources_name, limit,
+                                                     marker)
+    else:
+        resource = '{0}?limit={1}&offset={2}'.format(resources_name, limit,
+                                                     offset)
     return utils.hostname_for_refs(keystone_id=keystone_id, resource=resource)
 
 
-def previous_href(resources_name, keystone_id, offset, limit):
+def previous_href(resources_name, keystone_id, offset, limit, marker=None):
     """
     Create a HATEOS-style 'previous' href suitable for use in a list
     navigation paging interface, assuming the provided values are the
-    currently viewed page.
+    currently viewed page. If a marker seeking before the first element on
+    the current page is provided, the href uses it rather than an offset.
     """
     offset = max(0, offset - limit)
-    return convert_list_to_href(resources_name, keystone_id, offset, limit)
+    return convert_list_to_href(resources_name, keystone_id, offset, limit,
+                                marker=marker)
 
 
-def next_href(resources_name, keystone_id, offset, limit):
+def next_href(resources_name, keystone_id, offset, limit, marker=None):
     """
     Create a HATEOS-style 'next' href suitable for use in a list
     navigation paging interface, assuming the provided values are the
-    currently viewed page.
+    currently viewed page. If the marker of the last element on the
+    current page is provided, the href seeks past it rather than using
+    an offset.
     """
     offset = offset + limit
-    return convert_list_to_href(resources_name, keystone_id, offset, limit)
+    return convert_list_to_href(resources_name, keystone_id, offset, limit,
+                                marker=marker)
+
+
+def _marker_nav_args(marker, entities):
+    """
+    Builds the add_nav_hrefs() marker arguments for a page of entities,
+    where marker is the paging marker the page was requested with, if any.
+    """
+    nav_args = {'next_marker': repo.encode_marker(entities[-1])}
+    if marker:
+        nav_args['previous_marker'] = repo.encode_marker(entities[0],
+                                                         before=True)
+        nav_args['backward'] = repo.decode_marker(marker)[2]
+    return nav_args
 
 
 def add_nav_hrefs(resources_name, keystone_id, offset, limit,
-                  num_elements, data):
-    if offset > 0:
+                  num_elements, data, next_marker=None,
+                  previous_marker=None, backward=False):
+    """
+    Adds 'previous' and 'next' hrefs to the data for a page of elements.
+
+    A page requested with a marker has no meaningful offset, so its
+    'previous' href uses previous_marker instead. If that page was fetched
+    seeking backward, there is always a following page, and a preceding
+    one only if the page is full.
+    """
+    if previous_marker:
+        if not backward or num_elements >= limit:
+            data.update({'previous': previous_href(resources_name,
+                                                   keystone_id,
+                                                   offset,
+                                                   limit,
+                                                   marker=previous_marker)})
+    elif offset > 0:
         data.update({'previous': previous_href(resources_name,
                                                keystone_id,
                                                offset,
                                                limit)})
-    if num_elements >= limit:
+    if backward or num_elements >= limit:
         data.update({'next': next_href(resources_name,
                                        keystone_id,
                                        offset,
-                                       limit)})
+                                       limit,
+                                       marker=next_marker)})
     return data
 
 
+def _add_query_headers(resp, queries):
+    """Reports the statements a request executed, for debugging."""
+    resp.set_header('X-Barbican-Query-Count', str(queries.count))
+    resp.set_header('X-Barbican-Query-Time-Ms',
+                    '{0:.1f}'.format(queries.elapsed * 1000.0))
+
+
 def handle_exceptions(operation_name=_('System')):
     """
     Handle general exceptions to avoid a response code of 0
-    back to clients.
+    back to clients. Request latencies and database statements are
+    recorded under the name '<resource class name>.<responder name>'.
     """
 
     def exceptions_decorator(fn):
         def handler(inst, req, resp, *args, **kwargs):
-            try:
-                fn(inst, req, resp, *args, **kwargs)
-            except falcon.HTTPError as f:
-                LOG.exception('Falcon error seen')
-                raise f  # Already converted to Falcon exception, just reraise
-            except Exception as e:
-                message = _('{0} failure seen - please contact site '
-                            'administrator').format(operation_name)
-                LOG.exception(message)
-                _general_failure(message, req, resp)
+            name = '{0}.{1}'.format(type(inst).__name__, fn.__name__)
+            with metrics.scope(name), repo.track_queries(name) as queries:
+                try:
+                    fn(inst, req, resp, *args, **kwargs)
+                except falcon.HTTPError as f:
+                    LOG.debug('Falcon error seen: %s', f.status)
+                    raise f  # Already converted to Falcon exception
+                except Exception as e:
+                    message = _('{0} failure seen - please contact site '
+                                'administrator').format(operation_name)
+                    LOG.exception(message)
+                    _general_failure(message, req, resp)
+                finally:
+                    if CONF.sql_debug_headers:
+                        _add_query_headers(resp, queries)
 
         return handler
 
@@ -251,6 +414,7 @@ class PerformanceResource(api.ApiResource):
     def __init__(self):
         LOG.debug('=== Creating PerformanceResource ===')
 
+    @metrics.scoped()
     def on_get(self, req, resp):
         resp.status = falcon.HTTP_200
         resp.body = '42'
@@ -263,12 +427,30 @@ class VersionResource(api.ApiResource):
         LOG.debug('=== Creating VersionResource ===')
         self.policy = policy_enforcer or Enforcer()
 
+    @metrics.scoped()
     def on_get(self, req, resp):
         resp.status = falcon.HTTP_200
         resp.body = json.dumps({'v1': 'current',
                                 'build': __version__})
 
 
+class MetricsResource(api.ApiResource):
+    """
+    Reports request and task latency histograms, for the admin API.
+
+    Covers every process writing to metrics_dir on this host, or just this
+    process if metrics_dir is not configured.
+    """
+
+    def __init__(self):
+        LOG.debug('Creating MetricsResource')
+
+    def on_get(self, req, resp):
+        resp.status = falcon.HTTP_200
+        resp.set_header('Content-Type', 'application/json')
+        resp.body = json.dumps({'latency': metrics.collect()})
+
+
 class SecretsResource(api.ApiResource):
     """Handles Secret creation requests."""
 
@@ -277,17 +459,18 @@ class SecretsResource(api.ApiResource):
                  tenant_secret_repo=None, datum_repo=None,
                  policy_enforcer=None):
         LOG.debug('Creating SecretsResource')
-        self.tenant_repo = tenant_repo or repo.TenantRepo()
-        self.secret_repo = secret_repo or repo.SecretRepo()
-        self.tenant_secret_repo = tenant_secret_repo or repo.TenantSecretRepo()
-        self.datum_repo = datum_repo or repo.EncryptedDatumRepo()
+        self.tenant_repo = tenant_repo or repo.get_tenant_repository()
+        self.secret_repo = secret_repo or repo.get_secret_repository()
+        self.tenant_secret_repo = (tenant_secret_repo or
+                                   repo.get_tenant_secret_repository())
+        self.datum_repo = datum_repo or repo.get_encrypted_datum_repository()
         self.crypto_manager = crypto_manager
         self.policy = policy_enforcer or Enforcer()
         self.validator = validators.NewSecretValidator()
 
     @handle_exceptions(_('Secret creation'))
     def on_post(self, req, resp, keystone_id):
-        LOG.debug('Start on_post for tenant-ID {0}:...'.format(keystone_id))
+        LOG.debug('Start on_post for tenant-ID %s:...', keystone_id)
 
         data = api.load_body(req, resp, self.validator)
         tenant = res.get_or_create_tenant(keystone_id, self.tenant_repo)
@@ -298,13 +481,13 @@ class SecretsResource(api.ApiResource):
                                            self.tenant_secret_repo,
                                            self.datum_repo)
         except em.CryptoMimeTypeNotSupportedException as cmtnse:
-            LOG.exception('Secret creation failed - mime-type not supported')
+            LOG.debug('Secret creation failed - mime-type not supported')
             _secret_mime_type_not_supported(cmtnse.mime_type, req, resp)
         except exception.NoDataToProcess:
-            LOG.exception('No secret data to process')
+            LOG.debug('No secret data to process')
             _secret_plain_text_empty(req, resp)
         except exception.LimitExceeded:
-            LOG.exception('Secret data too big to process')
+            LOG.debug('Secret data too big to process')
             _secret_data_too_large(req, resp)
         except Exception as e:
             LOG.exception('Secret creation failed - unknown')
@@ -314,38 +497,167 @@ class SecretsResource(api.ApiResource):
         resp.set_header('Location', '/{0}/secrets/{1}'.format(keystone_id,
                                                               new_secret.id))
         url = convert_secret_to_href(keystone_id, new_secret.id)
-        LOG.debug('URI to secret is {0}'.format(url))
+        LOG.debug('URI to secret is %s', url)
         resp.body = json.dumps({'secret_ref': url})
 
     @handle_exceptions(_('Secret(s) retrieval'))
     def on_get(self, req, resp, keystone_id):
         LOG.debug('Start secrets on_get '
-                  'for tenant-ID {0}:'.format(keystone_id))
+                  'for tenant-ID %s:', keystone_id)
 
         params = req._params
 
-        result = self.secret_repo \
-            .get_by_create_date(keystone_id,
-                                offset_arg=params.get('offset',
-                                                      None),
-                                limit_arg=params.get('limit',
-                                                     None),
-                                suppress_exception=True)
+        try:
+            result = self.secret_repo \
+                .get_by_create_date(keystone_id,
+                                    offset_arg=params.get('offset',
+                                                          None),
+                                    limit_arg=params.get('limit',
+                                                         None),
+                                    marker_arg=params.get('marker',
+                                                          None),
+                                    suppress_exception=True)
+        except exception.Invalid:
+            LOG.debug('Problem decoding secrets paging marker')
+            _invalid_paging_marker(req, resp)
         secrets, offset, limit = result
 
         if not secrets:
             secrets_resp_overall = {'secrets': []}
         else:
-            secret_fields = lambda s: augment_fields_with_content_types(s)
-            secrets_resp = [convert_to_hrefs(keystone_id, secret_fields(s)) for
-                            s in secrets]
-            secrets_resp_overall = add_nav_hrefs('secrets', keystone_id,
-                                                 offset, limit, len(secrets),
-                                                 {'secrets': secrets_resp})
+            secrets_resp = serializers.secret_documents(keystone_id, secrets)
+            secrets_resp_overall = add_nav_hrefs(
+                'secrets', keystone_id, offset, limit, len(secrets),
+                {'secrets': secrets_resp},
+                **_marker_nav_args(params.get('marker'), secrets))
 
         resp.status = falcon.HTTP_200
-        resp.body = json.dumps(secrets_resp_overall,
-                               default=json_handler)
+        resp.body = serializers.dumps(secrets_resp_overall)
+
+
+class SecretsBatchResource(api.ApiResource):
+    """Handles requests to create or retrieve many Secrets at once."""
+
+    def __init__(self, crypto_manager,
+                 tenant_repo=None, secret_repo=None,
+                 tenant_secret_repo=None, datum_repo=None,
+                 policy_enforcer=None):
+        LOG.debug('Creating SecretsBatchResource')
+        self.tenant_repo = tenant_repo or repo.get_tenant_repository()
+        self.secret_repo = secret_repo or repo.get_secret_repository()
+        self.tenant_secret_repo = (tenant_secret_repo or
+                                   repo.get_tenant_secret_repository())
+        self.datum_repo = datum_repo or repo.get_encrypted_datum_repository()
+        self.crypto_manager = crypto_manager
+        self.policy = policy_enforcer or Enforcer()
+        self.validator = validators.NewSecretsBatchValidator()
+
+    @handle_exceptions(_('Secret batch creation'))
+    def on_post(self, req, resp, keystone_id):
+        LOG.debug('Start batch on_post for '
+                  'tenant-ID %s:...', keystone_id)
+
+        data = api.load_body(req, resp, self.validator,
+                             max_bytes=max_batch_body_bytes())
+        secrets_data = data['secrets']
+
+        # Validate each secret, so that invalid ones are reported
+        #   individually rather than failing the whole batch.
+        results = [None] * len(secrets_data)
+        valid_indexes = []
+        with metrics.stage('validation'):
+            for index, secret_data in enumerate(secrets_data):
+                try:
+                    secrets_data[index] = self.validator.validate_secret(
+                        secret_data)
+                    valid_indexes.append(index)
+                except (exception.InvalidObject, exception.UnsupportedField,
+                        exception.LimitExceeded) as e:
+                    results[index] = e
+
+        # A batch without valid secrets fails without resolving the tenant.
+        if valid_indexes:
+            tenant = res.get_or_create_tenant(keystone_id, self.tenant_repo)
+            created = res.create_secrets([secrets_data[index]
+                                          for index in valid_indexes],
+                                         tenant, self.crypto_manager,
+                                         self.secret_repo,
+                                         self.tenant_secret_repo,
+                                         self.datum_repo)
+            for index, result in zip(valid_indexes, created):
+                results[index] = result
+
+        secrets_resp = []
+        num_created = 0
+        for result in results:
+            if isinstance(result, Exception):
+                secrets_resp.append({'error': _secret_creation_error(result)})
+            else:
+                num_created += 1
+                secrets_resp.append({
+                    'secret_ref': convert_secret_to_href(keystone_id,
+                                                         result.id)})
+        LOG.debug('Created %s of %s batched secrets', num_created,
+                  len(results))
+
+        resp.status = falcon.HTTP_201 if num_created else falcon.HTTP_400
+        resp.body = json.dumps({'secrets': secrets_resp})
+
+    @handle_exceptions(_('Secret batch retrieval'))
+    def on_get(self, req, resp, keystone_id):
+        if req.accept and req.accept not in ('application/json', '*/*'):
+            _get_accept_not_supported(req.accept, req, resp)
+
+        secret_ids = []
+        for secret_id in req._params.get('ids', '').split(','):
+            secret_id = secret_id.strip()
+            if secret_id and secret_id not in secret_ids:
+                secret_ids.append(secret_id)
+        if not secret_ids:
+            _secret_ids_missing(req, resp)
+        if len(secret_ids) > CONF.max_secrets_per_batch:
+            _too_many_secret_ids(req, resp)
+
+        # Load all secrets in one query, and decrypt them in one batch.
+        secrets = dict((secret.id, secret) for secret in
+                       self.secret_repo.get_many(secret_ids, keystone_id))
+        to_decrypt = [secret for secret in secrets.itervalues()
+                      if secret.encrypted_data]
+
+        payloads = {}
+        if to_decrypt:
+            tenant = res.get_or_create_tenant(keystone_id, self.tenant_repo)
+            try:
+                unencrypted_list = self.crypto_manager.decrypt_batch(
+                    to_decrypt, tenant)
+            except Exception as e:
+                LOG.exception('Secret batch decryption failed')
+                _failed_to_decrypt_data(req, resp)
+            for secret, unencrypted in zip(to_decrypt, unencrypted_list):
+                payloads[secret.id] = unencrypted
+
+        secrets_resp = []
+        secret_refs = serializers.secret_ref_prefix(keystone_id)
+        for secret_id in secret_ids:
+            secret = secrets.get(secret_id)
+            if not secret:
+                secrets_resp.append({
+                    'secret_ref': secret_refs + secret_id,
+                    'error': _('Unable to locate secret.')})
+                continue
+
+            fields = serializers.secret_document(secret, secret_refs)
+            if secret_id in payloads:
+                if secret.mime_type == 'text/plain':
+                    fields['payload'] = payloads[secret_id]
+                else:
+                    fields['payload'] = base64.b64encode(payloads[secret_id])
+                    fields['payload_content_encoding'] = 'base64'
+            secrets_resp.append(fields)
+
+        resp.status = falcon.HTTP_200
+        resp.set_header('Content-Type', 'application/json')
+        resp.body = serializers.dumps({'secrets': secrets_resp})
 
 
 class SecretResource(api.ApiResource):
@@ -356,47 +668,129 @@ class SecretResource(api.ApiResource):
                  tenant_secret_repo=None, datum_repo=None,
                  policy_enforcer=None):
         self.crypto_manager = crypto_manager
-        self.tenant_repo = tenant_repo or repo.TenantRepo()
-        self.repo = secret_repo or repo.SecretRepo()
-        self.tenant_secret_repo = tenant_secret_repo or repo.TenantSecretRepo()
-        self.datum_repo = datum_repo or repo.EncryptedDatumRepo()
+        self.tenant_repo = tenant_repo or repo.get_tenant_repository()
+        self.repo = secret_repo or repo.get_secret_repository()
+        self.tenant_secret_repo = (tenant_secret_repo or
+                                   repo.get_tenant_secret_repository())
+        self.datum_repo = datum_repo or repo.get_encrypted_datum_repository()
         self.policy = policy_enforcer or Enforcer()
 
     @handle_exceptions(_('Secret retrieval'))
     def on_get(self, req, resp, keystone_id, secret_id):
 
-        secret = self.repo.get(entity_id=secret_id, keystone_id=keystone_id,
+        metadata_only = not req.accept or req.accept == 'application/json' \
+            or req.accept == '*/*'
+
+        if metadata_only:
+            self._get_metadata(req, resp, keystone_id, secret_id)
+            return
+
+        secret = self.repo.get(entity_id=secret_id,
+                               keystone_id=keystone_id,
                                suppress_exception=True)
         if not secret:
             _secret_not_found(req, resp)
 
         resp.status = falcon.HTTP_200
 
-        if not req.accept or req.accept == 'application/json' \
-                or req.accept == '*/*':
-            # Metadata-only response, no decryption necessary.
-            resp.set_header('Content-Type', 'application/json')
-            secret_fields = augment_fields_with_content_types(secret)
-            resp.body = json.dumps(convert_to_hrefs(keystone_id,
-                                                    secret_fields),
-                                   default=json_handler)
-        else:
-            tenant = res.get_or_create_tenant(keystone_id, self.tenant_repo)
-            resp.set_header('Content-Type', req.accept)
-            try:
+        tenant = res.get_or_create_tenant(keystone_id, self.tenant_repo)
+        resp.set_header('Content-Type', req.accept)
+        try:
+            if req.accept == 'text/plain':
                 resp.body = self.crypto_manager.decrypt(req.accept, secret,
                                                         tenant)
-            except em.CryptoAcceptNotSupportedException as canse:
-                LOG.exception('Secret decryption failed - '
-                              'accept not supported')
-                _get_accept_not_supported(canse.accept, req, resp)
-            except em.CryptoNoSecretOrDataException as cnsode:
-                LOG.exception('Secret information of type {0} not '
-                              'found for decryption.'.format(cnsode.mime_type))
-                _get_secret_info_not_found(cnsode.mime_type, req, resp)
-            except Exception as e:
-                LOG.exception('Secret decryption failed - unknown')
-                _failed_to_decrypt_data(req, resp)
+            else:
+                self._stream_secret(req, resp, secret, tenant)
+        except exception.RangeNotSatisfiable:
+            _range_not_satisfiable(req, resp)
+        except em.CryptoAcceptNotSupportedException as canse:
+            LOG.debug('Secret decryption failed - '
+                      'accept not supported')
+            _get_accept_not_supported(canse.accept, req, resp)
+        except em.CryptoNoSecretOrDataException as cnsode:
+            LOG.debug('Secret information of type %s not '
+                      'found for decryption.', cnsode.mime_type)
+            _get_secret_info_not_found(cnsode.mime_type, req, resp)
+        except Exception as e:
+            LOG.exception('Secret decryption failed - unknown')
+            _failed_to_decrypt_data(req, resp)
+
+    def _get_metadata(self, req, resp, keystone_id, secret_id):
+        """
+        Responds with the secret's metadata, which is served from the
+        metadata cache when possible, and with 304 Not Modified if the
+        client already has the current version.
+        """
+        metadata_cache = get_secret_metadata_cache()
+        cache_key = (keystone_id, secret_id)
+        cached = metadata_cache.get(cache_key)
+        if cached is not None and not self._is_current(cached, keystone_id,
+                                                       secret_id):
+            metadata_cache.invalidate(cache_key)
+            cached = None
+
+        if cached is None:
+            # No decryption necessary, so avoid loading encrypted data.
+            secret = self.repo.get_metadata(entity_id=secret_id,
+                                            keystone_id=keystone_id,
+                                            suppress_exception=True)
+            if not secret:
+                _secret_not_found(req, resp)
+
+            cached = (_secret_etag(secret), serializers.dumps(
+                serializers.secret_document(
+                    secret, serializers.secret_ref_prefix(keystone_id))),
+                _secret_version(secret), secret.expiration)
+            metadata_cache.put(cache_key, cached)
+
+        etag, body, version, expiration = cached
+        resp.set_header('ETag', etag)
+        if _etag_matches(etag, req.get_header('If-None-Match')):
+            resp.status = falcon.HTTP_304
+            return
+
+        resp.status = falcon.HTTP_200
+        resp.set_header('Content-Type', 'application/json')
+        resp.body = body
+
+    def _is_current(self, cached, keystone_id, secret_id):
+        """
+        Tests whether a cached metadata document still describes a live
+        secret, since other processes may have changed or deleted it. The
+        check queries only the secret's version, loading no entities.
+        """
+        etag, body, version, expiration = cached
+        if expiration and expiration <= timeutils.utcnow():
+            return False
+        return self.repo.get_version(entity_id=secret_id,
+                                     keystone_id=keystone_id) == version
+
+    def _stream_secret(self, req, resp, secret, tenant):
+        """
+        Streams a binary secret, decrypting it chunk by chunk as it is sent
+        and honoring single byte-range requests.
+        """
+        decrypted = self.crypto_manager.decrypt_stream(req.accept, secret,
+                                                       tenant)
+        resp.set_header('Accept-Ranges', 'bytes')
+        try:
+            byte_range = api.parse_byte_range(req.get_header('Range'),
+                                              decrypted.length)
+        except exception.RangeNotSatisfiable:
+            resp.set_header('Content-Range',
+                            'bytes */{0}'.format(decrypted.length))
+            raise
+
+        if byte_range:
+            start, stop = byte_range
+            resp.status = falcon.HTTP_206
+            resp.set_header('Content-Range', 'bytes {0}-{1}/{2}'.format(
+                start, stop - 1, decrypted.length))
+        else:
+            start, stop = 0, decrypted.length
+
+        resp.stream = decrypted.iter_range(start, stop, api.STREAM_CHUNK_SIZE)
+        resp.stream_len = stop - start
 
     @handle_exceptions(_('Secret update'))
     def on_put(self, req, resp, keystone_id, secret_id):
@@ -404,8 +798,9 @@ class SecretResource(api.ApiResource):
         if not req.content_type or req.content_type == 'application/json':
             _put_accept_incorrect(req.content_type, req, resp)
 
-        secret = self.repo.get(entity_id=secret_id, keystone_id=keystone_id,
-                               suppress_exception=True)
+        secret = self.repo.get_metadata(entity_id=secret_id,
+                                        keystone_id=keystone_id,
+                                        suppress_exception=True)
         if not secret:
             _secret_not_found(req, resp)
         if secret.mime_type != req.content_type:
@@ -416,33 +811,36 @@ class SecretResource(api.ApiResource):
 
         tenant = res.get_or_create_tenant(keystone_id, self.tenant_repo)
 
-        try:
-            plain_text = req.stream.read(api.MAX_BYTES_REQUEST_INPUT_ACCEPTED)
-        except IOError:
-            api.abort(falcon.HTTP_500, 'Read Error')
-
         resp.status = falcon.HTTP_200
 
+        # The body is encrypted as it is read, rather than buffered whole.
+        chunks = api.read_chunks(req, CONF.max_allowed_secret_in_bytes)
         try:
-            res.create_encrypted_datum(secret,
-                                       plain_text,
-                                       tenant,
-                                       self.crypto_manager,
-                                       self.tenant_secret_repo,
-                                       self.datum_repo)
+            res.create_encrypted_datum_from_chunks(secret,
+                                                   chunks,
+                                                   tenant,
+                                                   self.crypto_manager,
+                                                   self.tenant_secret_repo,
+                                                   self.datum_repo)
+        except IOError:
+            LOG.exception('Problem reading secret data stream')
+            api.abort(falcon.HTTP_500, 'Read Error')
         except em.CryptoMimeTypeNotSupportedException as cmtnse:
-            LOG.exception('Secret creation failed - mime-type not supported')
+            LOG.debug('Secret creation failed - mime-type not supported')
             _secret_mime_type_not_supported(cmtnse.mime_type, req, resp)
         except exception.NoDataToProcess:
-            LOG.exception('No secret data to process')
+            LOG.debug('No secret data to process')
             _secret_plain_text_empty(req, resp)
         except exception.LimitExceeded:
-            LOG.exception('Secret data too big to process')
+            LOG.debug('Secret data too big to process')
             _secret_data_too_large(req, resp)
         except Exception as e:
             LOG.exception('Secret creation failed - unknown')
             _failed_to_create_encrypted_datum(req, resp)
 
+        # Content types change once data is added.
+        get_secret_metadata_cache().invalidate((keystone_id, secret_id))
+
     @handle_exceptions(_('Secret deletion'))
     def on_delete(self, req, resp, keystone_id, secret_id):
 
@@ -450,8 +848,9 @@ class SecretResource(api.ApiResource):
             self.repo.delete_entity_by_id(entity_id=secret_id,
                                           keystone_id=keystone_id)
         except exception.NotFound:
-            LOG.exception('Problem deleting secret')
+            LOG.debug('Problem deleting secret')
             _secret_not_found(req, resp)
+        get_secret_metadata_cache().invalidate((keystone_id, secret_id))
 
         resp.status = falcon.HTTP_200
 
@@ -463,8 +862,8 @@ class OrdersResource(api.ApiResource):
                  queue_resource=None, policy_enforcer=None):
 
         LOG.debug('Creating OrdersResource')
-        self.tenant_repo = tenant_repo or repo.TenantRepo()
-        self.order_repo = order_repo or repo.OrderRepo()
+        self.tenant_repo = tenant_repo or repo.get_tenant_repository()
+        self.order_repo = order_repo or repo.get_order_repository()
         self.queue = queue_resource or get_queue_api()
         self.policy = policy_enforcer or Enforcer()
         self.validator = validators.NewOrderValidator()
@@ -475,13 +874,13 @@ class OrdersResource(api.ApiResource):
         tenant = res.get_or_create_tenant(keystone_id, self.tenant_repo)
 
         body = api.load_body(req, resp, self.validator)
-        LOG.debug('Start on_post...{0}'.format(body))
+        LOG.debug('Start on_post...%s', body)
 
         if 'secret' not in body:
             _secret_not_in_order(req, resp)
         secret_info = body['secret']
         name = secret_info['name']
-        LOG.debug('Secret to create is {0}'.format(name))
+        LOG.debug('Secret to create is %s', name)
 
         new_order = models.Order()
         new_order.secret_name = secret_info['name']
@@ -494,8 +893,16 @@ class OrdersResource(api.ApiResource):
         self.order_repo.create_from(new_order)
 
         # Send to workers to process.
-        self.queue.process_order(order_id=new_order.id,
-                                 keystone_id=keystone_id)
+        try:
+            self.queue.process_order(order_id=new_order.id,
+                                     keystone_id=keystone_id)
+        except exception.ServiceUnavailable:
+            # Expected backpressure, which the queue itself reports.
+            LOG.debug('Order processing queue is full, rejecting order %s',
+                      new_order.id)
+            self.order_repo.delete_entity_by_id(entity_id=new_order.id,
+                                                keystone_id=keystone_id)
+            _order_queue_full(req, resp)
 
         resp.status = falcon.HTTP_202
         resp.set_header('Location', '/{0}/orders/{1}'.format(keystone_id,
@@ -506,38 +913,43 @@ class OrdersResource(api.ApiResource):
     @handle_exceptions(_('Order(s) retrieval'))
     def on_get(self, req, resp, keystone_id):
         LOG.debug('Start orders on_get '
-                  'for tenant-ID {0}:'.format(keystone_id))
+                  'for tenant-ID %s:', keystone_id)
 
         params = req._params
 
-        result = self.order_repo \
-            .get_by_create_date(keystone_id,
-                                offset_arg=params.get('offset',
-                                                      None),
-                                limit_arg=params.get('limit',
-                                                     None),
-                                suppress_exception=True)
+        try:
+            result = self.order_repo \
+                .get_by_create_date(keystone_id,
+                                    offset_arg=params.get('offset',
+                                                          None),
+                                    limit_arg=params.get('limit',
+                                                         None),
+                                    marker_arg=params.get('marker',
+                                                          None),
+                                    suppress_exception=True)
+        except exception.Invalid:
+            LOG.debug('Problem decoding orders paging marker')
+            _invalid_paging_marker(req, resp)
         orders, offset, limit = result
 
         if not orders:
             orders_resp_overall = {'orders': []}
         else:
-            orders_resp = [convert_to_hrefs(keystone_id, o.to_dict_fields())
-                           for o in orders]
-            orders_resp_overall = add_nav_hrefs('orders', keystone_id,
-                                                offset, limit, len(orders),
-                                                {'orders': orders_resp})
+            orders_resp = serializers.order_documents(keystone_id, orders)
+            orders_resp_overall = add_nav_hrefs(
+                'orders', keystone_id, offset, limit, len(orders),
+                {'orders': orders_resp},
+                **_marker_nav_args(params.get('marker'), orders))
 
         resp.status = falcon.HTTP_200
-        resp.body = json.dumps(orders_resp_overall,
-                               default=json_handler)
+        resp.body = serializers.dumps(orders_resp_overall)
 
 
 class OrderResource(api.ApiResource):
     """Handles Order retrieval and deletion requests"""
 
     def __init__(self, order_repo=None, policy_enforcer=None):
-        self.repo = order_repo or repo.OrderRepo()
+        self.repo = order_repo or repo.get_order_repository()
         self.policy = policy_enforcer or Enforcer()
 
     @handle_exceptions(_('Order retrieval'))
@@ -548,9 +960,9 @@ class OrderResource(api.ApiResource):
             _order_not_found(req, resp)
 
         resp.status = falcon.HTTP_200
-        resp.body = json.dumps(convert_to_hrefs(keystone_id,
-                                                order.to_dict_fields()),
-                               default=json_handler)
+        resp.body = serializers.dumps(serializers.order_document(
+            order, serializers.order_ref_prefix(keystone_id),
+            serializers.secret_ref_prefix(keystone_id)))
 
     @handle_exceptions(_('Order deletion'))
     def on_delete(self, req, resp, keystone_id, order_id):
@@ -559,7 +971,7 @@ class OrderResource(api.ApiResource):
             self.repo.delete_entity_by_id(entity_id=order_id,
                                           keystone_id=keystone_id)
         except exception.NotFound:
-            LOG.exception('Problem deleting order')
+            LOG.debug('Problem deleting order')
             _order_not_found(req, resp)
 
         resp.status = falcon.HTTP_200
@@ -0,0 +1,141 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Serializes Secret and Order entities into API response documents.
+
+Documents are built directly from the entities' attributes, with their
+timestamps formatted up front, rather than via to_dict_fields() and href
+conversion. They therefore hold only JSON-native values and are encoded
+without a fallback handler, by ujson when an installed release supports
+leaving forward slashes unescaped, as the standard encoder does.
+"""
+
+from barbican.common import metrics, utils
+from barbican.crypto.mime_types import CTYPES_MAPPINGS
+from barbican.openstack.common import jsonutils as json
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def _supports_unescaped_slashes(module):
+    """Tests if the ujson module accepts escape_forward_slashes."""
+    try:
+        module.dumps('/', escape_forward_slashes=False)
+    except TypeError:
+        return False
+    return True
+
+
+if ujson and not _supports_unescaped_slashes(ujson):
+    ujson = None
+
+
+@metrics.timed('serialization')
+def dumps(document):
+    """Encodes a document built from JSON-native values as JSON."""
+    if ujson:
+        return ujson.dumps(document, escape_forward_slashes=False)
+    return json.dumps(document)
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def secret_ref_prefix(keystone_id):
+    """Returns the href of a tenant's secrets, to which IDs are appended."""
+    return utils.hostname_for_refs(keystone_id=keystone_id,
+                                   resource='secrets/')
+
+
+def order_ref_prefix(keystone_id):
+    """Returns the href of a tenant's orders, to which IDs are appended."""
+    return utils.hostname_for_refs(keystone_id=keystone_id,
+                                   resource='orders/')
+
+
+def _add_entity_fields(document, entity):
+    document['created'] = _isoformat(entity.created_at)
+    document['updated'] = _isoformat(entity.updated_at)
+    document['status'] = entity.status
+    if entity.deleted_at:
+        document['deleted'] = _isoformat(entity.deleted_at)
+    if entity.deleted:
+        document['is_deleted'] = True
+    return document
+
+
+@metrics.timed('serialization')
+def secret_document(secret, secret_refs):
+    """
+    Returns the response document for a secret's metadata, including its
+    content types.
+
+    :param secret_refs: href prefix from secret_ref_prefix().
+    """
+    document = {'secret_ref': secret_refs + (secret.id or '????'),
+                'name': secret.name or secret.id,
+                'expiration': _isoformat(secret.expiration),
+                'mime_type': secret.mime_type,
+                'algorithm': secret.algorithm,
+                'bit_length': secret.bit_length,
+                'cypher_type': secret.cypher_type}
+
+    # TODO: How deal with merging more than one datum instance?
+    for datum in secret.encrypted_data or ():
+        if datum.mime_type in CTYPES_MAPPINGS:
+            document['content_types'] = CTYPES_MAPPINGS[datum.mime_type]
+            break
+
+    return _add_entity_fields(document, secret)
+
+
+@metrics.timed('serialization')
+def order_document(order, order_refs, secret_refs):
+    """
+    Returns the response document for an order.
+
+    :param order_refs: href prefix from order_ref_prefix().
+    :param secret_refs: href prefix from secret_ref_prefix().
+    """
+    document = {'secret': {'name': order.secret_name or order.secret_id,
+                           'mime_type': order.secret_mime_type,
+                           'algorithm': order.secret_algorithm,
+                           'bit_length': order.secret_bit_length,
+                           'cypher_type': order.secret_cypher_type,
+                           'expiration': _isoformat(order.secret_expiration)},
+                'secret_ref': secret_refs + (order.secret_id or '????'),
+                'order_ref': order_refs + (order.id or '????')}
+    return _add_entity_fields(document, order)
+
+
+@metrics.timed('serialization')
+def secret_documents(keystone_id, secrets):
+    """Returns the response documents for a page of secrets."""
+    secret_refs = secret_ref_prefix(keystone_id)
+    return [secret_document(secret, secret_refs) for secret in secrets]
+
+
+@metrics.timed('serialization')
+def order_documents(keystone_id, orders):
+    """Returns the response documents for a page of orders."""
+    order_refs = order_ref_prefix(keystone_id)
+    secret_refs = secret_ref_prefix(keystone_id)
+    return [order_document(order, order_refs, secret_refs)
+            for order in orders]
@@ -0,0 +1,96 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Process-local caching utilities for Barbican.
+"""
+
+import collections
+import threading
+import time
+
+
+class LRUCache(object):
+    """
+    Bounded, thread-safe least-recently-used cache with optional
+    time-to-live expiry of entries.
+
+    Hit and miss counts are tracked so cache effectiveness can be
+    monitored.
+    """
+
+    def __init__(self, max_size, ttl=None, timer=time.time):
+        """
+        :param max_size: Maximum number of entries to hold.
+        :param ttl: Seconds an entry remains valid, or None for no expiry.
+        :param timer: Clock function, overridable for testing.
+        """
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Returns the value cached for key, or default if absent/expired."""
+        with self._lock:
+            try:
+                value, expires_at = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            if expires_at is not None and expires_at <= self.timer():
+                self.misses += 1
+                return default
+
+            # Re-insert to mark as most recently used.
+            self._entries[key] = (value, expires_at)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Caches value for key, evicting the least recently used entry."""
+        expires_at = self.timer() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, expires_at)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Removes key from the cache, if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Removes all entries and resets the hit/miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Returns a dict summarizing the cache's size and effectiveness."""
+        with self._lock:
+            return {'size': len(self._entries),
+                    'max_size': self.max_size,
+                    'hits': self.hits,
+                    'misses': self.misses}
+
+    def __len__(self):
+        return len(self._entries)
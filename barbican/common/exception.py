@@ -284,3 +284,8 @@ class InUseByStore(BarbicanException):
 
 class ImageSizeLimitExceeded(BarbicanException):
     message = _("The provided image is too large.")
+
+
+class RangeNotSatisfiable(BarbicanException):
+    message = _("The requested range is not satisfiable for data of "
+                "%(length)s bytes.")
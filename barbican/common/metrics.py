@@ -0,0 +1,404 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Latency metrics for Barbican.
+
+Work such as an API request or a worker task runs within a named scope,
+and the stages of that work (validation, tenant lookup, crypto, each
+repository call, serialization) are timed within it. When a scope ends,
+its total latency and the time it spent in each stage are recorded in
+fixed-bucket histograms, which can be merged across processes.
+
+Processes write their histograms to metrics_dir periodically, so that the
+admin API can report on all of the API and worker processes of a host.
+"""
+
+import bisect
+import errno
+import functools
+import glob
+import os
+import tempfile
+import threading
+import time
+
+from oslo.config import cfg
+
+from barbican.common import utils
+from barbican.openstack.common import jsonutils as json
+from barbican.openstack.common.gettextutils import _
+
+
+LOG = utils.getLogger(__name__)
+
+metrics_opts = [
+    cfg.StrOpt('metrics_dir', default=None,
+               help=_('Directory to which each process periodically writes '
+                      'its latency histograms, for reporting by the admin '
+                      'API. If unset, the admin API only reports on its own '
+                      'process.')),
+    cfg.IntOpt('metrics_flush_interval', default=10,
+               help=_('Minimum seconds between writes of a process\'s '
+                      'latency histograms to metrics_dir.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(metrics_opts)
+
+# Upper bounds, in milliseconds, of the histogram buckets. A final bucket
+#   holds anything slower.
+BUCKET_BOUNDS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+                    1000, 2500, 5000, 10000)
+PERCENTILES = (50, 90, 99)
+
+_LOCAL = threading.local()
+_REGISTRY = None
+
+
+class Histogram(object):
+    """Fixed-bucket histogram of latencies in milliseconds."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, elapsed_ms)] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def percentile(self, percent):
+        """
+        Returns an upper bound on the given percentile, being the bound of
+        the bucket it falls in, or the maximum for the slowest bucket.
+        """
+        if not self.count:
+            return None
+        rank = self.count * percent / 100.0
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def summary(self):
+        summary = {'count': self.count,
+                   'mean_ms': self.total_ms / self.count if self.count
+                   else None,
+                   'max_ms': self.max_ms}
+        for percent in PERCENTILES:
+            summary['p{0}_ms'.format(percent)] = self.percentile(percent)
+        return summary
+
+    def to_dict(self):
+        return {'counts': self.counts, 'total_ms': self.total_ms,
+                'max_ms': self.max_ms}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = list(data['counts'])
+        histogram.count = sum(histogram.counts)
+        histogram.total_ms = data['total_ms']
+        histogram.max_ms = data['max_ms']
+        return histogram
+
+
+class MetricsRegistry(object):
+    """
+    Thread-safe collection of latency histograms, keyed by scope name and
+    stage name, with a stage name of None for the scope's total latency.
+    """
+
+    def __init__(self, timer=time.time):
+        self.timer = timer
+        self._histograms = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+        self._last_flush = timer()
+
+    def record(self, scope_name, elapsed, stages, failed=False):
+        """
+        Records a completed scope.
+
+        :param elapsed: the scope's total latency, in seconds.
+        :param stages: dict of stage name to seconds spent in that stage.
+        :param failed: whether the scope ended with an exception.
+        """
+        with self._lock:
+            self._observe(scope_name, None, elapsed)
+            for stage_name, stage_elapsed in stages.iteritems():
+                self._observe(scope_name, stage_name, stage_elapsed)
+            if failed:
+                self._errors[scope_name] = self._errors.get(scope_name,
+                                                            0) + 1
+        self.flush()
+
+    def _observe(self, scope_name, stage_name, elapsed):
+        key = (scope_name, stage_name)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        histogram.observe(elapsed * 1000.0)
+
+    def to_dict(self):
+        """Returns the raw histograms, suitable for merging."""
+        with self._lock:
+            return {'histograms': [[scope_name, stage_name,
+                                    histogram.to_dict()]
+                                   for (scope_name, stage_name), histogram
+                                   in self._histograms.iteritems()],
+                    'errors': dict(self._errors)}
+
+    def merge(self, data):
+        """Merges raw histograms from to_dict() into this registry."""
+        with self._lock:
+            for scope_name, stage_name, histogram in data['histograms']:
+                key = (scope_name, stage_name)
+                histogram = Histogram.from_dict(histogram)
+                if key in self._histograms:
+                    self._histograms[key].merge(histogram)
+                else:
+                    self._histograms[key] = histogram
+            for scope_name, errors in data['errors'].iteritems():
+                self._errors[scope_name] = self._errors.get(scope_name,
+                                                            0) + errors
+
+    def summary(self):
+        """
+        Returns a dict of scope name to the summary of its total latency,
+        with the summaries of its stages under 'stages'.
+        """
+        with self._lock:
+            summary = {}
+            for (scope_name, stage_name), histogram in \
+                    self._histograms.iteritems():
+                scope = summary.setdefault(scope_name, {'stages': {}})
+                if stage_name is None:
+                    scope.update(histogram.summary())
+                    scope['errors'] = self._errors.get(scope_name, 0)
+                else:
+                    scope['stages'][stage_name] = histogram.summary()
+            return summary
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._errors.clear()
+
+    def flush(self, force=False):
+        """
+        Writes this process's histograms to metrics_dir, if configured and
+        metrics_flush_interval has passed since they were last written.
+        """
+        if not CONF.metrics_dir:
+            return
+        now = self.timer()
+        if not force and now - self._last_flush < CONF.metrics_flush_interval:
+            return
+        self._last_flush = now
+
+        try:
+            _write_file(CONF.metrics_dir, os.getpid(), self.to_dict())
+        except (IOError, OSError):
+            LOG.exception(_('Unable to write metrics to %s'), CONF.metrics_dir)
+
+
+def _write_file(metrics_dir, pid, data):
+    """Atomically replaces the metrics file for the process."""
+    try:
+        os.makedirs(metrics_dir)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    fd, temp_path = tempfile.mkstemp(dir=metrics_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as temp_file:
+        temp_file.write(json.dumps(data))
+    os.rename(temp_path, os.path.join(metrics_dir,
+                                      '{0}.json'.format(pid)))
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+def collect():
+    """
+    Returns the latency summary of this process merged with those written
+    to metrics_dir by other processes that are still running. The files of
+    processes that have exited are removed.
+    """
+    registry = get_registry()
+    if not CONF.metrics_dir:
+        return registry.summary()
+
+    merged = MetricsRegistry()
+    merged.merge(registry.to_dict())
+    for path in glob.glob(os.path.join(CONF.metrics_dir, '*.json')):
+        try:
+            pid = int(os.path.basename(path)[:-len('.json')])
+        except ValueError:
+            continue
+        if pid == os.getpid():
+            continue
+        try:
+            if not _is_running(pid):
+                os.remove(path)
+                continue
+            with open(path) as metrics_file:
+                merged.merge(json.loads(metrics_file.read()))
+        except (IOError, OSError, ValueError):
+            LOG.exception(_('Unable to read metrics from %s'), path)
+    return merged.summary()
+
+
+def get_registry():
+    """Returns the process-local metrics registry."""
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = MetricsRegistry()
+    return _REGISTRY
+
+
+def _scope_stack():
+    stack = getattr(_LOCAL, 'scopes', None)
+    if stack is None:
+        stack = _LOCAL.scopes = []
+    return stack
+
+
+class _Scope(object):
+    """Context manager timing a scope, and accumulating its stage times."""
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}
+        self.active = set()
+
+    def __enter__(self):
+        self.start = time.time()
+        _scope_stack().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.time() - self.start
+        stack = _scope_stack()
+        stack.pop()
+        if stack:
+            stack[-1].add_stage_time(self.name, elapsed)
+        get_registry().record(self.name, elapsed, self.stages,
+                              failed=exc_type is not None)
+
+    def add_stage_time(self, name, elapsed):
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+
+class _Stage(object):
+    """Context manager timing a stage of the current scope, if any."""
+
+    def __init__(self, name):
+        self.name = name
+        self.scope = None
+
+    def __enter__(self):
+        stack = _scope_stack()
+        if stack and self.name not in stack[-1].active:
+            self.scope = stack[-1]
+            self.scope.active.add(self.name)
+            self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.scope:
+            self.scope.active.discard(self.name)
+            self.scope.add_stage_time(self.name, time.time() - self.start)
+
+
+def scope(name):
+    """
+    Returns a context manager timing a unit of work, such as an API
+    request, which records its latency and that of its stages when it
+    ends. A scope run within another is also recorded as a stage of the
+    outer one.
+    """
+    return _Scope(name)
+
+
+def stage(name):
+    """
+    Returns a context manager timing a stage of the current scope. The time
+    spent in each stage is totalled over the scope, so that repeated calls
+    count towards one sample. Stages run outside of any scope, or within a
+    stage of the same name, are not timed.
+    """
+    return _Stage(name)
+
+
+def add_stage_time(name, elapsed):
+    """
+    Adds time measured by other means, in seconds, to a stage of the
+    current scope, if any.
+    """
+    stack = _scope_stack()
+    if stack:
+        stack[-1].add_stage_time(name, elapsed)
+
+
+def _default_name(fn, args):
+    return '{0}.{1}'.format(type(args[0]).__name__, fn.__name__)
+
+
+def scoped(scope_name=None):
+    """
+    Decorator running each call to a function within a scope. The scope
+    name defaults to '<class name>.<method name>', for methods.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Scope(scope_name or _default_name(fn, args)):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed(stage_name=None):
+    """
+    Decorator timing each call to a function as a stage. The stage name
+    defaults to '<class name>.<method name>', for methods.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Stage(stage_name or _default_name(fn, args)):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
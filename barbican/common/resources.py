@@ -16,28 +16,75 @@
 """
 Shared business logic.
 """
+import itertools
 from sys import getsizeof
-from barbican.common import exception, validators
+from oslo.config import cfg
+from barbican.common import cache, exception, metrics, validators
 from barbican.model import models
 from barbican.common import utils
+from barbican.openstack.common.gettextutils import _
 
 
 LOG = utils.getLogger(__name__)
 
+tenant_cache_opts = [
+    cfg.IntOpt('tenant_cache_max_size', default=10000,
+               help=_('Maximum number of keystone-ID to tenant mappings '
+                      'cached per process.')),
+    cfg.IntOpt('tenant_cache_ttl', default=300,
+               help=_('Seconds a cached keystone-ID to tenant mapping '
+                      'remains valid. Zero disables expiry.')),
+]
 
+CONF = cfg.CONF
+CONF.register_opts(tenant_cache_opts)
+
+_TENANT_CACHE = None
+
+
+def get_tenant_cache():
+    """Returns the process-local keystone-ID to tenant-ID cache."""
+    global _TENANT_CACHE
+    if _TENANT_CACHE is None:
+        _TENANT_CACHE = cache.LRUCache(CONF.tenant_cache_max_size,
+                                       ttl=CONF.tenant_cache_ttl or None)
+    return _TENANT_CACHE
+
+
+@metrics.timed('tenant_lookup')
 def get_or_create_tenant(keystone_id, tenant_repo):
     """
     Returns tenant with matching keystone_id.  Creates it if it does
     not exist.
+
+    Resolved tenant IDs are cached per process, in which case the returned
+    tenant is a detached entity holding just its ID and keystone_id.
     """
+    tenant_cache = get_tenant_cache()
+    tenant_id = tenant_cache.get(keystone_id)
+    if tenant_id:
+        tenant = models.Tenant()
+        tenant.id = tenant_id
+        tenant.keystone_id = keystone_id
+        tenant.status = models.States.ACTIVE
+        return tenant
+
     tenant = tenant_repo.find_by_keystone_id(keystone_id,
                                              suppress_exception=True)
     if not tenant:
-        LOG.debug('Creating tenant for {0}'.format(keystone_id))
+        LOG.debug('Creating tenant for %s', keystone_id)
         tenant = models.Tenant()
         tenant.keystone_id = keystone_id
         tenant.status = models.States.ACTIVE
-        tenant_repo.create_from(tenant)
+        try:
+            tenant_repo.create_from(tenant)
+        except exception.Duplicate:
+            # Another request created this tenant concurrently, so use
+            # that one instead.
+            LOG.debug('Tenant for %s already created', keystone_id)
+            tenant = tenant_repo.find_by_keystone_id(keystone_id)
+
+    tenant_cache.put(keystone_id, tenant.id)
     return tenant
 
 
@@ -47,9 +94,7 @@ def create_secret(data, tenant, crypto_manager,
     """
     Common business logic to create a secret.
     """
-    time_keeper = utils.TimeKeeper('Create Secret Resource')
     new_secret = models.Secret(data)
-    time_keeper.mark('after Secret model create')
     new_datum = None
 
     if 'plain_text' in data:
@@ -63,41 +108,125 @@ def create_secret(data, tenant, crypto_manager,
         new_datum = crypto_manager.encrypt(data['plain_text'],
                                            new_secret,
                                            tenant)
-        time_keeper.mark('after encrypt')
 
     elif ok_to_generate:
         LOG.debug('Generating new secret...')
         new_datum = crypto_manager.generate_data_encryption_key(new_secret,
                                                                 tenant)
-        time_keeper.mark('after secret generate')
 
     else:
         LOG.debug('Creating metadata only for the new secret. '
                   'A subsequent PUT is required')
         crypto_manager.supports(new_secret, tenant)
-        time_keeper.mark('after supports check')
-
-    # Create Secret entities in datastore.
-    secret_repo.create_from(new_secret)
-    time_keeper.mark('after Secret datastore create')
-    new_assoc = models.TenantSecret()
-    time_keeper.mark('after TenantSecret model create')
-    new_assoc.tenant_id = tenant.id
-    new_assoc.secret_id = new_secret.id
-    new_assoc.role = "admin"
-    new_assoc.status = models.States.ACTIVE
-    tenant_secret_repo.create_from(new_assoc)
-    time_keeper.mark('after TenantSecret datastore create')
-    if new_datum:
-        new_datum.secret_id = new_secret.id
-        datum_repo.create_from(new_datum)
-        time_keeper.mark('after Datum datastore create')
 
-    time_keeper.dump()
+    # Create Secret entities in datastore, within a single transaction.
+    session = secret_repo.get_session()
+    with metrics.stage('transaction'), session.begin():
+        secret_repo.create_from(new_secret, session=session)
+        new_assoc = models.TenantSecret()
+        new_assoc.tenant_id = tenant.id
+        new_assoc.secret_id = new_secret.id
+        new_assoc.role = "admin"
+        new_assoc.status = models.States.ACTIVE
+        tenant_secret_repo.create_from(new_assoc, session=session)
+        if new_datum:
+            new_datum.secret_id = new_secret.id
+            datum_repo.create_from(new_datum, session=session)
 
     return new_secret
 
 
+def create_secrets(data_list, tenant, crypto_manager,
+                   secret_repo, tenant_secret_repo, datum_repo,
+                   ok_to_generate=False, session=None):
+    """
+    Common business logic to create many secrets at once.
+
+    Secrets that can be created are encrypted (or, if ok_to_generate, have
+    their keys generated) as a batch and then written, with bulk inserts,
+    in a single transaction. Secrets that cannot be created do not prevent
+    the others from being created.
+
+    :param data_list: list of validated new secret dicts.
+    :param session: if supplied, the secrets are written within this
+                    session's current transaction, which the caller is
+                    responsible for committing.
+    :returns: list -- aligned with data_list, holding either the new Secret
+              entity or the exception explaining why it was not created.
+    """
+    results = [None] * len(data_list)
+    new_secrets = []
+    to_encrypt = []
+    to_generate = []
+
+    for index, data in enumerate(data_list):
+        new_secret = models.Secret(data)
+        try:
+            if 'plain_text' in data:
+                if not data['plain_text']:
+                    raise exception.NoDataToProcess()
+                if validators.secret_too_big(data['plain_text']):
+                    raise exception.LimitExceeded()
+            crypto_manager.supports(new_secret, tenant)
+        except Exception as e:
+            LOG.debug('Secret %s of batch not created: %s', index, e)
+            results[index] = e
+            continue
+
+        results[index] = new_secret
+        new_secrets.append(new_secret)
+        if 'plain_text' in data:
+            to_encrypt.append((data['plain_text'], new_secret))
+        elif ok_to_generate:
+            to_generate.append(new_secret)
+
+    LOG.debug('Encrypting %s plain_text secrets...', len(to_encrypt))
+    new_datums = crypto_manager.encrypt_batch(to_encrypt, tenant)
+
+    if to_generate:
+        LOG.debug('Generating %s new secrets...', len(to_generate))
+        new_datums.extend(crypto_manager.generate_data_encryption_keys(
+            to_generate, tenant))
+    datum_secrets = [new_secret for _unused, new_secret in to_encrypt]
+    datum_secrets.extend(to_generate)
+
+    if new_secrets:
+        if session:
+            _create_all_secrets(new_secrets, new_datums, datum_secrets,
+                                tenant, secret_repo, tenant_secret_repo,
+                                datum_repo, session)
+        else:
+            # Create Secret entities in datastore, within one transaction.
+            session = secret_repo.get_session()
+            with metrics.stage('transaction'), session.begin():
+                _create_all_secrets(new_secrets, new_datums, datum_secrets,
+                                    tenant, secret_repo, tenant_secret_repo,
+                                    datum_repo, session)
+
+    return results
+
+
+def _create_all_secrets(new_secrets, new_datums, datum_secrets, tenant,
+                        secret_repo, tenant_secret_repo, datum_repo,
+                        session):
+    """Bulk creates the secrets, their associations and their datums."""
+    secret_repo.create_all_from(new_secrets, session)
+
+    new_assocs = []
+    for new_secret in new_secrets:
+        new_assoc = models.TenantSecret()
+        new_assoc.tenant_id = tenant.id
+        new_assoc.secret_id = new_secret.id
+        new_assoc.role = "admin"
+        new_assoc.status = models.States.ACTIVE
+        new_assocs.append(new_assoc)
+    tenant_secret_repo.create_all_from(new_assocs, session)
+
+    for new_datum, new_secret in zip(new_datums, datum_secrets):
+        new_datum.secret_id = new_secret.id
+    datum_repo.create_all_from(new_datums, session)
+
+
 def create_encrypted_datum(secret, plain_text, tenant, crypto_manager,
                            tenant_secret_repo, datum_repo):
     """
@@ -128,14 +257,54 @@ def create_encrypted_datum(secret, plain_text, tenant, crypto_manager,
     new_datum = crypto_manager.encrypt(plain_text,
                                        secret,
                                        tenant)
-    datum_repo.create_from(new_datum)
 
-    # Create Tenant/Secret entity.
-    new_assoc = models.TenantSecret()
-    new_assoc.tenant_id = tenant.id
-    new_assoc.secret_id = secret.id
-    new_assoc.role = "admin"
-    new_assoc.status = models.States.ACTIVE
-    tenant_secret_repo.create_from(new_assoc)
+    _store_encrypted_datum(new_datum, secret, tenant,
+                           tenant_secret_repo, datum_repo)
 
     return new_datum
+
+
+def create_encrypted_datum_from_chunks(secret, chunks, tenant,
+                                       crypto_manager, tenant_secret_repo,
+                                       datum_repo):
+    """
+    Modifies the secret to add secret information provided in chunks, such
+    as read from a request body, which are encrypted as they are consumed
+    rather than first being joined.
+
+    :param chunks: iterable of byte data, which should raise LimitExceeded
+                   itself if too much data is provided.
+    :retval The new encrypted datum
+    """
+    if secret.encrypted_data:
+        raise ValueError('Secret already has encrypted data stored for it.')
+
+    chunks = iter(chunks)
+    first_chunk = next(chunks, None)
+    if not first_chunk:
+        raise exception.NoDataToProcess()
+
+    LOG.debug('Encrypting streamed secret')
+    new_datum = crypto_manager.encrypt_stream(
+        itertools.chain([first_chunk], chunks), secret, tenant)
+
+    _store_encrypted_datum(new_datum, secret, tenant,
+                           tenant_secret_repo, datum_repo)
+
+    return new_datum
+
+
+def _store_encrypted_datum(new_datum, secret, tenant,
+                           tenant_secret_repo, datum_repo):
+    """Creates the datum and its tenant/secret association."""
+    # Create Datum and Tenant/Secret entities, within a single transaction.
+    session = datum_repo.get_session()
+    with metrics.stage('transaction'), session.begin():
+        datum_repo.create_from(new_datum, session=session)
+
+        new_assoc = models.TenantSecret()
+        new_assoc.tenant_id = tenant.id
+        new_assoc.secret_id = secret.id
+        new_assoc.role = "admin"
+        new_assoc.status = models.States.ACTIVE
+        tenant_secret_repo.create_from(new_assoc, session=session)
@@ -6,25 +6,145 @@ import abc
 import jsonschema as schema
 from oslo.config import cfg
 from barbican.common import exception
+from barbican.openstack.common import jsonutils as json
 from barbican.openstack.common import timeutils
 from barbican.common import utils
 
 
 LOG = utils.getLogger(__name__)
 DEFAULT_MAX_SECRET_BYTES = 10000
+DEFAULT_MAX_SECRETS_PER_BATCH = 1000
 common_opts = [
     cfg.IntOpt('max_allowed_secret_in_bytes',
                default=DEFAULT_MAX_SECRET_BYTES),
+    cfg.IntOpt('max_secrets_per_batch',
+               default=DEFAULT_MAX_SECRETS_PER_BATCH,
+               help=_('Maximum number of secrets accepted by a single '
+                      'batch request.')),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(common_opts)
 
 
+# Python types accepted for each JSON schema (draft 4) primitive type.
+_FAST_TYPES = {
+    'array': (list,),
+    'boolean': (bool,),
+    'integer': (int, long),
+    'null': (type(None),),
+    'number': (int, long, float),
+    'object': (dict,),
+    'string': (basestring,),
+}
+
+# Schema keywords the fast path knows how to evaluate.
+_FAST_SCHEMA_KEYWORDS = frozenset(['type', 'properties', 'required'])
+_FAST_PROPERTY_KEYWORDS = frozenset(['type', 'enum', 'minimum'])
+
+_COMPILED_SCHEMAS = {}
+
+
 def secret_too_big(data):
     return len(data.encode('utf-8')) > CONF.max_allowed_secret_in_bytes
 
 
+def compile_schema(schema_dict):
+    """
+    Returns a CompiledSchema for the provided schema, compiling it only the
+    first time a given schema is seen by this process.
+    """
+    key = json.dumps(schema_dict, sort_keys=True)
+    compiled = _COMPILED_SCHEMAS.get(key)
+    if compiled is None:
+        compiled = _COMPILED_SCHEMAS.setdefault(key,
+                                                CompiledSchema(schema_dict))
+    return compiled
+
+
+def _build_property_check(property_schema):
+    """Returns a (types, enum, minimum) tuple, or None if not supported."""
+    if not set(property_schema).issubset(_FAST_PROPERTY_KEYWORDS):
+        return None
+    types = _FAST_TYPES.get(property_schema.get('type'))
+    if types is None:
+        return None
+    enum = property_schema.get('enum')
+    if enum is not None:
+        if property_schema['type'] in ('array', 'object'):
+            return None
+        enum = frozenset(enum)
+    return types, enum, property_schema.get('minimum')
+
+
+def _build_fast_checks(schema_dict):
+    """
+    Returns the per-property checks for flat object schemas that only use
+    simple keywords, or None if the schema needs the full validator.
+    """
+    if not set(schema_dict).issubset(_FAST_SCHEMA_KEYWORDS) or \
+            schema_dict.get('type') != 'object':
+        return None
+
+    checks = {}
+    for name, property_schema in schema_dict.get('properties', {}).items():
+        check = _build_property_check(property_schema)
+        if check is None:
+            return None
+        checks[name] = check
+    return checks, tuple(schema_dict.get('required', ()))
+
+
+class CompiledSchema(object):
+    """
+    A JSON schema that has been checked and compiled into a reusable
+    validator once, rather than upon every request.
+
+    Flat object schemas using only simple keywords also get a fast path
+    that accepts valid documents without walking the full validator. Any
+    document the fast path cannot accept is handed to the full validator,
+    so error reporting is unchanged.
+    """
+
+    def __init__(self, schema_dict):
+        schema.Draft4Validator.check_schema(schema_dict)
+        self.schema = schema_dict
+        self.validator = schema.Draft4Validator(
+            schema_dict, format_checker=schema.FormatChecker())
+        self.fast_checks = _build_fast_checks(schema_dict)
+
+    def validate(self, instance):
+        """
+        :raises: schema.ValidationError on schema violations.
+        """
+        if self.fast_checks is None or not self._is_fast_valid(instance):
+            self.validator.validate(instance)
+
+    def _is_fast_valid(self, instance):
+        if not isinstance(instance, dict):
+            return False
+
+        checks, required = self.fast_checks
+        for name in required:
+            if name not in instance:
+                return False
+
+        for name, value in instance.iteritems():
+            check = checks.get(name)
+            if check is None:
+                continue
+            types, enum, minimum = check
+            # bool is a subclass of int, but is not a JSON number.
+            if not isinstance(value, types) or \
+                    (isinstance(value, bool) and bool not in types):
+                return False
+            if enum is not None and value not in enum:
+                return False
+            if minimum is not None and value < minimum:
+                return False
+        return True
+
+
 class ValidatorBase(object):
     """Base class for validators."""
 
@@ -81,12 +201,13 @@ class NewSecretValidator(ValidatorBase):
             },
             "required": ["mime_type"]
         }
+        self.compiled_schema = compile_schema(self.schema)
 
     def validate(self, json_data, parent_schema=None):
         schema_name = self._full_name(parent_schema)
 
         try:
-            schema.validate(json_data, self.schema)
+            self.compiled_schema.validate(json_data)
         except schema.ValidationError as e:
             raise exception.InvalidObject(schema=schema_name, reason=str(e))
 
@@ -143,6 +264,48 @@ class NewSecretValidator(ValidatorBase):
         return expiration
 
 
+class NewSecretsBatchValidator(ValidatorBase):
+    """
+    Validate the envelope of a batch of new secrets.
+
+    The individual secrets are validated only via validate_secret(), so
+    that one invalid secret does not reject the whole batch.
+    """
+
+    def __init__(self):
+        self.name = 'Secrets'
+        self.schema = {
+            "type": "object",
+            "properties": {
+                "secrets": {
+                    "type": "array",
+                    "minItems": 1
+                },
+            },
+            "required": ["secrets"]
+        }
+        self.compiled_schema = compile_schema(self.schema)
+        self.secret_validator = NewSecretValidator()
+
+    def validate(self, json_data, parent_schema=None):
+        schema_name = self._full_name(parent_schema)
+
+        try:
+            self.compiled_schema.validate(json_data)
+        except schema.ValidationError as e:
+            raise exception.InvalidObject(schema=schema_name, reason=str(e))
+
+        if len(json_data['secrets']) > CONF.max_secrets_per_batch:
+            raise exception.LimitExceeded()
+
+        return json_data
+
+    def validate_secret(self, json_data):
+        """Validate one secret of the batch, as for NewSecretValidator."""
+        return self.secret_validator.validate(json_data,
+                                              parent_schema=self.name)
+
+
 class NewOrderValidator(ValidatorBase):
     """Validate a new order."""
 
@@ -153,13 +316,14 @@ class NewOrderValidator(ValidatorBase):
             "properties": {
             },
         }
+        self.compiled_schema = compile_schema(self.schema)
         self.secret_validator = NewSecretValidator()
 
     def validate(self, json_data, parent_schema=None):
         schema_name = self._full_name(parent_schema)
 
         try:
-            schema.validate(json_data, self.schema)
+            self.compiled_schema.validate(json_data)
         except schema.ValidationError as e:
             raise exception.InvalidObject(schema=schema_name, reason=str(e))
 
@@ -41,7 +41,7 @@ class RequestContext(object):
         self.owner_is_tenant = owner_is_tenant
         self.request_id = uuidutils.generate_uuid()
         self.service_catalog = service_catalog
-        self.policy_enforcer = policy_enforcer or policy.Enforcer()
+        self.policy_enforcer = policy_enforcer or policy.get_enforcer()
         self.is_admin = is_admin
         if not self.is_admin:
             self.is_admin = \
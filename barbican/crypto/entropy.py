@@ -0,0 +1,106 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Buffered source of cryptographically secure random bytes.
+"""
+import os
+import threading
+
+from oslo.config import cfg
+
+from barbican.openstack.common.gettextutils import _
+
+
+CONF = cfg.CONF
+
+crypto_opt_group = cfg.OptGroup(name='crypto',
+                                title='Crypto Plugin Options')
+entropy_opts = [
+    cfg.IntOpt('entropy_pool_bytes',
+               default=65536,
+               help=_('Number of random bytes read from the operating '
+                      'system at a time to serve keys and IVs.')),
+]
+CONF.register_group(crypto_opt_group)
+CONF.register_opts(entropy_opts, group=crypto_opt_group)
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+class EntropyPool(object):
+    """
+    Serves random bytes from a buffer filled by large reads from the
+    operating system's CSPRNG, rather than making a system call for each
+    key or IV.
+
+    Bytes are never served twice. The buffer is discarded when the process
+    ID changes, so that forked processes (such as uWSGI or Celery workers)
+    never serve the same bytes as their parent or siblings.
+    """
+
+    def __init__(self, buffer_size, source=os.urandom):
+        """
+        :param buffer_size: Number of bytes read from source per refill.
+        :param source: Function returning the requested number of random
+                       bytes, overridable for testing.
+        """
+        self.buffer_size = max(1, buffer_size)
+        self.source = source
+        self.refills = 0
+        self._buffer = b''
+        self._offset = 0
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def get_bytes(self, num_bytes):
+        """Returns num_bytes random bytes."""
+        if num_bytes > self.buffer_size:
+            return self.source(num_bytes)
+
+        with self._lock:
+            pid = os.getpid()
+            if pid != self._pid:
+                # Forked: never serve bytes the parent may also serve.
+                self._buffer = b''
+                self._offset = 0
+                self._pid = pid
+
+            end = self._offset + num_bytes
+            if end > len(self._buffer):
+                self._buffer = self.source(self.buffer_size)
+                self.refills += 1
+                self._offset = 0
+                end = num_bytes
+
+            random_bytes = self._buffer[self._offset:end]
+            self._offset = end
+            return random_bytes
+
+
+def get_pool():
+    """Returns the process-wide entropy pool, creating it on first use."""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = EntropyPool(CONF.crypto.entropy_pool_bytes)
+    return _POOL
+
+
+def get_random_bytes(num_bytes):
+    """Returns num_bytes random bytes from the process-wide entropy pool."""
+    return get_pool().get_bytes(num_bytes)
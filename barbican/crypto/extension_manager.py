@@ -13,10 +13,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import codecs
+import threading
+
 from oslo.config import cfg
 from stevedore import named
 
 from barbican.common.exception import BarbicanException
+from barbican.common import metrics
 from barbican.model.models import EncryptedDatum
 from barbican.openstack.common.gettextutils import _
 
@@ -40,6 +44,9 @@ crypto_opts = [
 CONF.register_group(crypto_opt_group)
 CONF.register_opts(crypto_opts, group=crypto_opt_group)
 
+_MANAGER = None
+_MANAGER_LOCK = threading.Lock()
+
 
 class CryptoMimeTypeNotSupportedException(BarbicanException):
     """Raised when support for requested mime type is
@@ -72,6 +79,18 @@ class CryptoNoSecretOrDataException(BarbicanException):
         self.mime_type = mime_type
 
 
+class CryptoPluginConflictException(BarbicanException):
+    """Raised when more than one active plugin declares support for the
+    same mime-type."""
+    def __init__(self, mime_type, plugin_names):
+        super(CryptoPluginConflictException, self).__init__(
+            _("Crypto Mime Type of '{0}' is supported by more than one "
+              "plugin: {1}").format(mime_type, ', '.join(plugin_names))
+        )
+        self.mime_type = mime_type
+        self.plugin_names = plugin_names
+
+
 class CryptoExtensionManager(named.NamedExtensionManager):
     def __init__(self, conf=CONF, invoke_on_load=True,
                  invoke_args=(), invoke_kwargs={}):
@@ -82,41 +101,219 @@ class CryptoExtensionManager(named.NamedExtensionManager):
             invoke_args=invoke_args,
             invoke_kwds=invoke_kwargs
         )
+        self.build_dispatch_table()
+
+    def build_dispatch_table(self):
+        """
+        Builds the mime-type to plugin dispatch table from the active
+        plugins' declared supported_types.
+
+        Plugins that do not declare their supported types are instead
+        resolved via supports(), in load order, the first time each
+        mime-type is requested, and the result is then added to the table.
+
+        :raises: CryptoPluginConflictException if more than one plugin
+                 declares support for the same mime-type.
+        """
+        plugins_by_mime_type = {}
+        names_by_mime_type = {}
+        for ext in self.extensions:
+            for mime_type in getattr(ext.obj, 'supported_types', None) or ():
+                if mime_type in names_by_mime_type:
+                    raise CryptoPluginConflictException(
+                        mime_type, [names_by_mime_type[mime_type], ext.name])
+                names_by_mime_type[mime_type] = ext.name
+                plugins_by_mime_type[mime_type] = ext.obj
+        self.plugins_by_mime_type = plugins_by_mime_type
+
+    def _find_plugin(self, mime_type):
+        """Returns the active plugin supporting mime_type, or None."""
+        plugin = self.plugins_by_mime_type.get(mime_type)
+        if plugin is None:
+            for ext in self.extensions:
+                if ext.obj.supports(mime_type):
+                    plugin = ext.obj
+                    # Only supported mime-types are added, so that
+                    #   arbitrary client-supplied types cannot grow the
+                    #   table.
+                    self.plugins_by_mime_type[mime_type] = plugin
+                    break
+        return plugin
+
+    def _index_data(self, secret):
+        """
+        Returns a dict of the secret's encrypted data by mime-type, built
+        in one pass. The first datum of each mime-type is used.
+        """
+        data_by_mime_type = {}
+        for datum in reversed(secret.encrypted_data or ()):
+            data_by_mime_type[datum.mime_type] = datum
+        return data_by_mime_type
+
+    def _find_datum(self, secret, mime_type):
+        """Returns the secret's encrypted datum of mime_type, or None."""
+        return self._index_data(secret).get(mime_type)
 
+    @metrics.timed()
     def encrypt(self, unencrypted, secret, tenant):
         """Delegates encryption to active plugins."""
+        plugin = self._find_plugin(secret.mime_type)
+        if not plugin:
+            raise CryptoMimeTypeNotSupportedException(secret.mime_type)
+
         if secret.mime_type == 'text/plain':
             unencrypted = unencrypted.encode('utf-8')
 
-        for ext in self.extensions:
-            if ext.obj.supports(secret.mime_type):
-                datum = EncryptedDatum(secret)
-                datum.cypher_text, datum.kek_metadata = ext.obj.encrypt(
-                    unencrypted, tenant
-                )
-                return datum
-        else:
+        datum = EncryptedDatum(secret)
+        datum.cypher_text, datum.kek_metadata = plugin.encrypt(unencrypted,
+                                                               tenant)
+        return datum
+
+    @metrics.timed()
+    def encrypt_stream(self, chunks, secret, tenant):
+        """
+        Delegates encryption of secret data provided in chunks, such as
+        read from a request body, to active plugins.
+
+        text/plain data is expected to be UTF-8 encoded already.
+
+        :param chunks: iterable of byte data, in order.
+        :raises: CryptoMimeTypeNotSupportedException if the secret's
+                 mime-type is not supported, UnicodeDecodeError if
+                 text/plain data is not valid UTF-8.
+        """
+        plugin = self._find_plugin(secret.mime_type)
+        if not plugin:
             raise CryptoMimeTypeNotSupportedException(secret.mime_type)
 
+        if secret.mime_type == 'text/plain':
+            chunks = _check_utf8(chunks)
+
+        datum = EncryptedDatum(secret)
+        datum.cypher_text, datum.kek_metadata = plugin.encrypt_stream(chunks,
+                                                                      tenant)
+        return datum
+
+    @metrics.timed()
+    def encrypt_batch(self, unencrypted_secrets, tenant):
+        """
+        Delegates encryption of many secrets to active plugins, resolving
+        the plugin once per mime-type and encrypting each mime-type's
+        secrets in one plugin call.
+
+        :param unencrypted_secrets: list of (unencrypted, secret) tuples.
+        :param tenant: Tenant associated with the secrets.
+        :returns: list -- EncryptedDatum entities, in the provided order.
+        :raises: CryptoMimeTypeNotSupportedException if any secret's
+                 mime-type is not supported.
+        """
+        indexes_by_mime_type = {}
+        for index, (unencrypted, secret) in enumerate(unencrypted_secrets):
+            indexes_by_mime_type.setdefault(secret.mime_type,
+                                            []).append(index)
+
+        datums = [None] * len(unencrypted_secrets)
+        for mime_type, indexes in indexes_by_mime_type.iteritems():
+            plugin = self._find_plugin(mime_type)
+            if not plugin:
+                raise CryptoMimeTypeNotSupportedException(mime_type)
+
+            unencrypted_list = []
+            for index in indexes:
+                unencrypted = unencrypted_secrets[index][0]
+                if mime_type == 'text/plain':
+                    unencrypted = unencrypted.encode('utf-8')
+                unencrypted_list.append(unencrypted)
+
+            results = plugin.encrypt_batch(unencrypted_list, tenant)
+            for index, (cypher_text, kek_metadata) in zip(indexes, results):
+                datum = EncryptedDatum(unencrypted_secrets[index][1])
+                datum.cypher_text = cypher_text
+                datum.kek_metadata = kek_metadata
+                datums[index] = datum
+
+        return datums
+
+    @metrics.timed()
     def decrypt(self, accept, secret, tenant):
         """Delegates decryption to active plugins."""
 
         if not secret or not secret.encrypted_data:
             raise CryptoNoSecretOrDataException(accept)
 
-        for ext in self.extensions:
-            if ext.obj.supports(accept):
-                for datum in secret.encrypted_data:
-                    if accept == datum.mime_type:
-                        unencrypted = ext.obj.decrypt(datum.cypher_text,
-                                                      datum.kek_metadata,
-                                                      tenant)
-                        if accept == 'text/plain':
-                            unencrypted = unencrypted.decode('utf-8')
-                        return unencrypted
-        else:
+        plugin = self._find_plugin(accept)
+        datum = plugin and self._find_datum(secret, accept)
+        if not datum:
             raise CryptoAcceptNotSupportedException(accept)
 
+        unencrypted = plugin.decrypt(datum.cypher_text, datum.kek_metadata,
+                                     tenant)
+        if accept == 'text/plain':
+            unencrypted = unencrypted.decode('utf-8')
+        return unencrypted
+
+    @metrics.timed()
+    def decrypt_stream(self, accept, secret, tenant):
+        """
+        Delegates decryption to active plugins, as for decrypt(), but
+        returns the unencrypted data as DecryptedData to be read in chunks.
+        Unlike decrypt(), text/plain data is left UTF-8 encoded.
+        """
+        if not secret or not secret.encrypted_data:
+            raise CryptoNoSecretOrDataException(accept)
+
+        plugin = self._find_plugin(accept)
+        datum = plugin and self._find_datum(secret, accept)
+        if not datum:
+            raise CryptoAcceptNotSupportedException(accept)
+
+        return plugin.decrypt_stream(datum.cypher_text, datum.kek_metadata,
+                                     tenant)
+
+    @metrics.timed()
+    def decrypt_batch(self, secrets, tenant):
+        """
+        Delegates decryption of many secrets, each to its own mime-type,
+        to active plugins. The plugin is resolved once per mime-type and
+        each mime-type's secrets are decrypted in one plugin call.
+
+        :param secrets: list of Secret entities, with their encrypted data.
+        :param tenant: Tenant associated with the secrets.
+        :returns: list -- unencrypted data, in the provided order.
+        :raises: CryptoNoSecretOrDataException if a secret has no data of
+                 its mime-type, CryptoAcceptNotSupportedException if no
+                 plugin supports a secret's mime-type.
+        """
+        indexes_by_mime_type = {}
+        data_by_index = []
+        for index, secret in enumerate(secrets):
+            indexes_by_mime_type.setdefault(secret.mime_type,
+                                            []).append(index)
+            data_by_index.append(self._index_data(secret))
+
+        unencrypted_list = [None] * len(secrets)
+        for mime_type, indexes in indexes_by_mime_type.iteritems():
+            plugin = self._find_plugin(mime_type)
+            if not plugin:
+                raise CryptoAcceptNotSupportedException(mime_type)
+
+            encrypted_list = []
+            for index in indexes:
+                datum = data_by_index[index].get(mime_type)
+                if not datum:
+                    raise CryptoNoSecretOrDataException(mime_type)
+                encrypted_list.append((datum.cypher_text,
+                                       datum.kek_metadata))
+
+            results = plugin.decrypt_batch(encrypted_list, tenant)
+            for index, unencrypted in zip(indexes, results):
+                if mime_type == 'text/plain':
+                    unencrypted = unencrypted.decode('utf-8')
+                unencrypted_list[index] = unencrypted
+
+        return unencrypted_list
+
+    @metrics.timed()
     def generate_data_encryption_key(self, secret, tenant):
         """
         Delegates generating a data-encryption key to active plugins.
@@ -126,25 +323,78 @@ class CryptoExtensionManager(named.NamedExtensionManager):
         the plug-in key encryption process, and that encrypted datum
         is then returned from this method.
         """
-        for ext in self.extensions:
-            if ext.obj.supports(secret.mime_type):
-                # TODO: Call plugin's key generation processes.
-                #   Note: It could be the *data* key to generate (for the
-                #   secret algo type) uses a different plug in than that
-                #   used to encrypted the key.
-                data_key = ext.obj.create(secret.algorithm, secret.bit_length)
-                datum = EncryptedDatum(secret)
-                datum.cypher_text, datum.kek_metadata = ext.obj.encrypt(
-                    data_key, tenant
-                )
-                return datum
-        else:
+        plugin = self._find_plugin(secret.mime_type)
+        if not plugin:
             raise CryptoMimeTypeNotSupportedException(secret.mime_type)
 
+        # TODO: Call plugin's key generation processes.
+        #   Note: It could be the *data* key to generate (for the
+        #   secret algo type) uses a different plug in than that
+        #   used to encrypted the key.
+        data_key = plugin.create(secret.algorithm, secret.bit_length)
+        datum = EncryptedDatum(secret)
+        datum.cypher_text, datum.kek_metadata = plugin.encrypt(data_key,
+                                                               tenant)
+        return datum
+
+    @metrics.timed()
+    def generate_data_encryption_keys(self, secrets, tenant):
+        """
+        Delegates generating data-encryption keys for many secrets to
+        active plugins, as for generate_data_encryption_key(). The plugin
+        is resolved once per mime-type and each mime-type's keys are
+        encrypted in one plugin call.
+
+        :returns: list -- EncryptedDatum entities, in the provided order.
+        """
+        indexes_by_mime_type = {}
+        for index, secret in enumerate(secrets):
+            indexes_by_mime_type.setdefault(secret.mime_type,
+                                            []).append(index)
+
+        datums = [None] * len(secrets)
+        for mime_type, indexes in indexes_by_mime_type.iteritems():
+            plugin = self._find_plugin(mime_type)
+            if not plugin:
+                raise CryptoMimeTypeNotSupportedException(mime_type)
+
+            data_keys = [plugin.create(secrets[index].algorithm,
+                                       secrets[index].bit_length)
+                         for index in indexes]
+            results = plugin.encrypt_batch(data_keys, tenant)
+            for index, (cypher_text, kek_metadata) in zip(indexes, results):
+                datum = EncryptedDatum(secrets[index])
+                datum.cypher_text = cypher_text
+                datum.kek_metadata = kek_metadata
+                datums[index] = datum
+
+        return datums
+
+    @metrics.timed()
     def supports(self, secret, tenant):
         """Tests if at least one plug-in supports the secret type."""
-        for ext in self.extensions:
-            if ext.obj.supports(secret.mime_type):
-                return True
-        else:
+        if not self._find_plugin(secret.mime_type):
             raise CryptoMimeTypeNotSupportedException(secret.mime_type)
+        return True
+
+
+def get_manager():
+    """
+    Returns the shared, process-wide CryptoExtensionManager, creating it on
+    first use, so that plugins are loaded once and keep their caches.
+    """
+    global _MANAGER
+    if _MANAGER is None:
+        with _MANAGER_LOCK:
+            if _MANAGER is None:
+                _MANAGER = CryptoExtensionManager()
+    return _MANAGER
+
+
+def _check_utf8(chunks):
+    """Passes chunks through, raising UnicodeDecodeError unless valid UTF-8."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in chunks:
+        decoder.decode(chunk)
+        yield chunk
+    decoder.decode(b'', True)
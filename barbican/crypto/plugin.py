@@ -14,11 +14,16 @@
 # limitations under the License.
 
 import abc
+import hashlib
+import hmac
 
 from Crypto.Cipher import AES
-from Crypto import Random
+from Crypto.Util import Counter
 from oslo.config import cfg
 
+from barbican.common import cache, exception
+from barbican.crypto import entropy
+from barbican.model import models, repositories
 from barbican.openstack.common import jsonutils as json
 from barbican.openstack.common.gettextutils import _
 
@@ -30,7 +35,22 @@ simple_crypto_plugin_group = cfg.OptGroup(name='simple_crypto_plugin',
 simple_crypto_plugin_opts = [
     cfg.StrOpt('kek',
                default=b'sixteen_byte_key',
-               help=_('Key encryption key to be used by Simple Crypto Plugin'))
+               help=_('Key encryption key to be used by Simple Crypto '
+                      'Plugin')),
+    cfg.StrOpt('encryption_engine',
+               default='aes-ctr-hmac-sha256',
+               help=_('Encryption engine used by Simple Crypto Plugin for '
+                      'new secrets, either aes-ctr-hmac-sha256 or '
+                      'aes-128-cbc. Secrets are always decrypted by the '
+                      'engine that encrypted them.')),
+    cfg.IntOpt('tenant_kek_cache_max_size',
+               default=1000,
+               help=_('Maximum number of unwrapped per-tenant key '
+                      'encryption keys cached per process.')),
+    cfg.IntOpt('tenant_kek_cache_ttl',
+               default=300,
+               help=_('Seconds an unwrapped per-tenant key encryption key '
+                      'remains cached. Zero disables expiry.')),
 ]
 CONF.register_group(simple_crypto_plugin_group)
 CONF.register_opts(simple_crypto_plugin_opts, group=simple_crypto_plugin_group)
@@ -41,6 +61,10 @@ class CryptoPluginBase(object):
 
     __metaclass__ = abc.ABCMeta
 
+    # Plugins may list the mime-types they support here, so that the plugin
+    #   manager can index them, and detect conflicts, when they are loaded.
+    supported_types = None
+
     @abc.abstractmethod
     def encrypt(self, unencrypted, tenant):
         """Encrypt unencrypted data in the context of the provided tenant.
@@ -52,6 +76,36 @@ class CryptoPluginBase(object):
 
         """
 
+    def encrypt_batch(self, unencrypted_list, tenant):
+        """Encrypt a list of unencrypted data for the provided tenant.
+
+        Plugins able to amortize per-call costs across many secrets should
+        override this; by default each item is encrypted in turn.
+
+        :param unencrypted_list: list of byte data to be encrypted.
+        :param tenant: Tenant associated with the unencrypted data.
+        :returns: list -- (encrypted data, kek metadata) tuples, in order.
+        :raises: ValueError if any unencrypted item is not byte data.
+
+        """
+        return [self.encrypt(unencrypted, tenant)
+                for unencrypted in unencrypted_list]
+
+    def encrypt_stream(self, chunks, tenant):
+        """Encrypt data provided in chunks for the provided tenant.
+
+        Plugins able to encrypt incrementally should override this, so
+        that the unencrypted data is never held in memory all at once; by
+        default the chunks are joined and encrypted in one call.
+
+        :param chunks: iterable of byte data to be encrypted, in order.
+        :param tenant: Tenant associated with the unencrypted data.
+        :returns: tuple -- contains the encrypted data and kek metadata.
+        :raises: ValueError if any chunk is not byte data.
+
+        """
+        return self.encrypt(b''.join(chunks), tenant)
+
     @abc.abstractmethod
     def decrypt(self, encrypted, kek_metadata, tenant):
         """Decrypt encrypted_datum in the context of the provided tenant.
@@ -63,6 +117,35 @@ class CryptoPluginBase(object):
 
         """
 
+    def decrypt_batch(self, encrypted_list, tenant):
+        """Decrypt a list of encrypted data for the provided tenant.
+
+        Plugins able to amortize per-call costs across many secrets should
+        override this; by default each item is decrypted in turn.
+
+        :param encrypted_list: list of (cyphertext, kek metadata) tuples.
+        :param tenant: Tenant associated with the encrypted data.
+        :returns: list -- unencrypted byte data, in order.
+
+        """
+        return [self.decrypt(encrypted, kek_metadata, tenant)
+                for encrypted, kek_metadata in encrypted_list]
+
+    def decrypt_stream(self, encrypted, kek_metadata, tenant):
+        """Decrypt encrypted data to be read in chunks by byte range.
+
+        Plugins able to decrypt ranges of cyphertext directly should
+        override this, so that the unencrypted data is never held in memory
+        all at once; by default the data is decrypted in one call.
+
+        :param encrypted: cyphertext to be decrypted.
+        :param kek_metadata: metadata that was created by encryption.
+        :param tenant: Tenant associated with the encrypted datum.
+        :returns: DecryptedData -- the unencrypted data.
+
+        """
+        return DecryptedData(self.decrypt(encrypted, kek_metadata, tenant))
+
     @abc.abstractmethod
     def create(self, algorithm, bit_length):
         """Create a new key."""
@@ -72,64 +155,465 @@ class CryptoPluginBase(object):
         """Whether the plugin supports the specified secret type."""
 
 
+class DecryptedData(object):
+    """
+    Unencrypted data that is read in chunks, by byte range.
+
+    This holds the whole unencrypted data; engines that can decrypt ranges
+    of cyphertext directly instead decrypt each chunk as it is read.
+    """
+
+    def __init__(self, unencrypted):
+        self.unencrypted = unencrypted
+        self.length = len(unencrypted)
+
+    def iter_range(self, start, stop, chunk_size):
+        """Yields the unencrypted bytes from start up to (not including)
+        stop, in chunks of at most chunk_size bytes."""
+        for offset in xrange(start, stop, chunk_size):
+            yield self.unencrypted[offset:min(offset + chunk_size, stop)]
+
+
+class EncryptionEngineBase(object):
+    """
+    Base class for symmetric encryption engines used by the crypto plugins.
+
+    Engines are constructed once per key, so any per-key preparation is
+    done up front and reused across calls.
+    """
+
+    __metaclass__ = abc.ABCMeta
+    name = ''
+
+    @abc.abstractmethod
+    def encrypt(self, unencrypted):
+        """Encrypt byte data, returning the self-contained cyphertext."""
+
+    def encrypt_chunks(self, chunks):
+        """Encrypt an iterable of byte data as if it were joined.
+
+        Engines able to encrypt incrementally should override this, so the
+        unencrypted data is never held in memory all at once.
+        """
+        return self.encrypt(b''.join(chunks))
+
+    @abc.abstractmethod
+    def decrypt(self, encrypted):
+        """Decrypt cyphertext produced by encrypt().
+
+        :raises: ValueError if the cyphertext is malformed or tampered with.
+        """
+
+    def decrypt_stream(self, encrypted):
+        """Returns DecryptedData for cyphertext produced by encrypt().
+
+        Engines able to decrypt ranges of cyphertext directly should
+        override this. Any authentication must be completed here, before
+        any data is read.
+
+        :raises: ValueError if the cyphertext is malformed or tampered with.
+        """
+        return DecryptedData(self.decrypt(encrypted))
+
+
+class AESCBCEngine(EncryptionEngineBase):
+    """AES-CBC with PKCS#7 padding, the original Barbican format."""
+
+    name = 'aes-128-cbc'
+
+    def __init__(self, key):
+        self.key = key
+        self.block_size = AES.block_size
+        # Padding strings indexed by pad length, to avoid rebuilding them.
+        self.pads = [chr(length) * length
+                     for length in xrange(self.block_size + 1)]
+
+    def pad(self, unencrypted):
+        """Adds padding to unencrypted byte string."""
+        return unencrypted + self.pads[
+            self.block_size - (len(unencrypted) % self.block_size)]
+
+    def strip_pad(self, unencrypted):
+        pad_length = ord(unencrypted[-1:])
+        return unencrypted[:-pad_length]
+
+    def encrypt(self, unencrypted):
+        iv = entropy.get_random_bytes(self.block_size)
+        encryptor = AES.new(self.key, AES.MODE_CBC, iv)
+        return iv + encryptor.encrypt(self.pad(unencrypted))
+
+    def encrypt_chunks(self, chunks):
+        iv = entropy.get_random_bytes(self.block_size)
+        encryptor = AES.new(self.key, AES.MODE_CBC, iv)
+        encrypted = [iv]
+        pending = b''
+        for chunk in chunks:
+            # CBC only encrypts whole blocks, so carry any remainder over.
+            pending += chunk
+            whole = len(pending) - len(pending) % self.block_size
+            if whole:
+                encrypted.append(encryptor.encrypt(pending[:whole]))
+                pending = pending[whole:]
+        encrypted.append(encryptor.encrypt(self.pad(pending)))
+        return b''.join(encrypted)
+
+    def decrypt(self, encrypted):
+        iv = encrypted[:self.block_size]
+        decryptor = AES.new(self.key, AES.MODE_CBC, iv)
+        return self.strip_pad(decryptor.decrypt(encrypted[self.block_size:]))
+
+    def decrypt_stream(self, encrypted):
+        return _CBCDecryptedData(self, encrypted)
+
+
+class _CBCDecryptedData(DecryptedData):
+    """
+    AES-CBC cyphertext decrypted as it is read. Each block is decrypted
+    using the preceding cyphertext block, which is the IV for the first
+    block, so reading can start at any block.
+    """
+
+    def __init__(self, engine, encrypted):
+        block_size = engine.block_size
+        if len(encrypted) < 2 * block_size or len(encrypted) % block_size:
+            raise ValueError('Encrypted data is not a whole number of '
+                             'blocks')
+
+        self.engine = engine
+        self.encrypted = encrypted
+        decryptor = AES.new(engine.key, AES.MODE_CBC,
+                            encrypted[-2 * block_size:-block_size])
+        pad_length = ord(decryptor.decrypt(encrypted[-block_size:])[-1:])
+        if not 0 < pad_length <= block_size:
+            raise ValueError('Encrypted data has invalid padding')
+        self.length = len(encrypted) - block_size - pad_length
+
+    def iter_range(self, start, stop, chunk_size):
+        block_size = self.engine.block_size
+        chunk_size = max(block_size, chunk_size - chunk_size % block_size)
+
+        if start >= stop:
+            return
+
+        # Unencrypted byte N is in the cyphertext block following the IV at
+        #   offset block_size + N, rounded down to a whole block.
+        offset = start - start % block_size
+        decryptor = AES.new(self.engine.key, AES.MODE_CBC,
+                            self.encrypted[offset:offset + block_size])
+        skip = start - offset
+        while offset < stop:
+            end = min(offset + chunk_size, stop)
+            end += -end % block_size
+            unencrypted = decryptor.decrypt(
+                self.encrypted[offset + block_size:end + block_size])
+            yield unencrypted[skip:stop - offset]
+            skip = 0
+            offset = end
+
+
+class AESCTRHMACEngine(EncryptionEngineBase):
+    """
+    Authenticated encryption using AES-CTR and HMAC-SHA256 in
+    encrypt-then-MAC order. No padding is needed.
+
+    Cyphertext layout is nonce (12 bytes) + encrypted data + tag (32 bytes).
+    Separate encryption and MAC keys are derived from the provided key, and
+    the keyed HMAC state is prepared once and copied for each call.
+
+    Each counter block is the random 96 bit nonce followed by a 32 bit
+    block counter, so a message may be at most 2^32 blocks (64 GiB). The
+    chance of two random nonces colliding stays below 2^-32 for up to 2^32
+    messages, which is the most that should be encrypted under one key.
+    """
+
+    name = 'aes-ctr-hmac-sha256'
+    nonce_size = 12
+    counter_bits = 32
+    tag_size = hashlib.sha256().digest_size
+
+    def __init__(self, key):
+        self.enc_key = hmac.new(key, b'encryption',
+                                hashlib.sha256).digest()[:len(key)]
+        mac_key = hmac.new(key, b'authentication', hashlib.sha256).digest()
+        self.mac = hmac.new(mac_key, digestmod=hashlib.sha256)
+
+    def _cipher(self, nonce, initial_block=0):
+        counter = Counter.new(self.counter_bits, prefix=nonce,
+                              initial_value=initial_block)
+        return AES.new(self.enc_key, AES.MODE_CTR, counter=counter)
+
+    def _tag(self, data):
+        mac = self.mac.copy()
+        mac.update(data)
+        return mac.digest()
+
+    def encrypt(self, unencrypted):
+        nonce = entropy.get_random_bytes(self.nonce_size)
+        sealed = nonce + self._cipher(nonce).encrypt(unencrypted)
+        return sealed + self._tag(sealed)
+
+    def encrypt_chunks(self, chunks):
+        nonce = entropy.get_random_bytes(self.nonce_size)
+        cipher = self._cipher(nonce)
+        mac = self.mac.copy()
+        mac.update(nonce)
+        encrypted = [nonce]
+        for chunk in chunks:
+            encrypted_chunk = cipher.encrypt(chunk)
+            mac.update(encrypted_chunk)
+            encrypted.append(encrypted_chunk)
+        encrypted.append(mac.digest())
+        return b''.join(encrypted)
+
+    def decrypt(self, encrypted):
+        if len(encrypted) < self.nonce_size + self.tag_size:
+            raise ValueError('Encrypted data is too short')
+
+        sealed = encrypted[:-self.tag_size]
+        if not _constant_time_equals(self._tag(sealed),
+                                     encrypted[-self.tag_size:]):
+            raise ValueError('Encrypted data failed authentication')
+
+        nonce = sealed[:self.nonce_size]
+        return self._cipher(nonce).decrypt(sealed[self.nonce_size:])
+
+    def decrypt_stream(self, encrypted):
+        if len(encrypted) < self.nonce_size + self.tag_size:
+            raise ValueError('Encrypted data is too short')
+
+        # Authenticate in place, without copying the sealed data.
+        mac = self.mac.copy()
+        mac.update(buffer(encrypted, 0, len(encrypted) - self.tag_size))
+        if not _constant_time_equals(mac.digest(),
+                                     encrypted[-self.tag_size:]):
+            raise ValueError('Encrypted data failed authentication')
+
+        return _CTRDecryptedData(self, encrypted)
+
+
+class _CTRDecryptedData(DecryptedData):
+    """
+    Authenticated AES-CTR cyphertext decrypted as it is read. The counter
+    for any block can be computed directly, so reading can start anywhere.
+    """
+
+    def __init__(self, engine, encrypted):
+        self.engine = engine
+        self.encrypted = encrypted
+        self.length = len(encrypted) - engine.nonce_size - engine.tag_size
+
+    def iter_range(self, start, stop, chunk_size):
+        nonce_size = self.engine.nonce_size
+        first_block = start // AES.block_size
+        decryptor = self.engine._cipher(self.encrypted[:nonce_size],
+                                        first_block)
+        block_start = first_block * AES.block_size
+        if block_start < start:
+            # Advance the key stream to start, within its first block.
+            decryptor.decrypt(
+                self.encrypted[block_start + nonce_size:start + nonce_size])
+
+        for offset in xrange(start, stop, chunk_size):
+            end = min(offset + chunk_size, stop)
+            yield decryptor.decrypt(
+                self.encrypted[offset + nonce_size:end + nonce_size])
+
+
+ENCRYPTION_ENGINES = dict((engine.name, engine)
+                          for engine in (AESCBCEngine, AESCTRHMACEngine))
+
+
+def _slow_constant_time_equals(first, second):
+    """Compares two byte strings in time independent of their contents."""
+    if len(first) != len(second):
+        return False
+    result = 0
+    for x, y in zip(first, second):
+        result |= ord(x) ^ ord(y)
+    return result == 0
+
+
+# hmac.compare_digest is only available from Python 2.7.7.
+_constant_time_equals = getattr(hmac, 'compare_digest',
+                                _slow_constant_time_equals)
+
+
 class SimpleCryptoPlugin(CryptoPluginBase):
-    """Insecure implementation of the crypto plugin."""
+    """
+    Insecure implementation of the crypto plugin.
+
+    Secrets are encrypted with a per-tenant key encryption key, which is
+    itself stored wrapped by the configured master kek. Unwrapped tenant
+    keys are cached for a limited time, so they are not read and unwrapped
+    for every secret. Secrets encrypted without a tenant, and those stored
+    before tenant keys existed, use the master kek directly.
+    """
 
-    def __init__(self, conf=CONF):
+    plugin_name = 'SimpleCryptoPlugin'
+    tenant_kek_id = 'tenant_kek'
+
+    def __init__(self, conf=CONF, tenant_kek_repo=None):
         self.supported_types = ['text/plain', 'application/octet-stream']
         self.kek = conf.simple_crypto_plugin.kek
+        self.tenant_kek_repo = tenant_kek_repo
+        self.tenant_kek_cache = cache.LRUCache(
+            conf.simple_crypto_plugin.tenant_kek_cache_max_size,
+            ttl=conf.simple_crypto_plugin.tenant_kek_cache_ttl or None)
         self.block_size = AES.block_size
 
+        engine_name = conf.simple_crypto_plugin.encryption_engine
+        if engine_name not in ENCRYPTION_ENGINES:
+            raise ValueError('Unknown encryption engine: '
+                             '{0}'.format(engine_name))
+
+        # Engines, and the kek_metadata they produce, are fixed for the
+        # life of the plugin so both are prepared once.
+        self.engines = self._build_engines(self.kek)
+        self.engines_by_metadata = dict(
+            (self._build_kek_metadata(name), engine)
+            for name, engine in self.engines.items())
+        self.engine = self.engines[engine_name]
+        self.kek_metadata = self._build_kek_metadata(engine_name)
+        self.tenant_engine_names_by_metadata = dict(
+            (self._build_kek_metadata(name, self.tenant_kek_id), name)
+            for name in self.engines)
+        self.tenant_kek_metadata = self._build_kek_metadata(
+            engine_name, self.tenant_kek_id)
+
+    @staticmethod
+    def _build_engines(kek):
+        return dict((name, engine(kek))
+                    for name, engine in ENCRYPTION_ENGINES.items())
+
+    @staticmethod
+    def _build_kek_metadata(engine_name, kek_id='kek_id'):
+        return json.dumps({
+            'plugin': 'SimpleCryptoPlugin',
+            'encryption': engine_name,
+            'kek': kek_id
+        })
+
     def _pad(self, unencrypted):
         """Adds padding to unencrypted byte string."""
-        pad_length = self.block_size - (
-            len(unencrypted) % self.block_size
-        )
-        return unencrypted + (chr(pad_length) * pad_length)
+        return self.engines[AESCBCEngine.name].pad(unencrypted)
 
     def _strip_pad(self, unencrypted):
-        pad_length = ord(unencrypted[-1:])
-        unpadded = unencrypted[:-pad_length]
-        return unpadded
+        return self.engines[AESCBCEngine.name].strip_pad(unencrypted)
+
+    def _find_engine(self, kek_metadata, tenant=None):
+        """Returns the engine that produced the provided kek_metadata."""
+        engine = self.engines_by_metadata.get(kek_metadata)
+        if engine:
+            return engine
+
+        engine_name = self.tenant_engine_names_by_metadata.get(kek_metadata)
+        if not engine_name:
+            metadata = json.loads(kek_metadata)
+            engine_name = metadata.get('encryption', AESCBCEngine.name)
+            if engine_name not in self.engines:
+                raise ValueError('Unknown encryption engine: '
+                                 '{0}'.format(engine_name))
+            if metadata.get('kek') != self.tenant_kek_id:
+                return self.engines[engine_name]
+
+        if not self._has_tenant_kek(tenant):
+            raise ValueError('A tenant is required to decrypt data '
+                             'encrypted with a tenant key')
+        return self._get_tenant_engines(tenant)[engine_name]
+
+    def _has_tenant_kek(self, tenant):
+        return tenant is not None and tenant.id is not None
+
+    def _get_tenant_kek_repo(self):
+        if self.tenant_kek_repo is None:
+            self.tenant_kek_repo = repositories.get_tenant_kek_repository()
+        return self.tenant_kek_repo
+
+    def _get_tenant_engines(self, tenant):
+        """Returns engines keyed by the tenant's key encryption key."""
+        engines = self.tenant_kek_cache.get(tenant.id)
+        if engines is None:
+            engines = self._build_engines(self._get_tenant_kek(tenant))
+            self.tenant_kek_cache.put(tenant.id, engines)
+        return engines
+
+    def _get_tenant_kek(self, tenant):
+        """
+        Returns the tenant's unwrapped key encryption key, generating and
+        storing a new one if the tenant does not have one yet.
+        """
+        tenant_kek_repo = self._get_tenant_kek_repo()
+        tenant_kek = tenant_kek_repo.find_by_tenant_id(
+            tenant.id, self.plugin_name, suppress_exception=True)
+        if tenant_kek:
+            return self._find_engine(tenant_kek.wrap_metadata).decrypt(
+                tenant_kek.wrapped_kek)
+
+        kek = entropy.get_random_bytes(len(self.kek))
+        tenant_kek = models.TenantKEK()
+        tenant_kek.tenant_id = tenant.id
+        tenant_kek.plugin_name = self.plugin_name
+        tenant_kek.wrapped_kek = self.engine.encrypt(kek)
+        tenant_kek.wrap_metadata = self.kek_metadata
+        tenant_kek.status = models.States.ACTIVE
+        try:
+            tenant_kek_repo.create_from(tenant_kek)
+        except exception.Duplicate:
+            # Another request created this tenant's key concurrently, so
+            # use that one instead.
+            tenant_kek = tenant_kek_repo.find_by_tenant_id(tenant.id,
+                                                           self.plugin_name)
+            kek = self._find_engine(tenant_kek.wrap_metadata).decrypt(
+                tenant_kek.wrapped_kek)
+        return kek
+
+    def _engine_for(self, tenant):
+        """Returns the engine and kek_metadata for encrypting new data."""
+        if self._has_tenant_kek(tenant):
+            return (self._get_tenant_engines(tenant)[self.engine.name],
+                    self.tenant_kek_metadata)
+        return self.engine, self.kek_metadata
 
     def encrypt(self, unencrypted, tenant):
         if not isinstance(unencrypted, str):
             raise ValueError('Unencrypted data must be a byte type, '
                              'but was {0}'.format(type(unencrypted)))
-        padded_data = self._pad(unencrypted)
-        iv = Random.get_random_bytes(self.block_size)
-        encryptor = AES.new(self.kek, AES.MODE_CBC, iv)
+        engine, kek_metadata = self._engine_for(tenant)
+        return engine.encrypt(unencrypted), kek_metadata
 
-        cyphertext = iv + encryptor.encrypt(padded_data)
-        kek_metadata = json.dumps({
-            'plugin': 'SimpleCryptoPlugin',
-            'encryption': 'aes-128-cbc',
-            'kek': 'kek_id'
-        })
+    def encrypt_batch(self, unencrypted_list, tenant):
+        for unencrypted in unencrypted_list:
+            if not isinstance(unencrypted, str):
+                raise ValueError('Unencrypted data must be a byte type, '
+                                 'but was {0}'.format(type(unencrypted)))
+        engine, kek_metadata = self._engine_for(tenant)
+        encrypt = engine.encrypt
+        return [(encrypt(unencrypted), kek_metadata)
+                for unencrypted in unencrypted_list]
 
-        return cyphertext, kek_metadata
+    def encrypt_stream(self, chunks, tenant):
+        engine, kek_metadata = self._engine_for(tenant)
+        return engine.encrypt_chunks(self._check_chunks(chunks)), kek_metadata
+
+    def _check_chunks(self, chunks):
+        for chunk in chunks:
+            if not isinstance(chunk, str):
+                raise ValueError('Unencrypted data must be a byte type, '
+                                 'but was {0}'.format(type(chunk)))
+            yield chunk
 
     def decrypt(self, encrypted, kek_metadata, tenant):
-        iv = encrypted[:self.block_size]
-        cypher_text = encrypted[self.block_size:]
-        decryptor = AES.new(self.kek, AES.MODE_CBC, iv)
-        padded_secret = decryptor.decrypt(cypher_text)
-        return self._strip_pad(padded_secret)
+        return self._find_engine(kek_metadata, tenant).decrypt(encrypted)
+
+    def decrypt_stream(self, encrypted, kek_metadata, tenant):
+        return self._find_engine(kek_metadata, tenant).decrypt_stream(
+            encrypted)
 
     def create(self, algorithm, bit_length):
-        # TODO: do this right
-        # return Random.get_random_bytes(bit_length/8)
-        if bit_length == 256:
-            return (b"r\x07\xb7\xfc\xe8\xae\x99\x94\xce_I\xaftM\xb3T'\x1c\xa2"
-                    b"\xd5\xeb\x03p\x17\xb8\r\xddA\xf9\xa3\x08W")
-        elif bit_length == 192:
-            return (b"\xb7^\xc5\xc9Ey\xc3\x88-\xad\x8d\xd2\xad{\x96\xba#\x973"
-                    b"\xe0ZY\xe5\x1e")
-        elif bit_length == 128:
-            return b",q\x90M\xbc)6AbjUx2t(C"
-        else:
-            raise ValueError('At this time you must supply 128/192/256 as'
+        if bit_length not in (128, 192, 256):
+            raise ValueError('At this time you must supply 128/192/256 as '
                              'bit length')
+        return entropy.get_random_bytes(bit_length / 8)
 
     def supports(self, secret_type):
         return secret_type in self.supported_types
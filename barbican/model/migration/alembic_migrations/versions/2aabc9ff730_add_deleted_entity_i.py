@@ -0,0 +1,35 @@
+"""add deleted entity indexes
+
+Revision ID: 2aabc9ff730
+Revises: 3d8ce950c899
+Create Date: 2026-10-18 03:02:07.035976
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2aabc9ff730'
+down_revision = '3d8ce950c899'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine import reflection
+
+
+INDEXES = (
+    ('ix_secrets_deleted_deleted_at', 'secrets', ['deleted', 'deleted_at']),
+    ('ix_orders_deleted_deleted_at', 'orders', ['deleted', 'deleted_at']),
+)
+
+
+def upgrade():
+    # Databases auto-created from the models already have these indexes.
+    inspector = reflection.Inspector.from_engine(op.get_bind())
+    for name, table, columns in INDEXES:
+        existing = [index['name'] for index in inspector.get_indexes(table)]
+        if name not in existing:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table)
@@ -0,0 +1,27 @@
+"""add order claimed at column
+
+Revision ID: 3d448ce78ed
+Revises: 2aabc9ff730
+Create Date: 2026-10-18 03:08:07.007285
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3d448ce78ed'
+down_revision = '2aabc9ff730'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine import reflection
+
+
+def upgrade():
+    # Databases auto-created from the models already have this column.
+    inspector = reflection.Inspector.from_engine(op.get_bind())
+    existing = [column['name'] for column in inspector.get_columns('orders')]
+    if 'claimed_at' not in existing:
+        op.add_column('orders', sa.Column('claimed_at', sa.DateTime))
+
+
+def downgrade():
+    op.drop_column('orders', 'claimed_at')
@@ -0,0 +1,43 @@
+"""add tenant keks table
+
+Revision ID: 3d8ce950c899
+Revises: 4bcdc3426e85
+Create Date: 2026-10-18 03:01:45.332771
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3d8ce950c899'
+down_revision = '4bcdc3426e85'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine import reflection
+
+
+def upgrade():
+    # Databases auto-created from the models already have this table.
+    inspector = reflection.Inspector.from_engine(op.get_bind())
+    if 'tenant_keks' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'tenant_keks',
+        sa.Column('id', sa.String(36), primary_key=True),
+        sa.Column('created_at', sa.DateTime, nullable=False),
+        sa.Column('updated_at', sa.DateTime, nullable=False),
+        sa.Column('deleted_at', sa.DateTime),
+        sa.Column('deleted', sa.Boolean, nullable=False),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('tenant_id', sa.String(36), sa.ForeignKey('tenants.id'),
+                  nullable=False),
+        sa.Column('plugin_name', sa.String(255), nullable=False),
+        sa.Column('wrapped_kek', sa.LargeBinary, nullable=False),
+        sa.Column('wrap_metadata', sa.Text),
+        sa.UniqueConstraint('tenant_id', 'plugin_name'),
+        mysql_engine='InnoDB',
+    )
+
+
+def downgrade():
+    op.drop_table('tenant_keks')
@@ -0,0 +1,38 @@
+"""add secret and order paging indexes
+
+Revision ID: 3da2a3d8ee22
+Revises: 53c2ae2df15d
+Create Date: 2026-10-18 03:01:03.489532
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3da2a3d8ee22'
+down_revision = '53c2ae2df15d'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine import reflection
+
+
+INDEXES = (
+    ('ix_tenant_secret_tenant_id_secret_id', 'tenant_secret',
+     ['tenant_id', 'secret_id']),
+    ('ix_secrets_created_at_id', 'secrets', ['created_at', 'id']),
+    ('ix_orders_tenant_id_created_at_id', 'orders',
+     ['tenant_id', 'created_at', 'id']),
+)
+
+
+def upgrade():
+    # Databases auto-created from the models already have these indexes.
+    inspector = reflection.Inspector.from_engine(op.get_bind())
+    for name, table, columns in INDEXES:
+        existing = [index['name'] for index in inspector.get_indexes(table)]
+        if name not in existing:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table)
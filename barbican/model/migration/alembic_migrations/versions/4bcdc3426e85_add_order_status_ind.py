@@ -0,0 +1,28 @@
+"""add order status index
+
+Revision ID: 4bcdc3426e85
+Revises: 3da2a3d8ee22
+Create Date: 2026-10-18 03:01:37.527511
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4bcdc3426e85'
+down_revision = '3da2a3d8ee22'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine import reflection
+
+
+def upgrade():
+    # Databases auto-created from the models already have this index.
+    inspector = reflection.Inspector.from_engine(op.get_bind())
+    existing = [index['name'] for index in inspector.get_indexes('orders')]
+    if 'ix_orders_status_created_at' not in existing:
+        op.create_index('ix_orders_status_created_at', 'orders',
+                        ['status', 'created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_orders_status_created_at', 'orders')
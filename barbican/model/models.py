@@ -37,7 +37,9 @@ BASE = declarative_base()
 # Allowed entity states
 class States(object):
     PENDING = 'PENDING'
+    PROCESSING = 'PROCESSING'
     ACTIVE = 'ACTIVE'
+    ERROR = 'ERROR'
 
     @classmethod
     def is_valid(self, state_to_test):
@@ -199,8 +201,8 @@ class Secret(BASE, ModelBase):
     bit_length = Column(Integer)
     cypher_type = Column(String(255))
 
-    # TODO: Performance - Consider avoiding full load of all
-    #   datum attributes here.
+    # Note: Metadata-only reads should use SecretRepo.get_metadata() or
+    #   the listing queries, which defer loading the encrypted data blobs.
     encrypted_data = relationship("EncryptedDatum", lazy='joined')
 
     def __init__(self, parsed_request):
@@ -270,6 +272,31 @@ class EncryptedDatum(BASE, ModelBase):
                 'kek_metadata': self.kek_metadata}
 
 
+class TenantKEK(BASE, ModelBase):
+    """
+    Represents a Tenant's key encryption key in the datastore
+
+    Each crypto plugin may keep one key encryption key per Tenant, which
+    is stored wrapped (encrypted) by that plugin's master key.
+    """
+
+    __tablename__ = 'tenant_keks'
+    __table_args__ = (UniqueConstraint('tenant_id', 'plugin_name'),
+                      {'mysql_engine': 'InnoDB'})
+
+    tenant_id = Column(String(36), ForeignKey('tenants.id'),
+                       nullable=False)
+    plugin_name = Column(String(255), nullable=False)
+    wrapped_kek = Column(LargeBinary, nullable=False)
+    wrap_metadata = Column(Text)
+
+    def _do_extra_dict_fields(self):
+        """Sub-class hook method: return dict of fields."""
+        return {'tenant_id': self.tenant_id,
+                'plugin_name': self.plugin_name,
+                'wrap_metadata': self.wrap_metadata}
+
+
 class Order(BASE, ModelBase):
     """
     Represents an Order in the datastore
@@ -294,6 +321,9 @@ class Order(BASE, ModelBase):
     secret_id = Column(String(36), ForeignKey('secrets.id'),
                        nullable=True)
 
+    # When the order was last claimed for processing.
+    claimed_at = Column(DateTime, default=None)
+
     def _do_extra_dict_fields(self):
         """Sub-class hook method: return dict of fields."""
         return {'secret': {'name': self.secret_name or self.secret_id,
@@ -306,15 +336,31 @@ class Order(BASE, ModelBase):
                 'order_id': self.id}
 
 
+# Composite indexes backing the (created_at, id) keyset paging used by the
+#   secret and order listings.
+Index('ix_tenant_secret_tenant_id_secret_id',
+      TenantSecret.tenant_id, TenantSecret.secret_id)
+Index('ix_secrets_created_at_id', Secret.created_at, Secret.id)
+Index('ix_orders_tenant_id_created_at_id',
+      Order.tenant_id, Order.created_at, Order.id)
+
+# Backs claiming the oldest pending orders for batched processing.
+Index('ix_orders_status_created_at', Order.status, Order.created_at)
+
+# Back the scrubber's search for entities deleted before a cutoff.
+Index('ix_secrets_deleted_deleted_at', Secret.deleted, Secret.deleted_at)
+Index('ix_orders_deleted_deleted_at', Order.deleted, Order.deleted_at)
+
+
 # Keep this tuple synchronized with the models in the file
-MODELS = [TenantSecret, Tenant, Secret, EncryptedDatum, Order]
+MODELS = [TenantSecret, Tenant, Secret, EncryptedDatum, TenantKEK, Order]
 
 
 def register_models(engine):
     """
     Creates database tables for all models with the given engine
     """
-    LOG.debug("Models: {0}".format(repr(MODELS)))
+    LOG.debug("Models: %r", MODELS)
     for model in MODELS:
         model.metadata.create_all(engine)
 
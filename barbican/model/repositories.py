@@ -21,6 +21,10 @@ quite intense for sqlalchemy, and maybe could be simplified.
 """
 
 
+import base64
+import collections
+import random
+import threading
 import time
 import logging
 
@@ -29,20 +33,33 @@ from oslo.config import cfg
 import sqlalchemy
 import sqlalchemy.orm as sa_orm
 import sqlalchemy.sql as sa_sql
-from sqlalchemy import or_
+from sqlalchemy.sql import func as sa_func
+from sqlalchemy import or_, and_
 
 from barbican.common import exception
+from barbican.common import metrics
 from barbican.model import models
 from barbican.model.migration import commands
 from barbican.openstack.common import timeutils
+from barbican.openstack.common import uuidutils
 from barbican.openstack.common.gettextutils import _
 from barbican.common import utils
 
 LOG = utils.getLogger(__name__)
+SLOW_QUERY_LOG = utils.getLogger('barbican.model.slow_query')
 
 
 _ENGINE = None
 _MAKER = None
+_REPOSITORIES = {}
+_POOL_STATS = {'checkouts': 0,
+               'overflow_checkouts': 0,
+               'saturated_checkouts': 0,
+               'ping_failures': 0}
+_POOL_STATS_LOCK = threading.Lock()
+# QueuePool's max_overflow when sql_max_overflow is not configured.
+_DEFAULT_MAX_OVERFLOW = 10
+_QUERY_TRACKERS = threading.local()
 _MAX_RETRIES = None
 _RETRY_INTERVAL = None
 BASE = models.BASE
@@ -55,6 +72,39 @@ db_opts = [
     cfg.IntOpt('sql_retry_interval', default=1),
     cfg.BoolOpt('db_auto_create', default=True),
     cfg.StrOpt('sql_connection', default=None),
+    cfg.StrOpt('sql_pool_class', default=None,
+               help=_('Name of the SQLAlchemy pool class to use, such as '
+                      'QueuePool or NullPool. Defaults to the dialect\'s '
+                      'own choice.')),
+    cfg.IntOpt('sql_pool_size', default=None,
+               help=_('Number of connections to keep open in a queue '
+                      'pool.')),
+    cfg.IntOpt('sql_max_overflow', default=None,
+               help=_('Number of connections a queue pool may open beyond '
+                      'sql_pool_size under load.')),
+    cfg.IntOpt('sql_pool_timeout', default=None,
+               help=_('Seconds to wait for a connection from a saturated '
+                      'queue pool before giving up.')),
+    cfg.BoolOpt('sql_pool_ping', default=True,
+                help=_('Test connections for liveness as they are checked '
+                       'out of the pool, replacing stale ones.')),
+    cfg.IntOpt('sql_slow_query_ms', default=100,
+               help=_('Statements taking at least this many milliseconds '
+                      'are written to the barbican.model.slow_query log. '
+                      'Zero disables the slow query log.')),
+    cfg.FloatOpt('sql_slow_query_sample_rate', default=1.0,
+                 help=_('Fraction of slow statements that are logged, to '
+                        'bound the log volume under load.')),
+    cfg.IntOpt('sql_repeated_query_threshold', default=10,
+               help=_('Warn when one request or task executes the same '
+                      'statement this many times, which usually means '
+                      'entities are being loaded one query at a time '
+                      '(an N+1 query pattern). Zero disables the '
+                      'warning.')),
+    cfg.BoolOpt('sql_debug_headers', default=False,
+                help=_('Add the number of statements each API request '
+                       'executed, and their total time, to its response '
+                       'headers. Intended for debugging.')),
     cfg.IntOpt('max_limit_paging', default=100),
     cfg.IntOpt('default_limit_paging', default=10),
 ]
@@ -74,7 +124,7 @@ def setup_db_env():
     _MAX_RETRIES = CONF.sql_max_retries
     _RETRY_INTERVAL = CONF.sql_retry_interval
     _CONNECTION = CONF.sql_connection
-    LOG.debug("Sql connection = {0}".format(_CONNECTION))
+    LOG.debug("Sql connection = %s", _CONNECTION)
     sa_logger = logging.getLogger('sqlalchemy.engine')
     if CONF.debug:
         sa_logger.setLevel(logging.DEBUG)
@@ -84,17 +134,23 @@ def configure_db():
     """
     Establish the database, create an engine if needed, and
     register the models.
+
+    This is intended to be invoked once, at application or worker process
+    startup, so that repositories are handed a ready engine and session
+    maker rather than configuring the database themselves. Subsequent
+    calls are no-ops.
     """
-    setup_db_env()
-    get_engine()
+    if not _ENGINE:
+        setup_db_env()
+        get_engine()
+    get_maker()
 
 
 def get_session(autocommit=True, expire_on_commit=False):
     """Helper method to grab session"""
     global _MAKER
     if not _MAKER:
-        get_engine()
-        get_maker(autocommit, expire_on_commit)
+        configure_db()
         assert(_MAKER)
     session = _MAKER()
     return session
@@ -116,14 +172,19 @@ def get_engine():
             'pool_recycle': _IDLE_TIMEOUT,
             'echo': False,
             'convert_unicode': True}
+        engine_args.update(_get_pool_args())
 
         try:
-            LOG.debug("Sql connection: {0}; Args: {1}".format(_CONNECTION,
-                                                              engine_args))
+            LOG.debug("Sql connection: %s; Args: %s", _CONNECTION, engine_args)
             _ENGINE = sqlalchemy.create_engine(_CONNECTION, **engine_args)
 
-#TODO:          if 'mysql' in connection_dict.drivername:
-#TODO:          sqlalchemy.event.listen(_ENGINE, 'checkout', ping_listener)
+            if CONF.sql_pool_ping:
+                sqlalchemy.event.listen(_ENGINE, 'checkout', ping_listener)
+            sqlalchemy.event.listen(_ENGINE, 'checkout', pool_stats_listener)
+            sqlalchemy.event.listen(_ENGINE, 'before_cursor_execute',
+                                    query_start_listener)
+            sqlalchemy.event.listen(_ENGINE, 'after_cursor_execute',
+                                    query_end_listener)
 
             _ENGINE.connect = wrap_db_error(_ENGINE.connect)
             _ENGINE.connect()
@@ -149,6 +210,186 @@ def get_engine():
     return _ENGINE
 
 
+def _get_pool_args():
+    """Return the connection pool arguments configured for the engine."""
+    pool_args = {}
+    if CONF.sql_pool_class:
+        pool_class = getattr(sqlalchemy.pool, CONF.sql_pool_class, None)
+        if not pool_class:
+            raise exception.Invalid("Unknown sql_pool_class '%s'"
+                                    % CONF.sql_pool_class)
+        pool_args['poolclass'] = pool_class
+    if CONF.sql_pool_size is not None:
+        pool_args['pool_size'] = CONF.sql_pool_size
+    if CONF.sql_max_overflow is not None:
+        pool_args['max_overflow'] = CONF.sql_max_overflow
+    if CONF.sql_pool_timeout is not None:
+        pool_args['pool_timeout'] = CONF.sql_pool_timeout
+    return pool_args
+
+
+def ping_listener(dbapi_conn, connection_rec, connection_proxy):
+    """
+    Ensures that connections checked out of the pool are alive, so that
+    connections dropped by the database server while idle are replaced
+    rather than failing the request that receives them.
+    """
+    try:
+        cursor = dbapi_conn.cursor()
+        cursor.execute('SELECT 1')
+        cursor.close()
+    except Exception as e:
+        _count_pool_stat('ping_failures')
+        LOG.warning(_('Got database connection error on checkout, '
+                      'reconnecting: %s'), e)
+        raise sqlalchemy.exc.DisconnectionError(str(e))
+
+
+def _count_pool_stat(name):
+    """Increments a pool metric, which pool callbacks on any thread share."""
+    with _POOL_STATS_LOCK:
+        _POOL_STATS[name] += 1
+
+
+def pool_stats_listener(dbapi_conn, connection_rec, connection_proxy):
+    """Tracks connection pool checkouts and saturation."""
+    _count_pool_stat('checkouts')
+
+    pool = _ENGINE.pool if _ENGINE else None
+    if not isinstance(pool, sqlalchemy.pool.QueuePool):
+        return
+
+    max_overflow = CONF.sql_max_overflow
+    if max_overflow is None:
+        max_overflow = _DEFAULT_MAX_OVERFLOW
+
+    checked_out = pool.checkedout()
+    if checked_out > pool.size():
+        _count_pool_stat('overflow_checkouts')
+        if max_overflow >= 0 and checked_out >= pool.size() + max_overflow:
+            _count_pool_stat('saturated_checkouts')
+            LOG.warning(_('Database connection pool is saturated: '
+                          '%(checked_out)d connections checked out'),
+                        {'checked_out': checked_out})
+
+
+def get_pool_stats():
+    """
+    Returns a dict of connection pool metrics, including cumulative checkout
+    counts and, for queue pools, the current pool occupancy.
+    """
+    with _POOL_STATS_LOCK:
+        stats = dict(_POOL_STATS)
+    if not _ENGINE:
+        return stats
+
+    pool = _ENGINE.pool
+    stats['pool_class'] = pool.__class__.__name__
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        pool_metric = getattr(pool, name, None)
+        if pool_metric:
+            stats[name] = pool_metric()
+    return stats
+
+
+class QueryTracker(object):
+    """
+    Context manager counting the statements executed by the current thread
+    while it is active, such as for the duration of an API request.
+
+    On exit, statements executed at least sql_repeated_query_threshold
+    times are logged as likely N+1 query patterns.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.elapsed = 0.0
+        self.statements = collections.defaultdict(int)
+
+    def __enter__(self):
+        _get_query_trackers().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _get_query_trackers().remove(self)
+
+        threshold = CONF.sql_repeated_query_threshold
+        if not threshold:
+            return
+        for statement, count in self.statements.iteritems():
+            if count >= threshold:
+                LOG.warning(_('%(name)s executed a statement %(count)d '
+                              'times, a likely N+1 query pattern: '
+                              '%(statement)s'),
+                            {'name': self.name, 'count': count,
+                             'statement': _one_line(statement)})
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.elapsed += elapsed
+        self.statements[statement] += 1
+
+
+def track_queries(name):
+    """
+    Returns a QueryTracker for the named request or task. Trackers may be
+    nested, in which case statements are counted by all of them.
+    """
+    return QueryTracker(name)
+
+
+def _get_query_trackers():
+    trackers = getattr(_QUERY_TRACKERS, 'stack', None)
+    if trackers is None:
+        trackers = _QUERY_TRACKERS.stack = []
+    return trackers
+
+
+def _one_line(statement):
+    return ' '.join(statement.split())
+
+
+def query_start_listener(conn, cursor, statement, parameters, context,
+                         executemany):
+    """
+    Notes the statement's start time on its execution context, which is
+    discarded with the context if the statement fails. Statements executed
+    without a context (such as for column defaults) are not timed, since
+    no end event follows them.
+    """
+    if context is not None:
+        context._query_start_time = time.time()
+
+
+def query_end_listener(conn, cursor, statement, parameters, context,
+                       executemany):
+    """
+    Records the statement's execution time with the active query trackers
+    and the metrics 'sql' stage, and logs it if it was slow. Parameters are
+    never logged, since they may include secret data.
+    """
+    start = getattr(context, '_query_start_time', None)
+    if start is None:
+        return
+    elapsed = time.time() - start
+
+    for tracker in _get_query_trackers():
+        tracker.record(statement, elapsed)
+    metrics.add_stage_time('sql', elapsed)
+
+    elapsed_ms = elapsed * 1000.0
+    if CONF.sql_slow_query_ms and elapsed_ms >= CONF.sql_slow_query_ms \
+            and random.random() < CONF.sql_slow_query_sample_rate:
+        trackers = _get_query_trackers()
+        SLOW_QUERY_LOG.warning(_('Slow query (%(elapsed).1f ms) in '
+                                 '%(name)s: %(statement)s'),
+                               {'elapsed': elapsed_ms,
+                                'name': trackers[-1].name if trackers
+                                else '-',
+                                'statement': _one_line(statement)})
+
+
 def get_maker(autocommit=True, expire_on_commit=False):
     """Return a SQLAlchemy sessionmaker."""
     """May assign __MAKER if not already assigned"""
@@ -210,27 +451,80 @@ def clean_paging_values(offset_arg=None, limit_arg=None):
     limit = limit if limit >= 2 else 2
     limit = limit if limit <= CONF.max_limit_paging else CONF.max_limit_paging
 
-    LOG.debug("Limit={0}, offset={1}".format(limit, offset))
+    LOG.debug("Limit=%s, offset=%s", limit, offset)
 
     return (offset, limit)
 
 
+def encode_marker(entity, before=False):
+    """
+    Encodes an opaque paging marker for the supplied entity, based on its
+    (created_at, id) sort key. The marker seeks the page just after the
+    entity, or if before is set, the page just before it.
+    """
+    raw = '{0}{1}|{2}'.format('<' if before else '',
+                              timeutils.strtime(entity.created_at), entity.id)
+    return base64.urlsafe_b64encode(raw).rstrip('=')
+
+
+def decode_marker(marker):
+    """
+    Decodes an opaque paging marker into its (created_at, id) sort key, and
+    whether it seeks the page before that key.
+
+    :raises Invalid if the marker is malformed.
+    """
+    try:
+        padded = str(marker) + '=' * (-len(marker) % 4)
+        created_raw, entity_id = base64.urlsafe_b64decode(padded).split('|', 1)
+        before = created_raw.startswith('<')
+        created_at = timeutils.parse_strtime(created_raw.lstrip('<'))
+    except (TypeError, ValueError, UnicodeError):
+        raise exception.Invalid("Invalid paging marker '%s'" % marker)
+    return (created_at, entity_id, before)
+
+
+def apply_marker(query, model, marker):
+    """
+    Orders the query by the model's (created_at, id) sort key, restricted
+    to the entities sorted after the supplied marker, or before it for a
+    marker seeking backward. This is a keyset (seek) paging approach, so
+    the cost of a page does not depend on its depth.
+
+    :returns: tuple -- the query, and whether it is in descending order, in
+              which case the page fetched must be reversed.
+    """
+    if not marker:
+        return query.order_by(model.created_at, model.id), False
+
+    created_at, entity_id, before = decode_marker(marker)
+    if before:
+        query = query.filter(or_(model.created_at < created_at,
+                                 and_(model.created_at == created_at,
+                                      model.id < entity_id)))
+        return query.order_by(model.created_at.desc(), model.id.desc()), True
+
+    query = query.filter(or_(model.created_at > created_at,
+                             and_(model.created_at == created_at,
+                                  model.id > entity_id)))
+    return query.order_by(model.created_at, model.id), False
+
+
 class BaseRepo(object):
     """
     Base repository for the barbican entities.
 
     This class provides template methods that allow sub-classes to hook
-    specific functionality as needed.
+    specific functionality as needed. Repositories hold no per-instance
+    state, so the shared instances returned by get_repository() should
+    normally be used instead of constructing new ones.
     """
 
-    def __init__(self):
-        LOG.debug("BaseRepo init...")
-        configure_db()
-
     def get_session(self, session=None):
         LOG.debug("Getting session...")
         return session or get_session()
 
+    @metrics.timed()
     def get(self, entity_id, keystone_id=None,
             force_show_deleted=False,
             suppress_exception=False, session=None):
@@ -248,7 +542,7 @@ class BaseRepo(object):
             entity = query.one()
 
         except sa_orm.exc.NoResultFound:
-            LOG.exception("Not found for {0}".format(entity_id))
+            LOG.debug("Not found for %s", entity_id)
             entity = None
             if not suppress_exception:
                 raise exception.NotFound("No %s found with ID %s"
@@ -256,9 +550,15 @@ class BaseRepo(object):
 
         return entity
 
-    def create_from(self, entity):
-        """Sub-class hook: create from entity."""
-        start = time.time()  # DEBUG
+    @metrics.timed()
+    def create_from(self, entity, session=None):
+        """
+        Sub-class hook: create from entity.
+
+        If a session is supplied, the entity is added within that session's
+        current transaction and the caller is responsible for committing it.
+        Otherwise the entity is committed in its own transaction.
+        """
         if not entity:
             msg = "Must supply non-None {0}.".format(self._do_entity_name)
             raise exception.Invalid(msg)
@@ -269,52 +569,61 @@ class BaseRepo(object):
             raise exception.Invalid(msg)
 
         LOG.debug("Begin create from...")
-        session = get_session()
-        with session.begin():
+        if session:
+            self._create_in_session(entity, session)
+        else:
+            session = get_session()
+            with session.begin():
+                self._create_in_session(entity, session)
 
-            # Validate the attributes before we go any further. From my
-            # (unknown Glance developer) investigation, the @validates
-            # decorator does not validate
-            # on new records, only on existing records, which is, well,
-            # idiotic.
-            values = self._do_validate(entity.to_dict())
+        return entity
 
-            try:
-                LOG.debug("Saving entity...")
-                entity.save(session=session)
-            except sqlalchemy.exc.IntegrityError:
-                LOG.exception('Problem saving entity for create')
-                raise exception.Duplicate("Entity ID %s already exists!"
-                                          % values['id'])
-        LOG.debug('Elapsed repo '
-                  'create secret:{0}'.format(time.time() - start))  # DEBUG
+    @metrics.timed()
+    def create_all_from(self, entities, session):
+        """
+        Adds new entities in bulk within the supplied session's current
+        transaction, which the caller is responsible for committing.
 
-        return entity
+        IDs are assigned up front so that the rows are written with
+        batched (executemany) INSERT statements in a single flush.
+        """
+        for entity in entities:
+            if entity.id:
+                msg = "Must supply {0} with id=None(i.e. new entity).".format(
+                    self._do_entity_name())
+                raise exception.Invalid(msg)
+            self._do_validate(entity.to_dict())
+            entity.id = uuidutils.generate_uuid()
+
+        LOG.debug("Bulk creating %s %s entities...", len(entities),
+                  self._do_entity_name())
+        try:
+            session.add_all(entities)
+            session.flush()
+        except sqlalchemy.exc.IntegrityError:
+            LOG.exception('Problem saving entities for bulk create')
+            raise exception.Duplicate("Entity already exists!")
+
+        return entities
 
-    def save(self, entity):
+    @metrics.timed()
+    def save(self, entity, session=None):
         """
         Saves the state of the entity.
 
+        If a session is supplied, the entity is saved within that session's
+        current transaction and the caller is responsible for committing it.
+
         :raises NotFound if entity does not exist.
         """
-        session = get_session()
-        with session.begin():
-            entity.updated_at = timeutils.utcnow()
-
-            # Validate the attributes before we go any further. From my
-            # (unknown Glance developer) investigation, the @validates
-            # decorator does not validate
-            # on new records, only on existing records, which is, well,
-            # idiotic.
-            self._do_validate(entity.to_dict())
-
-            try:
-                entity.save(session=session)
-            except sqlalchemy.exc.IntegrityError:
-                LOG.exception('Problem saving entity for update')
-                raise exception.NotFound("Entity ID %s not found"
-                                         % entity_id)
+        if session:
+            self._save_in_session(entity, session)
+        else:
+            session = get_session()
+            with session.begin():
+                self._save_in_session(entity, session)
 
+    @metrics.timed()
     def update(self, entity_id, values, purge_props=False):
         """
         Set the given properties on an entity and update it.
@@ -323,6 +632,7 @@ class BaseRepo(object):
         """
         return self._update(entity_id, values, purge_props)
 
+    @metrics.timed()
     def delete_entity_by_id(self, entity_id, keystone_id):
         """Remove the entity by its ID"""
 
@@ -339,6 +649,42 @@ class BaseRepo(object):
                 raise exception.NotFound("Entity ID %s not found"
                                          % entity_id)
 
+    def _create_in_session(self, entity, session):
+        """Validates and adds a new entity within the supplied session."""
+
+        # Validate the attributes before we go any further. From my
+        # (unknown Glance developer) investigation, the @validates
+        # decorator does not validate
+        # on new records, only on existing records, which is, well,
+        # idiotic.
+        self._do_validate(entity.to_dict())
+
+        try:
+            LOG.debug("Saving entity...")
+            entity.save(session=session)
+        except sqlalchemy.exc.IntegrityError:
+            LOG.exception('Problem saving entity for create')
+            raise exception.Duplicate("Entity ID %s already exists!"
+                                      % entity.id)
+
+    def _save_in_session(self, entity, session):
+        """Validates and saves an existing entity within the session."""
+        entity.updated_at = timeutils.utcnow()
+
+        # Validate the attributes before we go any further. From my
+        # (unknown Glance developer) investigation, the @validates
+        # decorator does not validate
+        # on new records, only on existing records, which is, well,
+        # idiotic.
+        self._do_validate(entity.to_dict())
+
+        try:
+            entity.save(session=session)
+        except sqlalchemy.exc.IntegrityError:
+            LOG.exception('Problem saving entity for update')
+            raise exception.NotFound("Entity ID %s not found"
+                                     % entity.id)
+
     def _do_entity_name(self):
         """Sub-class hook: return entity name, such as for debugging."""
         return "Entity"
@@ -447,6 +793,7 @@ class TenantRepo(BaseRepo):
         """Sub-class hook: build a retrieve query."""
         return session.query(models.Tenant).filter_by(id=entity_id)
 
+    @metrics.timed()
     def find_by_keystone_id(self, keystone_id, suppress_exception=False,
                             session=None):
         session = self.get_session(session)
@@ -458,7 +805,7 @@ class TenantRepo(BaseRepo):
             entity = query.one()
 
         except sa_orm.exc.NoResultFound:
-            LOG.exception("Problem getting Tenant {0}".format(keystone_id))
+            LOG.debug("No Tenant found for %s", keystone_id)
             entity = None
             if not suppress_exception:
                 raise exception.NotFound("No %s found with keystone-ID %s"
@@ -471,23 +818,80 @@ class TenantRepo(BaseRepo):
 class SecretRepo(BaseRepo):
     """Repository for the Secret entity."""
 
+    # Query options that load a secret's encrypted datum records without
+    # their (potentially large) encrypted data columns, which are only
+    # needed for decryption.
+    METADATA_ONLY_OPTIONS = (sa_orm.defer('encrypted_data.cypher_text'),
+                             sa_orm.defer('encrypted_data.kek_metadata'))
+
+    @metrics.timed()
+    def get_metadata(self, entity_id, keystone_id=None,
+                     suppress_exception=False, session=None):
+        """
+        Get a secret or raise if it does not exist, loading only the
+        metadata of its encrypted datum records (such as their mime types)
+        rather than the encrypted data itself.
+        """
+        session = self.get_session(session)
+
+        query = self._do_build_get_query(entity_id, keystone_id, session)
+        entity = query.options(*self.METADATA_ONLY_OPTIONS).first()
+
+        if not entity:
+            LOG.debug("Not found for %s", entity_id)
+            if not suppress_exception:
+                raise exception.NotFound("No %s found with ID %s"
+                                         % (self._do_entity_name(), entity_id))
+
+        return entity
+
+    @metrics.timed()
+    def get_version(self, entity_id, keystone_id, session=None):
+        """
+        Returns the version of a live secret's metadata, being the time it
+        was last updated and its number of encrypted datum records, or
+        None if it does not exist, is deleted or has expired. Only those
+        values are queried, so no entities are loaded.
+        """
+        session = self.get_session(session)
+
+        query = self._do_build_get_query(entity_id, keystone_id, session) \
+                    .outerjoin(models.EncryptedDatum,
+                               models.Secret.encrypted_data) \
+                    .with_entities(models.Secret.updated_at,
+                                   sa_func.count(models.EncryptedDatum.id)) \
+                    .group_by(models.Secret.updated_at)
+        version = query.first()
+
+        return tuple(version) if version else None
+
+    @metrics.timed()
     def get_by_create_date(self, keystone_id, offset_arg=None, limit_arg=None,
-                           suppress_exception=False, session=None):
+                           marker_arg=None, suppress_exception=False,
+                           session=None):
         """
         Returns a list of secrets, ordered by the date they were created at
         and paged based on the offset and limit fields. The keystone_id is
         external-to-Barbican value assigned to the tenant by Keystone.
+
+        If a marker (as produced by encode_marker()) is supplied, the page
+        starts just after the marked secret, or ends just before it, and
+        the offset is ignored.
         """
 
         offset, limit = clean_paging_values(offset_arg, limit_arg)
+        if marker_arg:
+            offset = 0
 
         session = self.get_session(session)
         utcnow = timeutils.utcnow()
 
         try:
             query = session.query(models.Secret) \
-                           .order_by(models.Secret.created_at) \
+                           .options(*self.METADATA_ONLY_OPTIONS) \
                            .filter_by(deleted=False)
+            query, descending = apply_marker(query, models.Secret,
+                                             marker_arg)
 
             # Note: Must use '== None' below, not 'is None'.
             query = query.filter(or_(models.Secret.expiration == None,
@@ -500,10 +904,12 @@ class SecretRepo(BaseRepo):
 
             start = offset
             end = offset + limit
-            LOG.debug('Retrieving from {0} to {1}'.format(start, end))
+            LOG.debug('Retrieving from %s to %s', start, end)
 
             entities = query[start:end]
-            LOG.debug('Number entities retrieved: {0}'.format(len(entities)))
+            if descending:
+                entities.reverse()
+            LOG.debug('Number entities retrieved: %s', len(entities))
 
         except sa_orm.exc.NoResultFound:
             entities = None
@@ -513,6 +919,24 @@ class SecretRepo(BaseRepo):
 
         return (entities, offset, limit)
 
+    @metrics.timed()
+    def get_many(self, entity_ids, keystone_id, session=None):
+        """
+        Returns the tenant's secrets with the supplied IDs, along with
+        their encrypted data, via a single query. IDs that are not found
+        are omitted, and the secrets are returned in no particular order.
+        """
+        if not entity_ids:
+            return []
+
+        session = self.get_session(session)
+
+        query = self._build_tenant_query(keystone_id, session)
+        entities = query.filter(models.Secret.id.in_(entity_ids)).all()
+        LOG.debug('Number entities retrieved: %s', len(entities))
+
+        return entities
+
     def _do_entity_name(self):
         """Sub-class hook: return entity name, such as for debugging."""
         return "Secret"
@@ -522,11 +946,16 @@ class SecretRepo(BaseRepo):
 
     def _do_build_get_query(self, entity_id, keystone_id, session):
         """Sub-class hook: build a retrieve query."""
+        return self._build_tenant_query(keystone_id, session) \
+                   .filter(models.Secret.id == entity_id)
+
+    def _build_tenant_query(self, keystone_id, session):
+        """Builds a query for the tenant's live (unexpired) secrets."""
         utcnow = timeutils.utcnow()
 
         # Note: Must use '== None' below, not 'is None'.
         # TODO: Performance? Is the many-to-many join needed?
-        return session.query(models.Secret).filter_by(id=entity_id) \
+        return session.query(models.Secret) \
                       .filter_by(deleted=False) \
                       .filter(or_(models.Secret.expiration == None,
                                   models.Secret.expiration > utcnow)) \
@@ -580,33 +1009,86 @@ class TenantSecretRepo(BaseRepo):
         pass
 
 
+class TenantKEKRepo(BaseRepo):
+    """Repository for the TenantKEK entity."""
+
+    @metrics.timed()
+    def find_by_tenant_id(self, tenant_id, plugin_name,
+                          suppress_exception=False, session=None):
+        """Returns the plugin's key encryption key for the tenant."""
+        session = self.get_session(session)
+
+        try:
+            query = session.query(models.TenantKEK) \
+                           .filter_by(tenant_id=tenant_id,
+                                      plugin_name=plugin_name,
+                                      deleted=False)
+
+            entity = query.one()
+
+        except sa_orm.exc.NoResultFound:
+            LOG.debug("No TenantKEK found for %s", tenant_id)
+            entity = None
+            if not suppress_exception:
+                raise exception.NotFound("No %s found for tenant-ID %s"
+                                         % (self._do_entity_name(),
+                                            tenant_id))
+
+        return entity
+
+    def _do_entity_name(self):
+        """Sub-class hook: return entity name, such as for debugging."""
+        return "TenantKEK"
+
+    def _do_create_instance(self):
+        return models.TenantKEK()
+
+    def _do_build_get_query(self, entity_id, keystone_id, session):
+        """Sub-class hook: build a retrieve query."""
+        return session.query(models.TenantKEK).filter_by(id=entity_id)
+
+    def _do_validate(self, values):
+        """Sub-class hook: validate values."""
+        pass
+
+
 class OrderRepo(BaseRepo):
     """Repository for the Order entity."""
 
+    @metrics.timed()
     def get_by_create_date(self, keystone_id, offset_arg=None, limit_arg=None,
-                           suppress_exception=False, session=None):
+                           marker_arg=None, suppress_exception=False,
+                           session=None):
         """
         Returns a list of orders, ordered by the date they were created at
         and paged based on the offset and limit fields.
+
+        If a marker (as produced by encode_marker()) is supplied, the page
+        starts just after the marked order, or ends just before it, and the
+        offset is ignored.
         """
 
         offset, limit = clean_paging_values(offset_arg, limit_arg)
+        if marker_arg:
+            offset = 0
 
         session = self.get_session(session)
 
         try:
-            query = session.query(models.Order) \
-                           .order_by(models.Order.created_at)
+            query, descending = apply_marker(session.query(models.Order),
+                                             models.Order, marker_arg)
             query = query.filter_by(deleted=False) \
                          .join(models.Tenant, models.Order.tenant) \
                          .filter(models.Tenant.keystone_id == keystone_id)
 
             start = offset
             end = offset + limit
-            LOG.debug('Retrieving from {0} to {1}'.format(start, end))
+            LOG.debug('Retrieving from %s to %s', start, end)
 
             entities = query[start:end]
-            LOG.debug('Number entities retrieved: {0}'.format(len(entities)))
+            if descending:
+                entities.reverse()
+            LOG.debug('Number entities retrieved: %s', len(entities))
 
         except sa_orm.exc.NoResultFound:
             entities = None
@@ -616,6 +1098,45 @@ class OrderRepo(BaseRepo):
 
         return (entities, offset, limit)
 
+    @metrics.timed()
+    def get_pending(self, limit, stale_before=None, order_id=None,
+                    session=None):
+        """
+        Returns up to limit of the oldest pending orders, across all
+        tenants. The orders are locked (SELECT ... FOR UPDATE) until the
+        supplied session's transaction ends, so that concurrent workers
+        cannot claim the same orders.
+
+        :param stale_before: if supplied, orders still processing that were
+                             claimed before this time are also returned, so
+                             that claims abandoned by a failed worker are
+                             retried.
+        :param order_id: if supplied, only this order is returned, if it is
+                         pending.
+        """
+        session = self.get_session(session)
+
+        claimable = models.Order.status == models.States.PENDING
+        if stale_before:
+            claimable = or_(claimable, and_(
+                models.Order.status == models.States.PROCESSING,
+                models.Order.claimed_at < stale_before))
+
+        query = session.query(models.Order) \
+                       .filter_by(deleted=False) \
+                       .filter(claimable)
+        if order_id:
+            query = query.filter_by(id=order_id)
+
+        entities = query.order_by(models.Order.created_at,
+                                  models.Order.id) \
+                        .with_lockmode('update') \
+                        .limit(limit) \
+                        .all()
+        LOG.debug('Number entities claimed: %s', len(entities))
+
+        return entities
+
     def _do_entity_name(self):
         """Sub-class hook: return entity name, such as for debugging."""
         return "Order"
@@ -633,3 +1154,44 @@ class OrderRepo(BaseRepo):
     def _do_validate(self, values):
         """Sub-class hook: validate values."""
         pass
+
+
+def get_repository(repo_class):
+    """
+    Returns the shared, process-wide instance of the supplied repository
+    class, creating it on first use.
+    """
+    repository = _REPOSITORIES.get(repo_class)
+    if repository is None:
+        repository = _REPOSITORIES.setdefault(repo_class, repo_class())
+    return repository
+
+
+def get_tenant_repository():
+    """Returns the shared TenantRepo instance."""
+    return get_repository(TenantRepo)
+
+
+def get_secret_repository():
+    """Returns the shared SecretRepo instance."""
+    return get_repository(SecretRepo)
+
+
+def get_encrypted_datum_repository():
+    """Returns the shared EncryptedDatumRepo instance."""
+    return get_repository(EncryptedDatumRepo)
+
+
+def get_tenant_secret_repository():
+    """Returns the shared TenantSecretRepo instance."""
+    return get_repository(TenantSecretRepo)
+
+
+def get_order_repository():
+    """Returns the shared OrderRepo instance."""
+    return get_repository(OrderRepo)
+
+
+def get_tenant_kek_repository():
+    """Returns the shared TenantKEKRepo instance."""
+    return get_repository(TenantKEKRepo)
@@ -37,8 +37,10 @@ import logging
 import logging.config
 import logging.handlers
 import os
+import Queue
 import stat
 import sys
+import threading
 import traceback
 
 from oslo.config import cfg
@@ -120,6 +122,17 @@ log_opts = [
                default='%(asctime)s.%(msecs)03d %(process)d %(levelname)s '
                        '%(name)s [-] %(instance)s%(message)s',
                help='format string to use for log messages without context'),
+    cfg.BoolOpt('use_async_logging',
+                default=False,
+                help='Hand log records to a background thread, which writes '
+                     'them to the configured handlers, rather than writing '
+                     'them in the thread that logged them'),
+    cfg.IntOpt('async_log_queue_size',
+               default=10000,
+               help='Maximum number of log records waiting to be written '
+                    'when use_async_logging is set. Further records are '
+                    'dropped, and counted in a warning, until there is '
+                    'room'),
     cfg.StrOpt('logging_debug_format_suffix',
                default='%(funcName)s %(pathname)s:%(lineno)d',
                help='data to append to log format when level is DEBUG'),
@@ -169,6 +182,13 @@ CONF.register_opts(log_opts)
 logging.AUDIT = logging.INFO + 1
 logging.addLevelName(logging.AUDIT, 'AUDIT')
 
+# Source files whose frames are skipped when finding the caller of a
+#   logging call: the logging package's own, and this module's.
+_srcfile = __file__
+if _srcfile[-4:].lower() in ('.pyc', '.pyo'):
+    _srcfile = _srcfile[:-4] + '.py'
+_SKIPPED_SRCFILES = frozenset([os.path.normcase(_srcfile), logging._srcfile])
+
 
 try:
     NullHandler = logging.NullHandler
@@ -211,13 +231,60 @@ def _get_log_file_path(binary=None):
         return '%s.log' % (os.path.join(logdir, binary),)
 
 
+def _find_caller():
+    """
+    Replaces Logger.findCaller, to also skip the frames of this module, so
+    that records logged through a ContextAdapter name the adapter's caller.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if os.path.normcase(code.co_filename) not in _SKIPPED_SRCFILES:
+            return code.co_filename, frame.f_lineno, code.co_name
+        frame = frame.f_back
+    return '(unknown file)', 0, '(unknown function)'
+
+
 class ContextAdapter(logging.LoggerAdapter):
-    warn = logging.LoggerAdapter.warning
+    """
+    Adds the request context, project and version to each record.
+
+    Unlike logging.LoggerAdapter, the level is checked before gathering
+    that information, so that disabled calls (typically debug records, on
+    every request) cost only the check.
+    """
 
     def __init__(self, logger, project_name, version_string):
         self.logger = logger
         self.project = project_name
         self.version = version_string
+        logger.findCaller = _find_caller
+
+    def log(self, level, msg, *args, **kwargs):
+        if self.logger.isEnabledFor(level):
+            msg, kwargs = self.process(msg, kwargs)
+            self.logger.log(level, msg, *args, **kwargs)
+
+    def debug(self, msg, *args, **kwargs):
+        self.log(logging.DEBUG, msg, *args, **kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        self.log(logging.INFO, msg, *args, **kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        self.log(logging.WARNING, msg, *args, **kwargs)
+
+    warn = warning
+
+    def error(self, msg, *args, **kwargs):
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+    def exception(self, msg, *args, **kwargs):
+        kwargs['exc_info'] = 1
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+    def critical(self, msg, *args, **kwargs):
+        self.log(logging.CRITICAL, msg, *args, **kwargs)
 
     def audit(self, msg, *args, **kwargs):
         self.log(logging.AUDIT, msg, *args, **kwargs)
@@ -304,6 +371,101 @@ class JSONFormatter(logging.Formatter):
         return jsonutils.dumps(message)
 
 
+class AsyncHandler(logging.Handler):
+    """
+    Queues records for a background thread, which passes them on to the
+    wrapped handlers, so that the threads logging them do not wait on
+    formatting or I/O.
+
+    When the queue is full, records are dropped rather than blocking the
+    caller, and the number dropped is logged once the queue drains.
+    """
+
+    def __init__(self, handlers, queue_size=10000):
+        logging.Handler.__init__(self)
+        self.handlers = list(handlers)
+        self.queue_size = queue_size
+        self.queue = Queue.Queue(queue_size)
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _start(self):
+        """Starts the thread, or restarts it in a forked child process."""
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # The parent's queue and its locks are not usable here.
+                self.queue = Queue.Queue(self.queue_size)
+            self._thread = threading.Thread(target=self._run,
+                                            name='AsyncLogHandler')
+            self._thread.daemon = True
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record):
+        """Formats the message now, as its arguments may change later."""
+        record.msg = record.getMessage()
+        record.args = None
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self.prepare(record)
+            self.queue.put_nowait(record)
+        except Queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            try:
+                if record is None:
+                    return
+                self._dispatch(record)
+                if self.dropped != self._reported_dropped and \
+                        self.queue.empty():
+                    self._report_dropped()
+            finally:
+                self.queue.task_done()
+
+    def _dispatch(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _report_dropped(self):
+        dropped = self.dropped - self._reported_dropped
+        self._reported_dropped += dropped
+        self._dispatch(logging.makeLogRecord(
+            {'name': __name__, 'levelno': logging.WARNING,
+             'levelname': logging.getLevelName(logging.WARNING),
+             'msg': _('Dropped %d log records while the queue was full')
+             % dropped}))
+
+    def flush(self):
+        """Waits for the queued records to be handled."""
+        if self._pid == os.getpid() and self._thread.is_alive():
+            self.queue.join()
+        for handler in self.handlers:
+            handler.flush()
+
+    def close(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join()
+        self._pid = None
+        for handler in self.handlers:
+            handler.close()
+        logging.Handler.close(self)
+
+
 class PublishErrorsHandler(logging.Handler):
     def emit(self, record):
         if ('barbican.openstack.common.notifier.log_notifier' in
@@ -425,6 +587,13 @@ def _setup_logging_from_conf():
         else:
             handler.setFormatter(LegacyFormatter(datefmt=datefmt))
 
+    if CONF.use_async_logging:
+        handlers = log_root.handlers[:]
+        for handler in handlers:
+            log_root.removeHandler(handler)
+        log_root.addHandler(AsyncHandler(handlers,
+                                         CONF.async_log_queue_size))
+
     if CONF.debug:
         log_root.setLevel(logging.DEBUG)
     elif CONF.verbose:
@@ -17,10 +17,13 @@
 Celery Queue Resources related objects and functions.
 """
 from celery import Celery
+from celery.signals import worker_process_init
 
 from oslo.config import cfg
+from barbican.crypto import extension_manager as em
 from barbican.tasks.resources import BeginOrder
 from barbican.common import config, utils
+from barbican.model import repositories
 
 
 LOG = utils.getLogger(__name__)
@@ -48,6 +51,15 @@ celery = Celery(CONF.celery.project,
                 include=[CONF.celery.include])
 
 
+@worker_process_init.connect
+def initialize_worker_process(**kwargs):
+    """
+    Establish the database engine once per worker process, after forking,
+    so that tasks do no database configuration work themselves.
+    """
+    repositories.configure_db()
+
+
 def process_order(order_id, keystone_id):
     """Process Order."""
     return process_order_wrapper.delay(order_id, keystone_id)
@@ -56,6 +68,6 @@ def process_order(order_id, keystone_id):
 @celery.task
 def process_order_wrapper(order_id, keystone_id):
     """(Celery wrapped task) Process Order."""
-    LOG.debug('Order id is {0}'.format(order_id))
-    task = BeginOrder()
+    LOG.debug('Order id is %s', order_id)
+    task = BeginOrder(crypto_manager=em.get_manager())
     return task.process(order_id, keystone_id)
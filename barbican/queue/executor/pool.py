@@ -0,0 +1,175 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Bounded, in-process worker thread pool.
+"""
+import os
+import Queue
+import threading
+import time
+
+from barbican.common import exception
+from barbican.common import utils
+from barbican.openstack.common.gettextutils import _
+
+LOG = utils.getLogger(__name__)
+
+# Queued in place of work to tell a worker thread to exit.
+_STOP = object()
+
+
+class WorkerPool(object):
+    """
+    Runs submitted callables on a fixed number of worker threads.
+
+    Work waits in a bounded queue. When the queue is full, submit() blocks
+    for up to submit_timeout seconds before rejecting the work, which
+    pushes back on callers rather than letting the backlog grow without
+    bound. Worker threads are started lazily, and restarted in a forked
+    child process, since threads do not survive a fork.
+    """
+
+    def __init__(self, num_workers, max_queue_size, submit_timeout=None,
+                 name='worker'):
+        """
+        :param num_workers: Number of worker threads.
+        :param max_queue_size: Maximum number of queued (not yet running)
+                               work items.
+        :param submit_timeout: Seconds submit() waits for queue space, or
+                               None to wait indefinitely.
+        :param name: Prefix for the worker thread names.
+        """
+        self.num_workers = max(1, num_workers)
+        self.max_queue_size = max(1, max_queue_size)
+        self.submit_timeout = submit_timeout
+        self.name = name
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._queue = Queue.Queue(self.max_queue_size)
+        self._workers = []
+        self._pid = None
+        self._shutdown = False
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queues func(*args, **kwargs) to be run by a worker thread.
+
+        :raises: ServiceUnavailable if the pool is shut down, or its queue
+                 stays full for longer than submit_timeout.
+        """
+        if self._shutdown:
+            raise exception.ServiceUnavailable()
+        self._ensure_started()
+
+        try:
+            self._queue.put((func, args, kwargs), True, self.submit_timeout)
+        except Queue.Full:
+            with self._lock:
+                self.rejected += 1
+            LOG.warn(_('%s pool queue is full, rejecting work'), self.name)
+            raise exception.ServiceUnavailable()
+
+    def shutdown(self, wait=True, timeout=None):
+        """
+        Stops accepting work and lets the workers drain the queued work.
+
+        :param wait: Whether to wait for the workers to finish.
+        :param timeout: Maximum seconds to wait, or None for no limit.
+        :returns: True if all workers have finished.
+        """
+        with self._lock:
+            self._shutdown = True
+            workers = self._workers if self._pid == os.getpid() else []
+            self._workers = []
+
+        # Stop markers queue behind any outstanding work.
+        for worker in workers:
+            self._queue.put(_STOP)
+
+        if not wait:
+            return not workers
+
+        deadline = time.time() + timeout if timeout is not None else None
+        for worker in workers:
+            if deadline is None:
+                worker.join()
+            else:
+                worker.join(max(0, deadline - time.time()))
+
+        drained = not any(worker.is_alive() for worker in workers)
+        if not drained:
+            LOG.warn(_('%(name)s pool did not drain within %(timeout)s '
+                       'seconds'), {'name': self.name, 'timeout': timeout})
+        return drained
+
+    def stats(self):
+        """Returns a dict summarizing the pool's activity."""
+        with self._lock:
+            return {'workers': len(self._workers),
+                    'queued': self._queue.qsize(),
+                    'max_queue_size': self.max_queue_size,
+                    'completed': self.completed,
+                    'failed': self.failed,
+                    'rejected': self.rejected}
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+
+        with self._lock:
+            if self._pid == pid:
+                return
+            if self._pid is not None:
+                # Forked: the parent's threads and queue are unusable here.
+                self._queue = Queue.Queue(self.max_queue_size)
+
+            LOG.debug('Starting %s %s pool threads', self.num_workers,
+                      self.name)
+            self._workers = []
+            for index in xrange(self.num_workers):
+                worker = threading.Thread(
+                    target=self._run, args=(self._queue,),
+                    name='{0}-{1}'.format(self.name, index))
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+            self._pid = pid
+
+    def _run(self, work_queue):
+        while True:
+            item = work_queue.get()
+            try:
+                if item is _STOP:
+                    return
+
+                func, args, kwargs = item
+                try:
+                    func(*args, **kwargs)
+                    succeeded = True
+                except Exception:
+                    LOG.exception('%s pool work failed', self.name)
+                    succeeded = False
+
+                with self._lock:
+                    if succeeded:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+            finally:
+                work_queue.task_done()
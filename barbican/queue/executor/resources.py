@@ -0,0 +1,95 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Executor Queue Resources related objects and functions, running the worker
+tasks on an in-process thread pool so that API requests need not wait for
+them, and no message broker is required.
+"""
+import atexit
+import threading
+
+from oslo.config import cfg
+from barbican.queue.executor.pool import WorkerPool
+from barbican.crypto import extension_manager as em
+from barbican.tasks.resources import BeginOrder
+from barbican.common import utils
+from barbican.openstack.common.gettextutils import _
+
+LOG = utils.getLogger(__name__)
+
+opt_group = cfg.OptGroup(name='executor',
+                         title='Options for in-process executor queue')
+
+executor_opts = [
+    cfg.IntOpt('workers', default=4,
+               help=_('Number of worker threads processing tasks.')),
+    cfg.IntOpt('max_queue_size', default=1000,
+               help=_('Maximum number of tasks waiting for a worker.')),
+    cfg.FloatOpt('submit_timeout', default=1.0,
+                 help=_('Seconds to wait for space in a full task queue '
+                        'before rejecting the task.')),
+    cfg.IntOpt('drain_timeout', default=30,
+               help=_('Seconds to wait at shutdown for queued tasks to '
+                      'finish.')),
+]
+
+CONF = cfg.CONF
+CONF.register_group(opt_group)
+CONF.register_opts(executor_opts, opt_group)
+
+_POOL = None
+_TASK = None
+_LOCK = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide task pool, creating it on first use."""
+    global _POOL
+    if _POOL is None:
+        with _LOCK:
+            if _POOL is None:
+                _POOL = WorkerPool(CONF.executor.workers,
+                                   CONF.executor.max_queue_size,
+                                   submit_timeout=CONF.executor.submit_timeout,
+                                   name='order')
+                atexit.register(_POOL.shutdown,
+                                timeout=CONF.executor.drain_timeout)
+    return _POOL
+
+
+def _get_begin_order():
+    """Returns the BeginOrder task processor shared by the pool threads."""
+    global _TASK
+    if _TASK is None:
+        with _LOCK:
+            if _TASK is None:
+                _TASK = BeginOrder(crypto_manager=em.get_manager())
+    return _TASK
+
+
+def _process_order(order_id, keystone_id):
+    LOG.debug('Processing queued order id %s', order_id)
+    return _get_begin_order().process(order_id, keystone_id)
+
+
+def process_order(order_id, keystone_id):
+    """
+    Process Order.
+
+    :raises: ServiceUnavailable if too many orders are already queued.
+    """
+    LOG.debug('Order id is %s', order_id)
+    get_pool().submit(_process_order, order_id, keystone_id)
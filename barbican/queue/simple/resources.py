@@ -18,6 +18,7 @@ Simple Queue Resources related objects and functions, making direct calls
 to the worker tasks.
 """
 from oslo.config import cfg
+from barbican.crypto import extension_manager as em
 from barbican.tasks.resources import BeginOrder
 from barbican.common import utils
 
@@ -28,6 +29,6 @@ CONF = cfg.CONF
 
 def process_order(order_id, keystone_id):
     """Process Order."""
-    LOG.debug('Order id is {0}'.format(order_id))
-    task = BeginOrder()
+    LOG.debug('Order id is %s', order_id)
+    task = BeginOrder(crypto_manager=em.get_manager())
     return task.process(order_id, keystone_id)
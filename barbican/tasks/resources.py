@@ -16,15 +16,35 @@
 """
 Task resources for the Barbican API.
 """
+from datetime import timedelta
 from time import sleep
-from barbican.crypto.extension_manager import CryptoExtensionManager
+from oslo.config import cfg
+from barbican.crypto import extension_manager as em
 from barbican.model import repositories as rep
 from barbican.model.models import States
-from barbican.common.resources import create_secret, get_or_create_tenant
-from barbican.common import utils
+from barbican.common.resources import (create_secret, create_secrets,
+                                       get_or_create_tenant)
+from barbican.common import metrics, utils
+from barbican.openstack.common.gettextutils import _
+from barbican.openstack.common import timeutils
 
 LOG = utils.getLogger(__name__)
 
+task_opts = [
+    cfg.IntOpt('order_batch_size', default=1,
+               help=_('Maximum number of pending orders processed together '
+                      'by one order task. A value of 1 processes just the '
+                      'requested order.')),
+    cfg.IntOpt('order_claim_timeout', default=600,
+               help=_('Seconds after which orders claimed for batched '
+                      'processing, but not completed, are claimed again, '
+                      'such as after a worker failure. Must exceed the '
+                      'time taken to process a batch.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(task_opts)
+
 
 class BeginOrder(object):
     """Handles beginning processing an Order"""
@@ -32,25 +52,33 @@ class BeginOrder(object):
     def __init__(self, crypto_manager=None, tenant_repo=None, order_repo=None,
                  secret_repo=None, tenant_secret_repo=None, datum_repo=None):
         LOG.debug('Creating BeginOrder task processor')
-        self.order_repo = order_repo or rep.OrderRepo()
-        self.tenant_repo = tenant_repo or rep.TenantRepo()
-        self.secret_repo = secret_repo or rep.SecretRepo()
-        self.tenant_secret_repo = tenant_secret_repo or rep.TenantSecretRepo()
-        self.datum_repo = datum_repo or rep.EncryptedDatumRepo()
-        self.crypto_manager = crypto_manager or CryptoExtensionManager()
+        self.order_repo = order_repo or rep.get_order_repository()
+        self.tenant_repo = tenant_repo or rep.get_tenant_repository()
+        self.secret_repo = secret_repo or rep.get_secret_repository()
+        self.tenant_secret_repo = (tenant_secret_repo or
+                                   rep.get_tenant_secret_repository())
+        self.datum_repo = datum_repo or rep.get_encrypted_datum_repository()
+        self.crypto_manager = crypto_manager or em.get_manager()
 
+    @metrics.scoped()
     def process(self, order_id, keystone_id):
         """Process the beginning of an Order."""
-        LOG.debug("Processing Order with ID = {0}".format(order_id))
+        if CONF.order_batch_size > 1:
+            # Process the requested order along with other pending ones.
+            self.process_batch(order_id=order_id)
+            return None
 
-        # Retrieve the order.
-        order = self.order_repo.get(entity_id=order_id,
-                                    keystone_id=keystone_id)
-        self._handle_order(order)
+        LOG.debug("Processing Order with ID = %s", order_id)
 
-        # Indicate we are done with Order processing
-        order.status = States.ACTIVE
-        self.order_repo.save(order)
+        with rep.track_queries('BeginOrder.process'):
+            # Retrieve the order.
+            order = self.order_repo.get(entity_id=order_id,
+                                        keystone_id=keystone_id)
+            self._handle_order(order)
+
+            # Indicate we are done with Order processing
+            order.status = States.ACTIVE
+            self.order_repo.save(order)
 
         return None
 
@@ -60,8 +88,8 @@ class BeginOrder(object):
         process of creating a secret (such as for SSL certificate
         generation.
         """
-        LOG.debug("Handling order for secret type of {0}..."
-                  .format(order.secret_mime_type))
+        LOG.debug("Handling order for secret type of %s...",
+                  order.secret_mime_type)
 
         order_info = order.to_dict_fields()
         secret_info = order_info['secret']
@@ -77,3 +105,96 @@ class BeginOrder(object):
         order.secret_id = new_secret.id
 
         LOG.debug("...done creating order's secret.")
+
+    @metrics.scoped()
+    def process_batch(self, limit=None, order_id=None):
+        """
+        Process the beginning of up to limit pending Orders, defaulting to
+        order_batch_size. If order_id is supplied, that order is claimed
+        first, unless another task already has, so that older pending orders
+        cannot defer it. The orders are claimed in a short transaction,
+        which marks them as processing and so releases their row locks
+        before any crypto work is done. Each tenant's secrets are then
+        created as one batch, and persisted along with its orders' status
+        updates in one transaction. Orders whose secrets cannot be created
+        are marked in error. Orders left processing for longer than
+        order_claim_timeout, such as by a worker that died, are claimed
+        again.
+
+        :returns: int -- the number of orders processed.
+        """
+        limit = limit or CONF.order_batch_size
+        LOG.debug("Processing up to %s pending Orders", limit)
+
+        now = timeutils.utcnow()
+        stale_before = now - timedelta(seconds=CONF.order_claim_timeout)
+
+        session = self.order_repo.get_session()
+        with rep.track_queries('BeginOrder.process_batch'):
+            with session.begin():
+                orders = []
+                if order_id:
+                    orders = self.order_repo.get_pending(
+                        1, stale_before=stale_before, order_id=order_id,
+                        session=session)
+                    if not orders:
+                        LOG.debug("Order %s was already claimed", order_id)
+                if len(orders) < limit:
+                    claimed_ids = set(order.id for order in orders)
+                    orders.extend(
+                        order for order in self.order_repo.get_pending(
+                            limit - len(orders), stale_before=stale_before,
+                            session=session)
+                        if order.id not in claimed_ids)
+
+                for order in orders:
+                    if order.status == States.PROCESSING:
+                        LOG.warn(_('Claiming order %(order_id)s again, as '
+                                   'its claim at %(claimed_at)s was not '
+                                   'completed'),
+                                 {'order_id': order.id,
+                                  'claimed_at': order.claimed_at})
+                    order.status = States.PROCESSING
+                    order.claimed_at = now
+
+            orders_by_tenant = {}
+            for order in orders:
+                orders_by_tenant.setdefault(order.tenant_id,
+                                            []).append(order)
+
+            for tenant_id, tenant_orders in orders_by_tenant.iteritems():
+                try:
+                    self._process_tenant_orders(tenant_id, tenant_orders,
+                                                session)
+                except Exception:
+                    LOG.exception(_("Unable to process orders of tenant "
+                                    "%s"), tenant_id)
+                    with session.begin():
+                        for order in tenant_orders:
+                            order.status = States.ERROR
+
+        LOG.debug("...done processing %s Orders.", len(orders))
+        return len(orders)
+
+    def _process_tenant_orders(self, tenant_id, orders, session):
+        """Creates the secrets of one tenant's claimed orders."""
+        tenant = self.tenant_repo.get(tenant_id, session=session)
+        secrets_info = [order.to_dict_fields()['secret'] for order in orders]
+
+        # create_secrets() encrypts before it writes, so this transaction
+        #   issues no statements until the crypto work is done.
+        with session.begin():
+            results = create_secrets(secrets_info, tenant,
+                                     self.crypto_manager, self.secret_repo,
+                                     self.tenant_secret_repo,
+                                     self.datum_repo, ok_to_generate=True,
+                                     session=session)
+
+            for order, result in zip(orders, results):
+                if isinstance(result, Exception):
+                    LOG.error("Unable to create secret for order %s: %s",
+                              order.id, result)
+                    order.status = States.ERROR
+                else:
+                    order.secret_id = result.id
+                    order.status = States.ACTIVE
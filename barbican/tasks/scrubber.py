@@ -0,0 +1,233 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Scrubber task, which purges soft-deleted entities from the database.
+
+Deleting a secret or order only marks its rows as deleted, so that every
+query must filter them out of ever-growing tables. Once rows have been
+deleted for longer than scrub_time, the scrubber archives them to a file
+in scrubber_datadir and removes them, in transactions of at most
+scrub_batch_size entities so that locks are held briefly. Rows are
+archived before their transaction commits, so rows whose purge fails are
+archived again by a later run.
+"""
+
+import base64
+import collections
+import datetime
+import errno
+import os
+import time
+
+from oslo.config import cfg
+from sqlalchemy import and_, LargeBinary
+import sqlalchemy.sql as sa_sql
+
+from barbican.common import metrics, utils
+from barbican.model import models
+from barbican.model import repositories as rep
+from barbican.openstack.common import jsonutils as json
+from barbican.openstack.common import timeutils
+from barbican.openstack.common.gettextutils import _
+
+LOG = utils.getLogger(__name__)
+
+scrubber_opts = [
+    cfg.IntOpt('scrub_time', default=43200,
+               help=_('Seconds after deletion before deleted secrets and '
+                      'orders are purged from the database.')),
+    cfg.StrOpt('scrubber_datadir', default=None,
+               help=_('Directory to which purged rows are archived, as one '
+                      'file of JSON lines per scrubber run. If unset, rows '
+                      'are purged without being archived.')),
+    cfg.IntOpt('scrub_batch_size', default=500,
+               help=_('Maximum number of entities purged per database '
+                      'transaction.')),
+    cfg.IntOpt('scrub_interval', default=3600,
+               help=_('Seconds between scrubber runs. Zero runs the '
+                      'scrubber once, such as from cron.')),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(scrubber_opts)
+
+_SECRETS = models.Secret.__table__
+_ORDERS = models.Order.__table__
+_ENCRYPTED_DATA = models.EncryptedDatum.__table__
+_TENANT_SECRETS = models.TenantSecret.__table__
+
+# Entities purged, in order, each with the tables and foreign key columns
+#   of the child rows purged along with them. Orders go first, since they
+#   reference secrets.
+_PURGED = (
+    (_ORDERS, ()),
+    (_SECRETS, ((_ENCRYPTED_DATA, _ENCRYPTED_DATA.c.secret_id),
+                (_TENANT_SECRETS, _TENANT_SECRETS.c.secret_id))),
+)
+
+
+class _Archive(object):
+    """
+    Appends purged rows to a file of JSON lines, which is created on the
+    first write, readable only by its owner.
+    """
+
+    def __init__(self, datadir, now):
+        self.path = os.path.join(datadir, 'scrub-{0}-{1}.jsonl'.format(
+            now.strftime('%Y%m%dT%H%M%S'), os.getpid()))
+        self.archive_file = None
+
+    def write(self, table, rows):
+        if self.archive_file is None:
+            self._open()
+        for row in rows:
+            self.archive_file.write(json.dumps(
+                {'table': table.name, 'row': _archive_row(table, row)}))
+            self.archive_file.write('\n')
+
+    def sync(self):
+        """Ensures that the rows written are stored, before purging them."""
+        if self.archive_file is not None:
+            self.archive_file.flush()
+            os.fsync(self.archive_file.fileno())
+
+    def close(self):
+        if self.archive_file is not None:
+            self.archive_file.close()
+            self.archive_file = None
+
+    def _open(self):
+        try:
+            os.makedirs(os.path.dirname(self.path))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+                     0600)
+        self.archive_file = os.fdopen(fd, 'a')
+
+
+def _archive_row(table, row):
+    """Returns a JSON-native dict of the row's columns."""
+    document = {}
+    for column in table.columns:
+        value = row[column.name]
+        if isinstance(value, datetime.datetime):
+            value = value.isoformat()
+        elif value is not None and isinstance(column.type, LargeBinary):
+            value = base64.b64encode(value)
+        document[column.name] = value
+    return document
+
+
+class Scrubber(object):
+    """Purges deleted secrets and orders, and their child rows."""
+
+    def __init__(self, get_session=None):
+        self.get_session = get_session or rep.get_session
+
+    @metrics.scoped()
+    def scrub(self, now=None):
+        """
+        Purges the entities deleted more than scrub_time seconds before
+        now, archiving them first if scrubber_datadir is set.
+
+        Deleted secrets that are still referenced by an order are kept,
+        until that order is itself purged.
+
+        :returns: dict of table name to the number of rows purged.
+        """
+        now = now or timeutils.utcnow()
+        cutoff = now - datetime.timedelta(seconds=CONF.scrub_time)
+        archive = None
+        if CONF.scrubber_datadir:
+            archive = _Archive(CONF.scrubber_datadir, now)
+        purged = collections.defaultdict(int)
+
+        session = self.get_session()
+        try:
+            with rep.track_queries('Scrubber.scrub'):
+                for table, children in _PURGED:
+                    while self._purge_batch(session, archive, table,
+                                            children, cutoff, purged):
+                        pass
+        finally:
+            if archive:
+                archive.close()
+
+        if purged:
+            LOG.info(_('Purged deleted rows older than %(cutoff)s: '
+                       '%(purged)s'), {'cutoff': cutoff,
+                                       'purged': dict(purged)})
+        return dict(purged)
+
+    def _purge_batch(self, session, archive, table, children, cutoff,
+                     purged):
+        """
+        Purges up to scrub_batch_size entities from the table, along with
+        their child rows, in one transaction.
+
+        :returns: bool -- whether a full batch was purged, so that more
+                  entities may remain.
+        """
+        # Note: Must use '== True' below, not 'is True'.
+        criteria = [table.c.deleted == True,
+                    table.c.deleted_at < cutoff]
+        if table is _SECRETS:
+            criteria.append(~sa_sql.exists().where(
+                _ORDERS.c.secret_id == _SECRETS.c.id))
+        query = sa_sql.select([table.c.id]) \
+                      .where(and_(*criteria)) \
+                      .order_by(table.c.deleted_at) \
+                      .limit(CONF.scrub_batch_size)
+
+        with session.begin():
+            ids = [row[0] for row in session.execute(query)]
+            if not ids:
+                return False
+
+            for child_table, column in children:
+                self._purge_rows(session, archive, child_table,
+                                 column.in_(ids), purged)
+            self._purge_rows(session, archive, table, table.c.id.in_(ids),
+                             purged)
+
+        LOG.debug('Purged %s rows from %s', len(ids), table.name)
+        return len(ids) >= CONF.scrub_batch_size
+
+    def _purge_rows(self, session, archive, table, criterion, purged):
+        if archive:
+            archive.write(table, session.execute(
+                table.select().where(criterion)))
+            archive.sync()
+        result = session.execute(table.delete().where(criterion))
+        purged[table.name] += result.rowcount
+
+    def run(self):
+        """
+        Scrubs every scrub_interval seconds, or once if it is zero. Errors
+        are logged, and the next run retries.
+        """
+        while True:
+            try:
+                self.scrub()
+            except Exception:
+                LOG.exception(_('Scrubber run failed'))
+                if not CONF.scrub_interval:
+                    raise
+            if not CONF.scrub_interval:
+                return
+            time.sleep(CONF.scrub_interval)
@@ -0,0 +1,48 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from barbican import api
+from barbican.common import exception
+
+
+class WhenParsingByteRanges(unittest.TestCase):
+
+    def test_should_ignore_missing_range(self):
+        self.assertIsNone(api.parse_byte_range(None, 100))
+
+    def test_should_parse_closed_range(self):
+        self.assertEqual((10, 20), api.parse_byte_range('bytes=10-19', 100))
+
+    def test_should_parse_open_range(self):
+        self.assertEqual((90, 100), api.parse_byte_range('bytes=90-', 100))
+
+    def test_should_parse_suffix_range(self):
+        self.assertEqual((75, 100), api.parse_byte_range('bytes=-25', 100))
+        self.assertEqual((0, 100), api.parse_byte_range('bytes=-500', 100))
+
+    def test_should_truncate_range_past_end(self):
+        self.assertEqual((50, 100), api.parse_byte_range('bytes=50-999', 100))
+
+    def test_should_ignore_malformed_and_multiple_ranges(self):
+        for value in ('bytes=abc', 'bytes=5-2', 'items=0-1', 'bytes=-',
+                      'bytes=0-1,5-6', '0-10'):
+            self.assertIsNone(api.parse_byte_range(value, 100))
+
+    def test_should_raise_for_unsatisfiable_range(self):
+        for value in ('bytes=100-', 'bytes=200-300', 'bytes=-0'):
+            self.assertRaises(exception.RangeNotSatisfiable,
+                              api.parse_byte_range, value, 100)
@@ -0,0 +1,103 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+import unittest
+
+from mock import MagicMock, patch
+
+from barbican.api import policy
+from barbican.common import exception
+
+
+class WhenTestingPolicyEnforcer(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.policy_path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self._write_rules({'context_is_admin': 'role:admin',
+                           'default': '',
+                           'manage_re_key': 'role:admin',
+                           'own_tenant': 'tenant:%(tenant)s'})
+
+        with patch.object(policy.Enforcer, '_find_policy_file',
+                          return_value=self.policy_path):
+            self.enforcer = policy.Enforcer()
+
+        self.context = MagicMock()
+        self.context.roles = ['Member']
+        self.context.user = 'user1'
+        self.context.tenant = 'tenant1'
+
+    def tearDown(self):
+        os.remove(self.policy_path)
+
+    def _write_rules(self, rules):
+        with open(self.policy_path, 'w') as policy_file:
+            json.dump(rules, policy_file)
+
+    def test_should_enforce_role_rules(self):
+        self.assertFalse(self.enforcer.check_is_admin(self.context))
+        self.context.roles = ['Admin']
+        self.assertTrue(self.enforcer.check_is_admin(self.context))
+
+    def test_should_raise_forbidden_when_enforcing(self):
+        self.assertRaises(exception.Forbidden, self.enforcer.enforce,
+                          self.context, 'manage_re_key', {})
+
+    def test_should_memoize_role_only_rules(self):
+        self.enforcer.check_is_admin(self.context)
+
+        with patch.object(policy.policy, 'check') as mock_check:
+            self.assertFalse(self.enforcer.check_is_admin(self.context))
+            self.assertFalse(mock_check.called)
+
+    def test_should_not_memoize_target_dependent_rules(self):
+        self.enforcer.check(self.context, 'own_tenant',
+                            {'tenant': 'tenant1'})
+
+        self.assertFalse(self.enforcer.check(self.context, 'own_tenant',
+                                             {'tenant': 'tenant2'}))
+        self.assertTrue(self.enforcer.check(self.context, 'own_tenant',
+                                            {'tenant': 'tenant1'}))
+
+    def test_should_not_read_policy_file_within_reload_interval(self):
+        self.enforcer.load_rules()
+
+        with patch('os.path.getmtime') as mock_getmtime:
+            self.enforcer.check_is_admin(self.context)
+            self.assertFalse(mock_getmtime.called)
+
+    def test_should_reload_changed_policy_after_interval(self):
+        self.enforcer.reload_interval = 0
+        self.assertFalse(self.enforcer.check_is_admin(self.context))
+
+        self._write_rules({'context_is_admin': 'role:Member',
+                           'default': ''})
+        os.utime(self.policy_path, (0, 0))
+
+        self.assertTrue(self.enforcer.check_is_admin(self.context))
+
+    def test_should_reload_rules_replaced_by_another_enforcer(self):
+        self.enforcer.load_rules()
+        policy.policy.set_rules(policy.policy.Rules({}, 'default'))
+
+        self.assertFalse(self.enforcer.check_is_admin(self.context))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,16 +13,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from mock import MagicMock
+from mock import MagicMock, patch
 import falcon
 import json
 import unittest
 
-from datetime import datetime
+from datetime import datetime, timedelta
+from barbican import api
 from barbican.api import resources as res
 from barbican.crypto.extension_manager import CryptoExtensionManager
+from barbican.crypto.plugin import DecryptedData
 from barbican.model import models
+from barbican.model import repositories as repo
 from barbican.common import config
+from barbican.common import metrics
+from barbican.common import resources as common_res
 from barbican.common import exception as excep
 from barbican.common.validators import DEFAULT_MAX_SECRET_BYTES
 from barbican.openstack.common import jsonutils
@@ -94,6 +99,69 @@ class WhenTestingVersionResource(unittest.TestCase):
         self.assertEqual('current', parsed_body['v1'])
 
 
+class WhenTestingMetricsResource(unittest.TestCase):
+    def setUp(self):
+        self.req = MagicMock()
+        self.resp = MagicMock()
+        self.resource = res.MetricsResource()
+
+        self.registry = metrics.MetricsRegistry()
+        patcher = patch.object(metrics, 'get_registry',
+                               return_value=self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get_latency(self):
+        self.resource.on_get(self.req, self.resp)
+        self.assertEqual(falcon.HTTP_200, self.resp.status)
+        return json.loads(self.resp.body)['latency']
+
+    def test_should_report_request_latency(self):
+        res.VersionResource(MagicMock()).on_get(self.req, self.resp)
+
+        latency = self._get_latency()
+
+        self.assertEqual(1, latency['VersionResource.on_get']['count'])
+
+    def test_should_report_failed_requests(self):
+        order_repo = MagicMock()
+        order_repo.get.return_value = None
+
+        with self.assertRaises(falcon.HTTPError):
+            res.OrderResource(order_repo, MagicMock()).on_get(
+                self.req, self.resp, 'keystone1', 'order1')
+
+        latency = self._get_latency()['OrderResource.on_get']
+        self.assertEqual(1, latency['count'])
+        self.assertEqual(1, latency['errors'])
+
+
+class WhenAddingQueryDebugHeaders(unittest.TestCase):
+    def setUp(self):
+        self.req = MagicMock()
+        self.resp = MagicMock()
+        self.order_repo = MagicMock()
+        self.order_repo.get.return_value = create_order('text/plain')
+        self.resource = res.OrderResource(self.order_repo, MagicMock())
+
+    def tearDown(self):
+        res.CONF.clear_override('sql_debug_headers')
+
+    def test_should_add_query_headers_when_enabled(self):
+        res.CONF.set_override('sql_debug_headers', True)
+
+        self.resource.on_get(self.req, self.resp, 'keystone1', 'id')
+
+        self.resp.set_header.assert_any_call('X-Barbican-Query-Count', '0')
+        self.resp.set_header.assert_any_call('X-Barbican-Query-Time-Ms',
+                                             '0.0')
+
+    def test_should_not_add_query_headers_by_default(self):
+        self.resource.on_get(self.req, self.resp, 'keystone1', 'id')
+
+        self.assertFalse(self.resp.set_header.called)
+
+
 class WhenCreatingSecretsUsingSecretsResource(unittest.TestCase):
     def setUp(self):
         self.name = 'name'
@@ -116,6 +184,7 @@ class WhenCreatingSecretsUsingSecretsResource(unittest.TestCase):
         self.tenant = models.Tenant()
         self.tenant.id = self.tenant_entity_id
         self.tenant.keystone_id = self.keystone_id
+        common_res.get_tenant_cache().clear()
         self.tenant_repo = MagicMock()
         self.tenant_repo.find_by_keystone_id.return_value = self.tenant
 
@@ -175,6 +244,16 @@ class WhenCreatingSecretsUsingSecretsResource(unittest.TestCase):
         self.assertEqual(self.mime_type, datum.mime_type)
         self.assertIsNotNone(datum.kek_metadata)
 
+    def test_should_add_new_secret_in_one_transaction(self):
+        self.resource.on_post(self.req, self.resp, self.keystone_id)
+
+        session = self.secret_repo.get_session.return_value
+        session.begin.assert_called_once_with()
+        for repo_mock in (self.secret_repo, self.tenant_secret_repo,
+                          self.datum_repo):
+            args, kwargs = repo_mock.create_from.call_args
+            self.assertIs(session, kwargs['session'])
+
     def test_should_add_new_secret_with_expiration(self):
         expiration = '2114-02-28 12:14:44.180394-05:00'
         self.secret_req.update({'expiration': expiration})
@@ -295,6 +374,277 @@ class WhenCreatingSecretsUsingSecretsResource(unittest.TestCase):
         self.assertEqual(falcon.HTTP_400, exception.status)
 
 
+class WhenCreatingSecretsUsingSecretsBatchResource(unittest.TestCase):
+    def setUp(self):
+        self.secret_req = {'name': 'name',
+                           'mime_type': 'text/plain',
+                           'algorithm': 'algo',
+                           'bit_length': 512,
+                           'cypher_type': 'cytype',
+                           'plain_text': 'not-encrypted'}
+        self.secrets_req = {'secrets': [dict(self.secret_req),
+                                        dict(self.secret_req)]}
+
+        self.keystone_id = 'keystone1234'
+        self.tenant = models.Tenant()
+        self.tenant.id = 'tid1234'
+        self.tenant.keystone_id = self.keystone_id
+        common_res.get_tenant_cache().clear()
+        self.tenant_repo = MagicMock()
+        self.tenant_repo.find_by_keystone_id.return_value = self.tenant
+
+        def assign_ids(entities, session):
+            for index, entity in enumerate(entities):
+                entity.id = 'id{0}'.format(index)
+            return entities
+
+        self.session = MagicMock()
+        self.secret_repo = MagicMock()
+        self.secret_repo.get_session.return_value = self.session
+        self.secret_repo.create_all_from.side_effect = assign_ids
+        self.tenant_secret_repo = MagicMock()
+        self.datum_repo = MagicMock()
+
+        self.stream = MagicMock()
+        self.req = MagicMock()
+        self.req.stream = self.stream
+        self.resp = MagicMock()
+
+        self.conf = MagicMock()
+        self.conf.crypto.namespace = 'barbican.test.crypto.plugin'
+        self.conf.crypto.enabled_crypto_plugins = ['test_crypto']
+        self.crypto_mgr = CryptoExtensionManager(conf=self.conf)
+
+        self.resource = res.SecretsBatchResource(self.crypto_mgr,
+                                                 self.tenant_repo,
+                                                 self.secret_repo,
+                                                 self.tenant_secret_repo,
+                                                 self.datum_repo,
+                                                 MagicMock())
+
+    def _post(self):
+        body = json.dumps(self.secrets_req)
+        self.req.content_length = len(body)
+        self.stream.read.side_effect = lambda size: body[:size]
+        self.resource.on_post(self.req, self.resp, self.keystone_id)
+        return json.loads(self.resp.body)['secrets']
+
+    def test_should_add_new_secrets_in_one_transaction(self):
+        secrets_resp = self._post()
+
+        self.assertEqual(falcon.HTTP_201, self.resp.status)
+        self.assertEqual(2, len(secrets_resp))
+        for index, secret_resp in enumerate(secrets_resp):
+            self.assertTrue(secret_resp['secret_ref'].endswith(
+                'secrets/id{0}'.format(index)))
+
+        self.session.begin.assert_called_once_with()
+        for repository in (self.secret_repo, self.tenant_secret_repo,
+                           self.datum_repo):
+            args, kwargs = repository.create_all_from.call_args
+            entities, session = args
+            self.assertEqual(2, len(entities))
+            self.assertIs(self.session, session)
+
+        args, kwargs = self.tenant_secret_repo.create_all_from.call_args
+        self.assertEqual(['id0', 'id1'], [a.secret_id for a in args[0]])
+        args, kwargs = self.datum_repo.create_all_from.call_args
+        self.assertEqual(['id0', 'id1'], [d.secret_id for d in args[0]])
+        self.assertEqual('cypher_text', args[0][0].cypher_text)
+
+    def test_should_report_errors_per_secret(self):
+        self.secrets_req['secrets'][0]['mime_type'] = 'bogus'
+        self.secrets_req['secrets'].append(dict(self.secret_req,
+                                                plain_text='   '))
+        self.secrets_req['secrets'].append(
+            dict(self.secret_req, mime_type='application/octet-stream'))
+
+        secrets_resp = self._post()
+
+        self.assertEqual(falcon.HTTP_201, self.resp.status)
+        self.assertEqual(4, len(secrets_resp))
+        self.assertIn('mime_type', secrets_resp[0]['error'])
+        self.assertIn('secret_ref', secrets_resp[1])
+        self.assertIn('plain_text', secrets_resp[2]['error'])
+        self.assertIn('not supported', secrets_resp[3]['error'])
+
+        args, kwargs = self.secret_repo.create_all_from.call_args
+        self.assertEqual(1, len(args[0]))
+
+    def test_should_fail_if_no_secrets_created(self):
+        for secret_req in self.secrets_req['secrets']:
+            secret_req['mime_type'] = 'bogus'
+
+        secrets_resp = self._post()
+
+        self.assertEqual(falcon.HTTP_400, self.resp.status)
+        self.assertTrue(all('error' in s for s in secrets_resp))
+        self.assertFalse(self.secret_repo.get_session.called)
+        self.assertFalse(self.tenant_repo.find_by_keystone_id.called)
+
+    def test_should_report_non_object_secrets_individually(self):
+        self.secrets_req['secrets'].append('not-a-secret')
+
+        secrets_resp = self._post()
+
+        self.assertEqual(falcon.HTTP_201, self.resp.status)
+        self.assertIn('secret_ref', secrets_resp[0])
+        self.assertIn('error', secrets_resp[2])
+
+    def test_should_fail_with_no_secrets(self):
+        self.secrets_req = {'secrets': []}
+
+        with self.assertRaises(falcon.HTTPError) as cm:
+            self._post()
+
+        self.assertEqual(falcon.HTTP_400, cm.exception.status)
+
+    def test_should_fail_with_too_many_secrets(self):
+        config.CONF.set_override('max_secrets_per_batch', 1)
+        self.addCleanup(config.CONF.clear_override, 'max_secrets_per_batch')
+
+        with self.assertRaises(falcon.HTTPError) as cm:
+            self._post()
+
+        self.assertEqual(falcon.HTTP_413, cm.exception.status)
+
+    def test_should_accept_batch_bodies_over_one_megabyte(self):
+        self.secrets_req = {'secrets': [dict(self.secret_req,
+                                             plain_text='x' * 2048)
+                                        for _ in range(600)]}
+
+        secrets_resp = self._post()
+
+        self.assertTrue(self.req.content_length >
+                        api.MAX_BYTES_REQUEST_INPUT_ACCEPTED)
+        self.assertEqual(falcon.HTTP_201, self.resp.status)
+        self.assertEqual(600, len(secrets_resp))
+
+    def test_should_reject_body_over_batch_limit_by_content_length(self):
+        self.req.content_length = res.max_batch_body_bytes() + 1
+
+        with self.assertRaises(falcon.HTTPError) as cm:
+            self.resource.on_post(self.req, self.resp, self.keystone_id)
+
+        self.assertEqual(falcon.HTTP_413, cm.exception.status)
+        self.assertFalse(self.stream.read.called)
+
+    def test_should_reject_body_over_batch_limit_without_length(self):
+        config.CONF.set_override('max_secrets_per_batch', 1)
+        self.addCleanup(config.CONF.clear_override, 'max_secrets_per_batch')
+        body = json.dumps({'secrets': [dict(
+            self.secret_req, plain_text='x' * res.max_batch_body_bytes())]})
+        self.req.content_length = None
+        self.stream.read.side_effect = lambda size: body[:size]
+
+        with self.assertRaises(falcon.HTTPError) as cm:
+            self.resource.on_post(self.req, self.resp, self.keystone_id)
+
+        self.assertEqual(falcon.HTTP_413, cm.exception.status)
+
+
+class WhenGettingSecretsUsingSecretsBatchResource(unittest.TestCase):
+    def setUp(self):
+        self.keystone_id = 'keystone1234'
+        self.secrets = []
+        for index, mime_type in enumerate(['text/plain', 'text/plain']):
+            datum = models.EncryptedDatum()
+            datum.mime_type = mime_type
+            datum.cypher_text = 'cypher_text'
+            datum.kek_metadata = 'kekedata'
+            secret = create_secret(mime_type, encrypted_datum=datum)
+            secret.id = 'id{0}'.format(index)
+            self.secrets.append(secret)
+        self.metadata_secret = create_secret('application/octet-stream')
+        self.metadata_secret.id = 'idmeta'
+        self.secrets.append(self.metadata_secret)
+
+        self.tenant = models.Tenant()
+        self.tenant.id = 'tid1234'
+        self.tenant.keystone_id = self.keystone_id
+        common_res.get_tenant_cache().clear()
+        self.tenant_repo = MagicMock()
+        self.tenant_repo.find_by_keystone_id.return_value = self.tenant
+
+        self.secret_repo = MagicMock()
+        self.secret_repo.get_many.return_value = self.secrets
+
+        self.req = MagicMock()
+        self.req.accept = 'application/json'
+        self.req._params = {'ids': 'id0,idmeta, id1,id0,missing'}
+        self.resp = MagicMock()
+
+        self.conf = MagicMock()
+        self.conf.crypto.namespace = 'barbican.test.crypto.plugin'
+        self.conf.crypto.enabled_crypto_plugins = ['test_crypto']
+        self.crypto_mgr = CryptoExtensionManager(conf=self.conf)
+
+        self.resource = res.SecretsBatchResource(self.crypto_mgr,
+                                                 self.tenant_repo,
+                                                 self.secret_repo,
+                                                 MagicMock(), MagicMock(),
+                                                 MagicMock())
+
+    def test_should_get_secrets_in_one_query(self):
+        self.resource.on_get(self.req, self.resp, self.keystone_id)
+
+        self.assertEqual(falcon.HTTP_200, self.resp.status)
+        self.secret_repo.get_many.assert_called_once_with(
+            ['id0', 'idmeta', 'id1', 'missing'], self.keystone_id)
+        self.assertEqual(1, self.tenant_repo.find_by_keystone_id.call_count)
+
+        secrets_resp = json.loads(self.resp.body)['secrets']
+        self.assertEqual(4, len(secrets_resp))
+        self.assertTrue(secrets_resp[0]['secret_ref'].endswith('/id0'))
+        self.assertEqual('plain-data', secrets_resp[0]['payload'])
+        self.assertNotIn('payload', secrets_resp[1])
+        self.assertEqual('plain-data', secrets_resp[2]['payload'])
+        self.assertTrue(secrets_resp[3]['secret_ref'].endswith('/missing'))
+        self.assertIn('error', secrets_resp[3])
+
+    def test_should_not_resolve_tenant_without_data_to_decrypt(self):
+        self.secret_repo.get_many.return_value = [self.metadata_secret]
+
+        self.resource.on_get(self.req, self.resp, self.keystone_id)
+
+        self.assertFalse(self.tenant_repo.find_by_keystone_id.called)
+
+    def test_should_fail_with_no_ids(self):
+        self.req._params = {'ids': ' , '}
+
+        with self.assertRaises(falcon.HTTPError) as cm:
+            self.resource.on_get(self.req, self.resp, self.keystone_id)
+
+        self.assertEqual(falcon.HTTP_400, cm.exception.status)
+
+    def test_should_fail_with_too_many_ids(self):
+        config.CONF.set_override('max_secrets_per_batch', 2)
+        self.addCleanup(config.CONF.clear_override, 'max_secrets_per_batch')
+
+        with self.assertRaises(falcon.HTTPError) as cm:
+            self.resource.on_get(self.req, self.resp, self.keystone_id)
+
+        self.assertEqual(falcon.HTTP_413, cm.exception.status)
+
+    def test_should_fail_with_unsupported_accept(self):
+        self.req.accept = 'text/plain'
+
+        with self.assertRaises(falcon.HTTPError) as cm:
+            self.resource.on_get(self.req, self.resp, self.keystone_id)
+
+        self.assertEqual(falcon.HTTP_406, cm.exception.status)
+
+    def test_should_fail_if_decryption_fails(self):
+        self.secrets[0].mime_type = 'application/octet-stream'
+        self.secrets[0].encrypted_data[0].mime_type = \
+            'application/octet-stream'
+
+        with self.assertRaises(falcon.HTTPError) as cm:
+            self.resource.on_get(self.req, self.resp, self.keystone_id)
+
+        self.assertEqual(falcon.HTTP_500, cm.exception.status)
+
+
 class WhenGettingSecretsListUsingSecretsResource(unittest.TestCase):
     def setUp(self):
         self.tenant_id = 'tenant1234'
@@ -320,6 +670,8 @@ class WhenGettingSecretsListUsingSecretsResource(unittest.TestCase):
 
         self.secrets = [create_secret(id='id' + str(id), **secret_params) for
                         id in xrange(self.num_secrets)]
+        for entity in self.secrets:
+            entity.created_at = datetime(2013, 6, 1, 12, 30)
 
         self.secret_repo = MagicMock()
         self.secret_repo.get_by_create_date.return_value = (self.secrets,
@@ -359,6 +711,8 @@ class WhenGettingSecretsListUsingSecretsResource(unittest.TestCase):
                                                                 self.offset),
                                      limit_arg=self.params.get('limit',
                                                                self.limit),
+                                     marker_arg=self.params.get('marker',
+                                                                None),
                                      suppress_exception=True)
 
         resp_body = jsonutils.loads(self.resp.body)
@@ -366,7 +720,9 @@ class WhenGettingSecretsListUsingSecretsResource(unittest.TestCase):
         self.assertTrue('next' in resp_body)
 
         url_nav_next = self._create_url(self.keystone_id,
-                                        self.offset + self.limit, self.limit)
+                                        limit_arg=self.limit,
+                                        marker=repo.encode_marker(
+                                            self.secrets[-1]))
         self.assertTrue(self.resp.body.count(url_nav_next) == 1)
 
         url_nav_prev = self._create_url(self.keystone_id,
@@ -389,14 +745,67 @@ class WhenGettingSecretsListUsingSecretsResource(unittest.TestCase):
                                                                 self.offset),
                                      limit_arg=self.params.get('limit',
                                                                self.limit),
+                                     marker_arg=self.params.get('marker',
+                                                                None),
                                      suppress_exception=True)
 
         resp_body = jsonutils.loads(self.resp.body)
         self.assertFalse('previous' in resp_body)
         self.assertFalse('next' in resp_body)
 
-    def _create_url(self, keystone_id, offset_arg=None, limit_arg=None):
-        if limit_arg:
+    def test_should_get_list_secrets_after_marker(self):
+        self.params['marker'] = repo.encode_marker(self.secrets[1])
+
+        self.resource.on_get(self.req, self.resp, self.keystone_id)
+
+        args, kwargs = self.secret_repo.get_by_create_date.call_args
+        self.assertEqual(self.params['marker'], kwargs['marker_arg'])
+
+    def test_should_link_previous_page_before_marker(self):
+        self.params['marker'] = repo.encode_marker(self.secrets[1])
+
+        self.resource.on_get(self.req, self.resp, self.keystone_id)
+
+        resp_body = jsonutils.loads(self.resp.body)
+        url_nav_prev = self._create_url(self.keystone_id,
+                                        limit_arg=self.limit,
+                                        marker=repo.encode_marker(
+                                            self.secrets[0], before=True))
+        self.assertTrue(resp_body['previous'].endswith(url_nav_prev))
+        self.assertTrue('next' in resp_body)
+
+    def test_should_link_next_page_when_paging_backward(self):
+        self.params['marker'] = repo.encode_marker(self.secrets[1],
+                                                   before=True)
+        self.secret_repo.get_by_create_date.return_value = (
+            self.secrets[:1], 0, self.limit)
+
+        self.resource.on_get(self.req, self.resp, self.keystone_id)
+
+        resp_body = jsonutils.loads(self.resp.body)
+        self.assertFalse('previous' in resp_body)
+        url_nav_next = self._create_url(self.keystone_id,
+                                        limit_arg=self.limit,
+                                        marker=repo.encode_marker(
+                                            self.secrets[0]))
+        self.assertTrue(resp_body['next'].endswith(url_nav_next))
+
+    def test_should_fail_list_secrets_with_invalid_marker(self):
+        self.secret_repo.get_by_create_date.side_effect = excep.Invalid()
+
+        with self.assertRaises(falcon.HTTPError) as cm:
+            self.resource.on_get(self.req, self.resp, self.keystone_id)
+
+        exception = cm.exception
+        self.assertEqual(falcon.HTTP_400, exception.status)
+
+    def _create_url(self, keystone_id, offset_arg=None, limit_arg=None,
+                    marker=None):
+        if marker:
+            return '/v1/{0}/secrets?limit={1}&marker={2}'.format(keystone_id,
+                                                                 limit_arg,
+                                                                 marker)
+        elif limit_arg:
             offset = int(offset_arg)
             limit = int(limit_arg)
             return '/v1/{0}/secrets?limit={1}&offset={2}'.format(keystone_id,
@@ -436,11 +845,16 @@ class WhenGettingPuttingOrDeletingSecretUsingSecretResource(unittest.TestCase):
         self.tenant = models.Tenant()
         self.tenant.id = self.tenant_id
         self.keystone_id = self.keystone_id
+        common_res.get_tenant_cache().clear()
+        res.get_secret_metadata_cache().clear()
         self.tenant_repo = MagicMock()
         self.tenant_repo.get.return_value = self.tenant
 
         self.secret_repo = MagicMock()
         self.secret_repo.get.return_value = self.secret
+        self.secret_repo.get_metadata.return_value = self.secret
+        self.secret_repo.get_version.side_effect = \
+            lambda **kwargs: res._secret_version(self.secret)
         self.secret_repo.delete_entity_by_id.return_value = None
 
         self.tenant_secret_repo = MagicMock()
@@ -472,9 +886,10 @@ class WhenGettingPuttingOrDeletingSecretUsingSecretResource(unittest.TestCase):
                              self.secret.id)
 
         self.secret_repo \
-            .get.assert_called_once_with(entity_id=self.secret.id,
-                                         keystone_id=self.keystone_id,
-                                         suppress_exception=True)
+            .get_metadata.assert_called_once_with(entity_id=self.secret.id,
+                                                  keystone_id=self.keystone_id,
+                                                  suppress_exception=True)
+        self.assertFalse(self.secret_repo.get.called)
 
         self.assertEquals(self.resp.status, falcon.HTTP_200)
 
@@ -483,6 +898,107 @@ class WhenGettingPuttingOrDeletingSecretUsingSecretResource(unittest.TestCase):
         self.assertTrue(self.datum.mime_type in
                         resp_body['content_types'].itervalues())
 
+    def test_should_serve_cached_metadata_with_etag(self):
+        self.req.get_header.return_value = None
+        self.resource.on_get(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+        first_body = self.resp.body
+        etag = self._response_header('ETag')
+
+        self.resp = MagicMock()
+        self.resource.on_get(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+
+        self.assertEqual(1, self.secret_repo.get_metadata.call_count)
+        self.assertEqual(first_body, self.resp.body)
+        self.assertEqual(etag, self._response_header('ETag'))
+
+    def test_should_return_not_modified_for_matching_etag(self):
+        self.resource.on_get(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+        etag = self._response_header('ETag')
+
+        self.req.get_header.side_effect = \
+            lambda name: '"other", ' + etag if name == 'If-None-Match' \
+            else None
+        self.resp = MagicMock()
+        self.resp.body = None
+        self.resource.on_get(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+
+        self.assertEqual(falcon.HTTP_304, self.resp.status)
+        self.assertIsNone(self.resp.body)
+
+    def test_should_change_etag_when_data_added(self):
+        self.secret.encrypted_data = []
+        self.resource.on_get(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+        etag = self._response_header('ETag')
+
+        self._setup_for_puts()
+        self.stream.read.side_effect = [self.plain_text, '']
+        self.resource.on_put(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+        self.secret.encrypted_data = [self.datum]
+
+        self.req.accept = 'application/json'
+        self.resource.on_get(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+
+        self.assertEqual(3, self.secret_repo.get_metadata.call_count)
+        self.assertNotEqual(etag, self._response_header('ETag'))
+
+    def test_should_invalidate_cached_metadata_on_delete(self):
+        self.resource.on_get(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+        self.resource.on_delete(self.req, self.resp, self.keystone_id,
+                                self.secret.id)
+        self.resource.on_get(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+
+        self.assertEqual(2, self.secret_repo.get_metadata.call_count)
+
+    def test_should_rebuild_cached_metadata_changed_elsewhere(self):
+        self.resource.on_get(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+        etag = self._response_header('ETag')
+
+        # Updated by another process, so not invalidated by this one.
+        self.secret.updated_at = datetime(2014, 1, 1)
+        self.resource.on_get(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+
+        self.assertEqual(2, self.secret_repo.get_metadata.call_count)
+        self.assertNotEqual(etag, self._response_header('ETag'))
+
+    def test_should_not_serve_cached_metadata_deleted_elsewhere(self):
+        self.resource.on_get(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+
+        self.secret_repo.get_version.side_effect = None
+        self.secret_repo.get_version.return_value = None
+        self.secret_repo.get_metadata.return_value = None
+        with self.assertRaises(falcon.HTTPError) as cm:
+            self.resource.on_get(self.req, self.resp, self.keystone_id,
+                                 self.secret.id)
+
+        self.assertEqual(falcon.HTTP_404, cm.exception.status)
+
+    def test_should_not_serve_cached_metadata_of_expired_secret(self):
+        self.secret.expiration = datetime.utcnow() + timedelta(seconds=1)
+        self.resource.on_get(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+
+        self.secret_repo.get_metadata.return_value = None
+        with patch.object(res.timeutils, 'utcnow',
+                          return_value=self.secret.expiration):
+            with self.assertRaises(falcon.HTTPError) as cm:
+                self.resource.on_get(self.req, self.resp, self.keystone_id,
+                                     self.secret.id)
+
+        self.assertEqual(falcon.HTTP_404, cm.exception.status)
+        self.assertFalse(self.secret_repo.get_version.called)
+
     def test_should_get_secret_as_plain(self):
         self.req.accept = 'text/plain'
 
@@ -500,7 +1016,7 @@ class WhenGettingPuttingOrDeletingSecretUsingSecretResource(unittest.TestCase):
         self.assertIsNotNone(resp_body)
 
     def test_should_throw_exception_for_get_when_secret_not_found(self):
-        self.secret_repo.get.return_value = None
+        self.secret_repo.get_metadata.return_value = None
 
         with self.assertRaises(falcon.HTTPError) as cm:
             self.resource.on_get(self.req, self.resp, self.keystone_id,
@@ -530,8 +1046,42 @@ class WhenGettingPuttingOrDeletingSecretUsingSecretResource(unittest.TestCase):
         exception = cm.exception
         self.assertEqual(falcon.HTTP_404, exception.status)
 
+    def test_should_stream_binary_secret(self):
+        self._setup_for_binary_gets(None)
+
+        self.resource.on_get(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+
+        self.assertEquals(self.resp.status, falcon.HTTP_200)
+        self.assertEqual(10, self.resp.stream_len)
+        self.assertEqual('0123456789', ''.join(self.resp.stream))
+        self.resp.set_header.assert_any_call('Accept-Ranges', 'bytes')
+
+    def test_should_stream_requested_byte_range(self):
+        self._setup_for_binary_gets('bytes=2-5')
+
+        self.resource.on_get(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+
+        self.assertEquals(self.resp.status, falcon.HTTP_206)
+        self.assertEqual(4, self.resp.stream_len)
+        self.assertEqual('2345', ''.join(self.resp.stream))
+        self.resp.set_header.assert_any_call('Content-Range', 'bytes 2-5/10')
+
+    def test_should_fail_get_unsatisfiable_byte_range(self):
+        self._setup_for_binary_gets('bytes=10-')
+
+        with self.assertRaises(falcon.HTTPError) as cm:
+            self.resource.on_get(self.req, self.resp, self.keystone_id,
+                                 self.secret.id)
+
+        exception = cm.exception
+        self.assertEqual(falcon.HTTP_416, exception.status)
+        self.resp.set_header.assert_any_call('Content-Range', 'bytes */10')
+
     def test_should_put_secret_as_plain(self):
         self._setup_for_puts()
+        self.stream.read.side_effect = [self.plain_text, '']
 
         self.resource.on_put(self.req, self.resp, self.keystone_id,
                              self.secret.id)
@@ -545,6 +1095,34 @@ class WhenGettingPuttingOrDeletingSecretUsingSecretResource(unittest.TestCase):
         self.assertEqual(self.mime_type, datum.mime_type)
         self.assertIsNotNone(datum.kek_metadata)
 
+    def test_should_put_secret_read_in_chunks(self):
+        self._setup_for_puts()
+        self.stream.read.side_effect = ['plain', '_text', '']
+        streamed = []
+
+        def encrypt_stream(chunks, secret, tenant):
+            streamed.extend(chunks)
+            return models.EncryptedDatum(secret)
+        self.crypto_mgr.encrypt_stream = encrypt_stream
+
+        self.resource.on_put(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+
+        self.assertEquals(self.resp.status, falcon.HTTP_200)
+        self.stream.read.assert_called_with(api.STREAM_CHUNK_SIZE)
+        self.assertEqual(['plain', '_text'], streamed)
+        self.assertTrue(self.datum_repo.create_from.called)
+
+    def test_should_stop_reading_at_content_length(self):
+        self._setup_for_puts()
+        self.req.content_length = len(self.plain_text)
+
+        self.resource.on_put(self.req, self.resp, self.keystone_id,
+                             self.secret.id)
+
+        self.assertEquals(self.resp.status, falcon.HTTP_200)
+        self.stream.read.assert_called_once_with(len(self.plain_text))
+
     def test_should_fail_put_secret_as_json(self):
         self._setup_for_puts()
 
@@ -563,7 +1141,7 @@ class WhenGettingPuttingOrDeletingSecretUsingSecretResource(unittest.TestCase):
         self._setup_for_puts()
 
         # Force error, due to secret not found.
-        self.secret_repo.get.return_value = None
+        self.secret_repo.get_metadata.return_value = None
 
         with self.assertRaises(falcon.HTTPError) as cm:
             self.resource.on_put(self.req, self.resp, self.keystone_id,
@@ -623,6 +1201,18 @@ class WhenGettingPuttingOrDeletingSecretUsingSecretResource(unittest.TestCase):
         exception = cm.exception
         self.assertEqual(falcon.HTTP_413, exception.status)
 
+    def test_should_fail_due_to_content_length_too_large(self):
+        self._setup_for_puts()
+        self.req.content_length = DEFAULT_MAX_SECRET_BYTES + 1
+
+        with self.assertRaises(falcon.HTTPError) as cm:
+            self.resource.on_put(self.req, self.resp, self.keystone_id,
+                                 self.secret.id)
+
+        exception = cm.exception
+        self.assertEqual(falcon.HTTP_413, exception.status)
+        self.assertFalse(self.stream.read.called)
+
     def test_should_delete_secret(self):
         self.resource.on_delete(self.req, self.resp, self.keystone_id,
                                 self.secret.id)
@@ -642,6 +1232,18 @@ class WhenGettingPuttingOrDeletingSecretUsingSecretResource(unittest.TestCase):
         exception = cm.exception
         self.assertEqual(falcon.HTTP_404, exception.status)
 
+    def _response_header(self, name):
+        for args, kwargs in reversed(self.resp.set_header.call_args_list):
+            if args[0] == name:
+                return args[1]
+
+    def _setup_for_binary_gets(self, range_header):
+        self.req.accept = 'application/octet-stream'
+        self.req.get_header.side_effect = \
+            lambda name: range_header if name == 'Range' else None
+        self.crypto_mgr.decrypt_stream = MagicMock(
+            return_value=DecryptedData('0123456789'))
+
     def _setup_for_puts(self):
         self.plain_text = "plain_text"
         self.req.accept = self.mime_type
@@ -655,6 +1257,7 @@ class WhenGettingPuttingOrDeletingSecretUsingSecretResource(unittest.TestCase):
         self.stream = MagicMock()
         self.stream.read.return_value = self.plain_text
         self.req.stream = self.stream
+        self.req.content_length = None
 
 
 class WhenCreatingOrdersUsingOrdersResource(unittest.TestCase):
@@ -672,6 +1275,7 @@ class WhenCreatingOrdersUsingOrdersResource(unittest.TestCase):
         self.tenant.id = self.tenant_internal_id
         self.tenant.keystone_id = self.tenant_keystone_id
 
+        common_res.get_tenant_cache().clear()
         self.tenant_repo = MagicMock()
         self.tenant_repo.get.return_value = self.tenant
 
@@ -712,6 +1316,21 @@ class WhenCreatingOrdersUsingOrdersResource(unittest.TestCase):
         order = args[0]
         self.assertTrue(isinstance(order, models.Order))
 
+    def test_should_fail_add_new_order_when_queue_full(self):
+        self.queue_resource.process_order.side_effect = \
+            excep.ServiceUnavailable()
+
+        with patch.object(res, 'LOG') as log, \
+                self.assertRaises(falcon.HTTPError) as cm:
+            self.resource.on_post(self.req, self.resp,
+                                  self.tenant_keystone_id)
+
+        self.assertEqual(falcon.HTTP_503, cm.exception.status)
+        self.assertFalse(log.exception.called)
+        self.order_repo.delete_entity_by_id \
+            .assert_called_once_with(entity_id=None,
+                                     keystone_id=self.tenant_keystone_id)
+
     def test_should_fail_add_new_order_no_secret(self):
         self.stream.read.return_value = '{}'
 
@@ -757,6 +1376,8 @@ class WhenGettingOrdersListUsingOrdersResource(unittest.TestCase):
 
         self.orders = [create_order(id='id' + str(id), **order_params) for
                        id in xrange(self.num_orders)]
+        for entity in self.orders:
+            entity.created_at = datetime(2013, 6, 1, 12, 30)
 
         self.order_repo = MagicMock()
         self.order_repo.get_by_create_date.return_value = (self.orders,
@@ -786,6 +1407,8 @@ class WhenGettingOrdersListUsingOrdersResource(unittest.TestCase):
                                                                 self.offset),
                                      limit_arg=self.params.get('limit',
                                                                self.limit),
+                                     marker_arg=self.params.get('marker',
+                                                                None),
                                      suppress_exception=True)
 
         resp_body = jsonutils.loads(self.resp.body)
@@ -793,7 +1416,9 @@ class WhenGettingOrdersListUsingOrdersResource(unittest.TestCase):
         self.assertTrue('next' in resp_body)
 
         url_nav_next = self._create_url(self.keystone_id,
-                                        self.offset + self.limit, self.limit)
+                                        limit_arg=self.limit,
+                                        marker=repo.encode_marker(
+                                            self.orders[-1]))
         self.assertTrue(self.resp.body.count(url_nav_next) == 1)
 
         url_nav_prev = self._create_url(self.keystone_id,
@@ -816,14 +1441,34 @@ class WhenGettingOrdersListUsingOrdersResource(unittest.TestCase):
                                                                 self.offset),
                                      limit_arg=self.params.get('limit',
                                                                self.limit),
+                                     marker_arg=self.params.get('marker',
+                                                                None),
                                      suppress_exception=True)
 
         resp_body = jsonutils.loads(self.resp.body)
         self.assertFalse('previous' in resp_body)
         self.assertFalse('next' in resp_body)
 
-    def _create_url(self, keystone_id, offset_arg=None, limit_arg=None):
-        if limit_arg:
+    def test_should_link_previous_page_before_marker(self):
+        self.params['marker'] = repo.encode_marker(self.orders[1])
+
+        self.resource.on_get(self.req, self.resp, self.keystone_id)
+
+        resp_body = jsonutils.loads(self.resp.body)
+        url_nav_prev = self._create_url(self.keystone_id,
+                                        limit_arg=self.limit,
+                                        marker=repo.encode_marker(
+                                            self.orders[0], before=True))
+        self.assertTrue(resp_body['previous'].endswith(url_nav_prev))
+        self.assertTrue('next' in resp_body)
+
+    def _create_url(self, keystone_id, offset_arg=None, limit_arg=None,
+                    marker=None):
+        if marker:
+            return '/v1/{0}/orders?limit={1}&marker={2}'.format(keystone_id,
+                                                                limit_arg,
+                                                                marker)
+        elif limit_arg:
             offset = int(offset_arg)
             limit = int(limit_arg)
             return '/v1/{0}/orders?limit={1}&offset={2}'.format(keystone_id,
@@ -0,0 +1,130 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime
+import unittest
+
+from mock import patch
+
+from barbican.api import resources as res
+from barbican.api import serializers
+from barbican.crypto.mime_types import augment_fields_with_content_types
+from barbican.model import models
+from barbican.openstack.common import jsonutils as json
+
+
+def _entity_fields(fields, keystone_id):
+    """Converts to_dict_fields() output as the API formerly did."""
+    for key, value in fields.items():
+        if hasattr(value, 'isoformat'):
+            fields[key] = value.isoformat()
+    if 'secret_id' in fields:
+        fields['secret_ref'] = res.convert_secret_to_href(
+            keystone_id, fields.pop('secret_id'))
+    if 'order_id' in fields:
+        fields['order_ref'] = res.convert_order_to_href(
+            keystone_id, fields.pop('order_id'))
+    secret = fields.get('secret')
+    if isinstance(secret, dict) and secret['expiration']:
+        secret['expiration'] = secret['expiration'].isoformat()
+    return fields
+
+
+class WhenSerializingEntities(unittest.TestCase):
+
+    def setUp(self):
+        self.keystone_id = 'keystone1234'
+        self.now = datetime(2013, 8, 1, 12, 30, 15, 123456)
+
+        self.secret = models.Secret({'name': 'name',
+                                     'mime_type': 'text/plain',
+                                     'algorithm': 'aes',
+                                     'bit_length': 256,
+                                     'cypher_type': 'cbc',
+                                     'expiration': self.now})
+        self.secret.id = 'secret1'
+        self.secret.created_at = self.now
+        self.secret.updated_at = self.now
+        datum = models.EncryptedDatum(self.secret)
+        self.secret.encrypted_data = [datum]
+
+        self.order = models.Order()
+        self.order.id = 'order1'
+        self.order.status = models.States.PENDING
+        self.order.secret_name = 'name'
+        self.order.secret_mime_type = 'text/plain'
+        self.order.created_at = self.now
+        self.order.updated_at = self.now
+
+    def _assert_document_matches(self, document, fields):
+        self.assertEqual(_entity_fields(fields, self.keystone_id),
+                         json.loads(serializers.dumps(document)))
+
+    def test_should_serialize_secret_as_fields_would(self):
+        document = serializers.secret_documents(self.keystone_id,
+                                                [self.secret])[0]
+
+        self._assert_document_matches(
+            document, augment_fields_with_content_types(self.secret))
+
+    def test_should_serialize_deleted_secret_without_data(self):
+        self.secret.encrypted_data = []
+        self.secret.name = None
+        self.secret.deleted = True
+        self.secret.deleted_at = self.now
+
+        document = serializers.secret_documents(self.keystone_id,
+                                                [self.secret])[0]
+
+        self.assertNotIn('content_types', document)
+        self._assert_document_matches(
+            document, augment_fields_with_content_types(self.secret))
+
+    def test_should_serialize_orders_as_fields_would(self):
+        for secret_id in (None, 'secret1'):
+            self.order.secret_id = secret_id
+            document = serializers.order_documents(self.keystone_id,
+                                                   [self.order])[0]
+
+            self._assert_document_matches(document,
+                                          self.order.to_dict_fields())
+
+    def test_should_use_fast_backend_when_installed(self):
+        with patch.object(serializers, 'ujson') as mock_ujson:
+            mock_ujson.dumps.return_value = '{}'
+            self.assertEqual('{}', serializers.dumps({}))
+            mock_ujson.dumps.assert_called_once_with(
+                {}, escape_forward_slashes=False)
+
+    def test_should_detect_ujson_without_escape_forward_slashes(self):
+        class OldUjson(object):
+            @staticmethod
+            def dumps(obj):
+                return '"\\/"'
+
+        self.assertFalse(serializers._supports_unescaped_slashes(OldUjson))
+
+    def test_should_detect_ujson_with_escape_forward_slashes(self):
+        class NewUjson(object):
+            @staticmethod
+            def dumps(obj, escape_forward_slashes=True):
+                return '"/"'
+
+        self.assertTrue(serializers._supports_unescaped_slashes(NewUjson))
+
+    def test_should_fall_back_to_standard_json(self):
+        with patch.object(serializers, 'ujson', None):
+            self.assertEqual('{"a": [1, null]}',
+                             serializers.dumps({'a': [1, None]}))
@@ -392,5 +392,59 @@ class WhenTestingOrderValidator(unittest.TestCase):
         self.assertTrue('mime_type' in str(exception))
 
 
+class WhenTestingCompiledSchema(unittest.TestCase):
+
+    def setUp(self):
+        self.schema = {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "bit_length": {"type": "integer", "minimum": 0},
+                "mime_type": {"type": "string", "enum": ["text/plain"]},
+            },
+            "required": ["mime_type"]
+        }
+        self.compiled = validators.CompiledSchema(self.schema)
+
+    def test_should_compile_schema_once(self):
+        self.assertIs(validators.compile_schema(self.schema),
+                      validators.compile_schema(dict(self.schema)))
+
+    def test_should_share_compiled_schema_across_validators(self):
+        self.assertIs(validators.NewSecretValidator().compiled_schema,
+                      validators.NewSecretValidator().compiled_schema)
+
+    def test_should_reject_invalid_schema(self):
+        self.assertRaises(validators.schema.SchemaError,
+                          validators.CompiledSchema, {"type": 12})
+
+    def test_should_accept_valid_document_on_fast_path(self):
+        self.compiled.validator = MagicMock()
+
+        self.compiled.validate({'name': 'n', 'bit_length': 256,
+                                'mime_type': 'text/plain', 'other': [1]})
+
+        self.assertFalse(self.compiled.validator.validate.called)
+
+    def test_should_defer_invalid_documents_to_full_validator(self):
+        for document in ({'mime_type': 'text/html'},
+                         {'mime_type': 'text/plain', 'bit_length': -1},
+                         {'mime_type': 'text/plain', 'bit_length': True},
+                         {'mime_type': 'text/plain', 'name': 12},
+                         {'name': 'n'},
+                         ['text/plain']):
+            self.assertRaises(validators.schema.ValidationError,
+                              self.compiled.validate, document)
+
+    def test_should_not_use_fast_path_for_unsupported_keywords(self):
+        self.schema['additionalProperties'] = False
+        compiled = validators.CompiledSchema(self.schema)
+
+        self.assertIsNone(compiled.fast_checks)
+        self.assertRaises(validators.schema.ValidationError,
+                          compiled.validate,
+                          {'mime_type': 'text/plain', 'other': 1})
+
+
 if __name__ == '__main__':
     unittest.main()
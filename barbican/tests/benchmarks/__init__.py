@@ -0,0 +1,98 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Micro-benchmarks for Barbican hot paths.
+
+Benchmark modules are named bench_*.py so the test runner does not collect
+them. Run one directly, for example:
+
+    python -m barbican.tests.benchmarks.bench_validators
+
+bench_api drives the whole API application, and can save its results as a
+baseline to compare later runs against.
+"""
+
+import gc
+import timeit
+
+
+def measure(func, iterations=10000, repeat=3):
+    """
+    Times func, returning a dict with the best-of-repeat ops/second and
+    microseconds per call.
+    """
+    best = min(timeit.repeat(func, number=iterations, repeat=repeat))
+    return {'ops_per_sec': iterations / best,
+            'usec_per_op': best * 1e6 / iterations}
+
+
+def percentile(samples, percent):
+    """Returns the nearest-rank percentile of the sorted samples."""
+    index = max(0, int(round(len(samples) * percent / 100.0)) - 1)
+    return samples[min(index, len(samples) - 1)]
+
+
+def measure_each(func, iterations=1000, repeat=3):
+    """
+    Times each call of func individually over repeat rounds, returning the
+    results of the fastest round: the ops/second and microseconds per call,
+    the p50 and p99 latencies in milliseconds, and the number of garbage
+    collected objects retained per call.
+
+    func is called once beforehand, so that one-time setup is not timed.
+    """
+    func()
+    return max((_measure_round(func, iterations) for _ in xrange(repeat)),
+               key=lambda result: result['ops_per_sec'])
+
+
+def _measure_round(func, iterations):
+    gc.collect()
+    objects_before = len(gc.get_objects())
+
+    samples = []
+    timer = timeit.default_timer
+    for _ in xrange(iterations):
+        start = timer()
+        func()
+        samples.append(timer() - start)
+
+    gc.collect()
+    objects_retained = len(gc.get_objects()) - objects_before
+
+    total = sum(samples)
+    samples.sort()
+    return {'ops_per_sec': iterations / total,
+            'usec_per_op': total * 1e6 / iterations,
+            'p50_ms': percentile(samples, 50) * 1e3,
+            'p99_ms': percentile(samples, 99) * 1e3,
+            'objects_per_op': float(objects_retained) / iterations}
+
+
+def report(name, result, bytes_per_op=None):
+    """
+    Prints a single benchmark result line, including throughput in MB/s if
+    the number of bytes processed per operation is provided.
+    """
+    line = '%-40s %12.0f ops/s %10.2f usec/op' % (name,
+                                                   result['ops_per_sec'],
+                                                   result['usec_per_op'])
+    if 'p50_ms' in result:
+        line += ' %8.2f p50 ms %8.2f p99 ms %6.1f kept objs/op' % (
+            result['p50_ms'], result['p99_ms'], result['objects_per_op'])
+    if bytes_per_op:
+        line += ' %10.2f MB/s' % (result['ops_per_sec'] * bytes_per_op / 1e6)
+    print line
@@ -0,0 +1,237 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Drives the API application from create_main_app in-process, against an
+in-memory SQLite database by default, through its hot paths: creating,
+reading, decrypting, uploading and listing secrets, and creating orders.
+
+Results can be saved as a baseline, and later runs compared against it,
+failing if throughput or p99 latency regresses beyond a tolerance:
+
+    python -m barbican.tests.benchmarks.bench_api --save baseline.json
+    python -m barbican.tests.benchmarks.bench_api --compare baseline.json
+
+A baseline saved this way is kept alongside this module, and 'tox -e bench'
+compares against it. Timings depend on the machine, so before comparing on
+a different one, save a baseline there from the unchanged tree first.
+"""
+
+import argparse
+import collections
+import os
+import platform
+import sys
+
+from falcon import testing
+
+from barbican.api import app
+from barbican.common import config
+from barbican.model import models
+from barbican.model import repositories
+from barbican.openstack.common import jsonutils as json
+from barbican.tests import benchmarks
+
+
+KEYSTONE_ID = 'benchmark-tenant'
+SECRETS_URI = '/v1/{0}/secrets'.format(KEYSTONE_ID)
+ORDERS_URI = '/v1/{0}/orders'.format(KEYSTONE_ID)
+
+SECRET_BODY = json.dumps({'name': 'secretname',
+                          'algorithm': 'aes',
+                          'bit_length': 256,
+                          'cypher_type': 'cbc',
+                          'mime_type': 'text/plain',
+                          'plain_text': 'not-encrypted'})
+BINARY_SECRET_BODY = json.dumps({'name': 'secretname',
+                                 'mime_type': 'application/octet-stream'})
+ORDER_BODY = json.dumps({'secret': {'name': 'secretname',
+                                    'algorithm': 'aes',
+                                    'bit_length': 256,
+                                    'cypher_type': 'cbc',
+                                    'mime_type': 'application/octet-stream'}})
+BINARY_DATA = os.urandom(4096)
+
+# Metrics compared against a saved baseline, and whether higher is better.
+COMPARED_METRICS = (('ops_per_sec', True), ('p99_ms', False))
+
+
+class _Client(object):
+    """Calls a WSGI application in-process, checking response statuses."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def request(self, method, path, body='', headers=None,
+                expected='200 OK', query_string=''):
+        start_response = testing.StartResponseMock()
+        environ = testing.create_environ(path, query_string=query_string,
+                                         method=method, body=body,
+                                         headers=headers or {})
+        result = ''.join(self.wsgi_app(environ, start_response))
+        if start_response.status != expected:
+            raise RuntimeError('{0} {1} responded {2}: {3}'.format(
+                method, path, start_response.status, result))
+        return result
+
+    def create_secret(self, body=SECRET_BODY):
+        result = self.request('POST', SECRETS_URI, body,
+                              {'Content-Type': 'application/json'},
+                              expected='201 Created')
+        return json.loads(result)['secret_ref'].rsplit('/', 1)[-1]
+
+
+def create_client(sql_connection='sqlite://'):
+    """Returns a _Client for the API application, on a fresh database."""
+    # The application parses the command line itself.
+    del sys.argv[1:]
+    config.parse_args()
+    config.CONF.set_override('sql_connection', sql_connection)
+    # Migrations do not support SQLite, so create the tables directly.
+    config.CONF.set_override('db_auto_create', False)
+    client = _Client(app.create_main_app(None))
+    models.register_models(repositories.get_engine())
+    return client
+
+
+def _cases(client, calls):
+    """Returns (name, func, bytes_per_op) tuples for the benchmarks."""
+    secret_uri = '{0}/{1}'.format(SECRETS_URI, client.create_secret())
+    binary_uri = '{0}/{1}'.format(SECRETS_URI,
+                                  client.create_secret(BINARY_SECRET_BODY))
+    client.request('PUT', binary_uri, BINARY_DATA,
+                   {'Content-Type': 'application/octet-stream'})
+
+    # Each upload needs a secret without data, so create them up front.
+    empty_uris = iter(['{0}/{1}'.format(SECRETS_URI,
+                                        client.create_secret(
+                                            BINARY_SECRET_BODY))
+                       for _ in xrange(calls)])
+
+    def post_secret():
+        client.create_secret()
+
+    def get_metadata():
+        client.request('GET', secret_uri,
+                       headers={'Accept': 'application/json'})
+
+    def get_decrypted():
+        client.request('GET', secret_uri, headers={'Accept': 'text/plain'})
+
+    def get_binary():
+        client.request('GET', binary_uri,
+                       headers={'Accept': 'application/octet-stream'})
+
+    def put_binary():
+        client.request('PUT', next(empty_uris), BINARY_DATA,
+                       {'Content-Type': 'application/octet-stream'})
+
+    def list_secrets(limit):
+        return lambda: client.request('GET', SECRETS_URI,
+                                      query_string='limit={0}'.format(limit))
+
+    def post_order():
+        client.request('POST', ORDERS_URI, ORDER_BODY,
+                       {'Content-Type': 'application/json'},
+                       expected='202 Accepted')
+
+    def list_orders():
+        client.request('GET', ORDERS_URI, query_string='limit=100')
+
+    return [('secret POST', post_secret, None),
+            ('secret metadata GET', get_metadata, None),
+            ('secret decrypt GET', get_decrypted, None),
+            ('secret binary GET', get_binary, len(BINARY_DATA)),
+            ('secret PUT', put_binary, len(BINARY_DATA)),
+            ('secrets list GET, limit=10', list_secrets(10), None),
+            ('secrets list GET, limit=100', list_secrets(100), None),
+            ('order POST', post_order, None),
+            ('orders list GET, limit=100', list_orders, None)]
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints the change in each compared metric from the baseline.
+
+    :returns: list -- descriptions of the metrics that regressed by more
+              than tolerance percent.
+    """
+    regressions = []
+    for name, result in results.iteritems():
+        if name not in baseline:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS:
+            before, after = baseline[name][metric], result[metric]
+            change = (after - before) * 100.0 / before
+            regressed = (-change if higher_is_better else change) > tolerance
+            print '%-40s %-12s %12.2f -> %12.2f %+7.1f%%%s' % (
+                name, metric, before, after, change,
+                '  REGRESSION' if regressed else '')
+            if regressed:
+                regressions.append('{0} {1}'.format(name, metric))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--iterations', type=int, default=500,
+                        help='requests timed per benchmark round')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='rounds per benchmark, of which the fastest '
+                             'is reported')
+    parser.add_argument('--sql-connection', default='sqlite://',
+                        help='database to run against, in-memory SQLite '
+                             'by default')
+    parser.add_argument('--save', metavar='PATH',
+                        help='save the results as a baseline')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='compare the results against a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=20.0,
+                        help='percentage by which a metric may regress '
+                             'before the comparison fails')
+    args = parser.parse_args()
+
+    client = create_client(args.sql_connection)
+
+    # Each benchmark is called once more than it is timed, to warm up.
+    calls = args.iterations * args.repeat + 1
+    results = collections.OrderedDict()
+    for name, func, bytes_per_op in _cases(client, calls):
+        results[name] = benchmarks.measure_each(func, args.iterations,
+                                                args.repeat)
+        benchmarks.report(name, results[name], bytes_per_op=bytes_per_op)
+
+    if args.save:
+        with open(args.save, 'w') as baseline_file:
+            baseline_file.write(json.dumps(
+                {'python': platform.python_version(),
+                 'iterations': args.iterations,
+                 'repeat': args.repeat,
+                 'sql_connection': args.sql_connection,
+                 'results': results}, indent=2, sort_keys=True,
+                separators=(',', ': ')) + '\n')
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.loads(baseline_file.read())
+        regressions = compare(results, baseline['results'], args.tolerance)
+        if regressions:
+            print 'Regressed: {0}'.format(', '.join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures SimpleCryptoPlugin encrypt and decrypt throughput for each
+encryption engine, across a range of secret sizes.
+"""
+
+from Crypto import Random
+
+from barbican.crypto import plugin
+from barbican.tests import benchmarks
+
+
+SECRET_SIZES = (32, 1024, 10000, 65536)
+
+
+def main():
+    crypto = plugin.SimpleCryptoPlugin()
+    tenant = None
+
+    for engine_name in sorted(plugin.ENCRYPTION_ENGINES):
+        crypto.engine = crypto.engines[engine_name]
+        crypto.kek_metadata = crypto._build_kek_metadata(engine_name)
+
+        for size in SECRET_SIZES:
+            unencrypted = Random.get_random_bytes(size)
+            encrypted, kek_metadata = crypto.encrypt(unencrypted, tenant)
+            iterations = max(100, 2000000 / size)
+
+            for operation, func in (
+                    ('encrypt',
+                     lambda: crypto.encrypt(unencrypted, tenant)),
+                    ('decrypt',
+                     lambda: crypto.decrypt(encrypted, kek_metadata,
+                                            tenant))):
+                name = '%s %s %6d bytes' % (engine_name, operation, size)
+                benchmarks.report(name,
+                                  benchmarks.measure(func, iterations),
+                                  bytes_per_op=size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares reading random bytes per call from the operating system (and from
+PyCrypto's RNG) against serving them from the buffered entropy pool, for
+typical IV, nonce and key sizes and for a burst of order key generation.
+"""
+import os
+
+from Crypto import Random
+
+from barbican.crypto import entropy
+from barbican.tests import benchmarks
+
+
+REQUEST_SIZES = (8, 16, 32)
+
+
+def _order_storm(get_bytes):
+    """Each generated order needs a 256 bit key and a 12 byte nonce."""
+    def func():
+        get_bytes(32)
+        get_bytes(12)
+    return func
+
+
+def main():
+    pool = entropy.EntropyPool(entropy.CONF.crypto.entropy_pool_bytes)
+    sources = (('os.urandom', os.urandom),
+               ('Crypto.Random', Random.get_random_bytes),
+               ('entropy pool', pool.get_bytes))
+
+    for size in REQUEST_SIZES:
+        for source_name, get_bytes in sources:
+            name = '%-13s %2d bytes' % (source_name, size)
+            benchmarks.report(name,
+                              benchmarks.measure(lambda: get_bytes(size),
+                                                 100000),
+                              bytes_per_op=size)
+
+    for source_name, get_bytes in sources:
+        name = '%-13s order storm' % source_name
+        benchmarks.report(name,
+                          benchmarks.measure(_order_storm(get_bytes), 100000),
+                          bytes_per_op=40)
+
+
+if __name__ == '__main__':
+    main()
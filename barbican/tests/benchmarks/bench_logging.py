@@ -0,0 +1,132 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares the cost of logging as the API formerly did, formatting messages
+eagerly and gathering the request context before the level check, and
+logging expected client errors with tracebacks, against lazy, level-guarded
+logging with those errors logged at debug level.
+
+Log calls are counted over requests to the API application, at the INFO
+level of a verbose deployment, to estimate the CPU saved per request.
+"""
+import collections
+import cStringIO
+import logging
+
+import mock
+
+from barbican.openstack.common import log
+from barbican.tests import benchmarks
+from barbican.tests.benchmarks import bench_api
+
+
+KEYSTONE_ID = 'keystone1234'
+
+
+class _LegacyAdapter(logging.LoggerAdapter):
+    """The unguarded logging.LoggerAdapter methods, with log.py's process."""
+    process = log.ContextAdapter.process.im_func
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.project = logger.name
+        self.version = 'unknown'
+
+
+def _raise_not_found():
+    raise ValueError('Not Found')
+
+
+def _count_calls(request):
+    """Returns the number of log calls of each level made by request()."""
+    counts = collections.defaultdict(int)
+
+    def count(adapter, level, msg, *args, **kwargs):
+        counts[level] += 1
+
+    with mock.patch.object(log.ContextAdapter, 'log', count):
+        request()
+    return counts
+
+
+def main():
+    client = bench_api.create_client()
+    secret_uri = '{0}/{1}'.format(bench_api.SECRETS_URI,
+                                  client.create_secret())
+    missing_uri = '{0}/{1}'.format(bench_api.SECRETS_URI, 'missing')
+
+    logger = logging.getLogger('barbican.benchmark')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler(cStringIO.StringIO())
+    handler.setFormatter(log.LegacyFormatter())
+    logger.addHandler(handler)
+    legacy = _LegacyAdapter(logger)
+    guarded = log.ContextAdapter(logger, logger.name, 'unknown')
+
+    def legacy_not_found():
+        try:
+            _raise_not_found()
+        except ValueError:
+            legacy.exception('Problem decoding secrets paging marker')
+
+    def guarded_not_found():
+        try:
+            _raise_not_found()
+        except ValueError:
+            guarded.debug('Problem decoding secrets paging marker')
+
+    cases = (
+        ('legacy disabled debug',
+         lambda: legacy.debug('Start on_post for tenant-ID {0}:...'.format(
+             KEYSTONE_ID))),
+        ('guarded disabled debug',
+         lambda: guarded.debug('Start on_post for tenant-ID %s:...',
+                               KEYSTONE_ID)),
+        ('legacy expected miss', legacy_not_found),
+        ('guarded expected miss', guarded_not_found),
+    )
+    results = {}
+    for name, func in cases:
+        results[name] = benchmarks.measure(func, 20000)
+        benchmarks.report(name, results[name])
+
+    saved_per_debug = (results['legacy disabled debug']['usec_per_op'] -
+                       results['guarded disabled debug']['usec_per_op'])
+    saved_per_miss = (results['legacy expected miss']['usec_per_op'] -
+                      results['guarded expected miss']['usec_per_op'])
+
+    requests = (
+        ('secret POST', client.create_secret),
+        ('secret metadata GET',
+         lambda: client.request('GET', secret_uri,
+                                headers={'Accept': 'application/json'})),
+        ('missing secret GET',
+         lambda: client.request('GET', missing_uri,
+                                headers={'Accept': 'application/json'},
+                                expected='404 Not Found')),
+    )
+    for name, request in requests:
+        counts = _count_calls(request)
+        debug_calls = counts.get(logging.DEBUG, 0)
+        print '%-40s %3d debug calls, saving ~%.1f usec at INFO level' % (
+            name, debug_calls, debug_calls * saved_per_debug)
+    print 'Each client error formerly logged with a traceback saves ' \
+          '~%.1f usec' % saved_per_miss
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares serializing a page of secrets and orders via to_dict_fields(), href
+conversion and a json default handler, as the API formerly did, against the
+serializers module.
+"""
+from datetime import datetime
+
+from barbican.api import resources as res
+from barbican.api import serializers
+from barbican.crypto.mime_types import augment_fields_with_content_types
+from barbican.model import models
+from barbican.openstack.common import jsonutils as json
+from barbican.tests import benchmarks
+
+
+KEYSTONE_ID = 'keystone1234'
+PAGE_SIZE = 100
+
+
+def _json_handler(obj):
+    return obj.isoformat() if hasattr(obj, 'isoformat') else obj
+
+
+def _to_hrefs(fields):
+    if 'secret_id' in fields:
+        fields['secret_ref'] = res.convert_secret_to_href(
+            KEYSTONE_ID, fields.pop('secret_id'))
+    if 'order_id' in fields:
+        fields['order_ref'] = res.convert_order_to_href(
+            KEYSTONE_ID, fields.pop('order_id'))
+    return fields
+
+
+def _secrets():
+    now = datetime.utcnow()
+    secrets = []
+    for index in xrange(PAGE_SIZE):
+        secret = models.Secret({'name': 'secret%d' % index,
+                                'mime_type': 'text/plain',
+                                'algorithm': 'aes',
+                                'bit_length': 256,
+                                'cypher_type': 'cbc',
+                                'expiration': now})
+        secret.id = 'secret%d' % index
+        secret.created_at = secret.updated_at = now
+        secret.encrypted_data = [models.EncryptedDatum(secret)]
+        secrets.append(secret)
+    return secrets
+
+
+def _orders():
+    now = datetime.utcnow()
+    orders = []
+    for index in xrange(PAGE_SIZE):
+        order = models.Order()
+        order.id = 'order%d' % index
+        order.secret_id = 'secret%d' % index
+        order.status = models.States.ACTIVE
+        order.secret_name = 'secret%d' % index
+        order.secret_mime_type = 'text/plain'
+        order.created_at = order.updated_at = now
+        orders.append(order)
+    return orders
+
+
+def main():
+    secrets = _secrets()
+    orders = _orders()
+
+    cases = (
+        ('legacy secrets page',
+         lambda: json.dumps({'secrets': [
+             _to_hrefs(augment_fields_with_content_types(s))
+             for s in secrets]}, default=_json_handler)),
+        ('serializers secrets page',
+         lambda: serializers.dumps({'secrets': serializers.secret_documents(
+             KEYSTONE_ID, secrets)})),
+        ('legacy orders page',
+         lambda: json.dumps({'orders': [
+             _to_hrefs(o.to_dict_fields()) for o in orders]},
+             default=_json_handler)),
+        ('serializers orders page',
+         lambda: serializers.dumps({'orders': serializers.order_documents(
+             KEYSTONE_ID, orders)})),
+    )
+
+    for name, func in cases:
+        benchmarks.report('%s (%d)' % (name, PAGE_SIZE),
+                          benchmarks.measure(func, 200))
+
+
+if __name__ == '__main__':
+    main()
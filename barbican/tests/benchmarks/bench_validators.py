@@ -0,0 +1,86 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares per-request JSON validation cost of re-validating the schema on
+every call (jsonschema.validate) with the compiled validators.
+"""
+
+import StringIO
+
+import jsonschema
+
+from barbican import api
+from barbican.common import validators
+from barbican.openstack.common import jsonutils as json
+from barbican.tests import benchmarks
+
+
+SECRET_BODY = json.dumps({'name': 'secretname',
+                          'algorithm': 'aes',
+                          'bit_length': 256,
+                          'cypher_type': 'cbc',
+                          'mime_type': 'text/plain',
+                          'plain_text': 'not-encrypted'})
+ORDER_BODY = json.dumps({'secret': {'name': 'secretname',
+                                    'algorithm': 'aes',
+                                    'bit_length': 256,
+                                    'cypher_type': 'cbc',
+                                    'mime_type': 'application/octet-stream'}})
+
+
+class _Request(object):
+    """Minimal stand-in for a falcon request with a JSON body."""
+
+    def __init__(self, body):
+        self.body = body
+        self.accept = 'application/json'
+
+    @property
+    def stream(self):
+        return StringIO.StringIO(self.body)
+
+
+def _legacy_load_body(req, validator):
+    """Per-request schema check plus validation, as done previously."""
+    parsed_body = json.loads(req.stream.read())
+    jsonschema.validate(parsed_body, validator.schema)
+    return parsed_body
+
+
+def main():
+    secret_validator = validators.NewSecretValidator()
+    order_validator = validators.NewOrderValidator()
+    secret_req = _Request(SECRET_BODY)
+    order_req = _Request(ORDER_BODY)
+
+    # Bodies are re-parsed per call, as normalization mutates them.
+    cases = [
+        ('secret schema, jsonschema.validate',
+         lambda: _legacy_load_body(secret_req, secret_validator)),
+        ('secret schema, compiled',
+         lambda: secret_validator.compiled_schema.validate(
+             json.loads(secret_req.stream.read()))),
+        ('secret load_body + validate',
+         lambda: api.load_body(secret_req, validator=secret_validator)),
+        ('order load_body + validate',
+         lambda: api.load_body(order_req, validator=order_validator)),
+    ]
+    for name, func in cases:
+        benchmarks.report(name, benchmarks.measure(func))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from barbican.common.cache import LRUCache
+
+
+class WhenTestingLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.cache = LRUCache(2, ttl=10, timer=lambda: self.now)
+
+    def test_should_count_hits_and_misses(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.put('a', 1)
+        self.assertEqual(1, self.cache.get('a'))
+
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(1, self.cache.misses)
+
+    def test_should_evict_least_recently_used(self):
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+        self.cache.get('a')
+        self.cache.put('c', 3)
+
+        self.assertEqual(1, self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(3, self.cache.get('c'))
+        self.assertEqual(2, len(self.cache))
+
+    def test_should_expire_entries_after_ttl(self):
+        self.cache.put('a', 1)
+        self.now += 11
+
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(0, len(self.cache))
+
+    def test_should_invalidate_entry(self):
+        self.cache.put('a', 1)
+        self.cache.invalidate('a')
+
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_should_report_stats(self):
+        self.cache.put('a', 1)
+        self.cache.get('a')
+
+        stats = self.cache.stats()
+        self.assertEqual(1, stats['size'])
+        self.assertEqual(2, stats['max_size'])
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(0, stats['misses'])
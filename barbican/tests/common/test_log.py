@@ -0,0 +1,138 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import unittest
+
+from mock import patch
+
+from barbican.openstack.common import log
+
+
+class _RecordingHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class _BlockingHandler(_RecordingHandler):
+    def __init__(self):
+        _RecordingHandler.__init__(self)
+        self.unblock = threading.Event()
+
+    def emit(self, record):
+        self.unblock.wait()
+        _RecordingHandler.emit(self, record)
+
+
+class WhenTestingContextAdapter(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger('barbican.tests.log')
+        self.logger.propagate = False
+        self.handler = _RecordingHandler()
+        self.logger.addHandler(self.handler)
+        self.logger.setLevel(logging.INFO)
+        self.adapter = log.ContextAdapter(self.logger, 'barbican', '1.0')
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.logger.propagate = True
+        self.logger.setLevel(logging.NOTSET)
+
+    def test_should_not_process_disabled_records(self):
+        with patch.object(self.adapter, 'process') as process:
+            self.adapter.debug('debug %s', 'message')
+
+        self.assertFalse(process.called)
+        self.assertEqual([], self.handler.records)
+
+    def test_should_add_project_and_version(self):
+        self.adapter.info('info %s', 'message')
+
+        record, = self.handler.records
+        self.assertEqual('info message', record.getMessage())
+        self.assertEqual('barbican', record.project)
+        self.assertEqual('1.0', record.version)
+
+    def test_should_record_the_adapters_caller(self):
+        self.adapter.warning('warning')
+        self.adapter.audit('audit')
+
+        for record in self.handler.records:
+            self.assertEqual(__file__.rstrip('c'), record.pathname)
+            self.assertEqual('test_should_record_the_adapters_caller',
+                             record.funcName)
+
+    def test_should_include_exception_info(self):
+        try:
+            raise ValueError('bad value')
+        except ValueError:
+            self.adapter.exception('failed')
+
+        record, = self.handler.records
+        self.assertEqual(logging.ERROR, record.levelno)
+        self.assertIs(ValueError, record.exc_info[0])
+
+
+class WhenTestingAsyncHandler(unittest.TestCase):
+    def setUp(self):
+        self.target = _BlockingHandler()
+        self.handler = log.AsyncHandler([self.target], queue_size=2)
+
+    def tearDown(self):
+        self.target.unblock.set()
+        self.handler.close()
+
+    def _record(self, msg, *args):
+        return logging.makeLogRecord({'msg': msg, 'args': args,
+                                      'levelno': logging.INFO})
+
+    def test_should_format_messages_before_queueing(self):
+        values = ['before']
+        self.handler.handle(self._record('value is %s', values))
+        values[0] = 'after'
+
+        self.target.unblock.set()
+        self.handler.flush()
+
+        record, = self.target.records
+        self.assertEqual("value is ['before']", record.getMessage())
+
+    def test_should_drop_records_when_full_and_report_them(self):
+        # The blocked thread may already have taken the first record.
+        for index in xrange(5):
+            self.handler.handle(self._record('record %d', index))
+        dropped = self.handler.dropped
+
+        self.target.unblock.set()
+        self.handler.flush()
+
+        self.assertTrue(dropped > 0)
+        messages = [record.getMessage() for record in self.target.records]
+        self.assertEqual(5 - dropped, len(messages) - 1)
+        self.assertIn('Dropped {0} log records'.format(dropped),
+                      messages[-1])
+
+    def test_should_deliver_queued_records_on_close(self):
+        self.handler.handle(self._record('record'))
+
+        self.target.unblock.set()
+        self.handler.close()
+
+        self.assertEqual(1, len(self.target.records))
@@ -0,0 +1,174 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import patch
+
+from barbican.common import metrics
+
+
+class WhenTestingHistogram(unittest.TestCase):
+    def setUp(self):
+        self.histogram = metrics.Histogram()
+
+    def test_should_summarize_observations(self):
+        for elapsed_ms in [0.2] * 98 + [30, 4000]:
+            self.histogram.observe(elapsed_ms)
+
+        summary = self.histogram.summary()
+
+        self.assertEqual(100, summary['count'])
+        self.assertEqual(4000, summary['max_ms'])
+        self.assertEqual(0.5, summary['p50_ms'])
+        self.assertEqual(0.5, summary['p90_ms'])
+        self.assertEqual(50, summary['p99_ms'])
+
+    def test_should_bound_percentiles_by_maximum(self):
+        self.histogram.observe(0.1)
+        self.assertEqual(0.1, self.histogram.percentile(99))
+
+        self.histogram.observe(20000)
+        self.assertEqual(20000, self.histogram.percentile(99))
+
+    def test_should_have_no_percentiles_when_empty(self):
+        self.assertIsNone(self.histogram.summary()['p50_ms'])
+
+    def test_should_merge_from_dict(self):
+        self.histogram.observe(3)
+        other = metrics.Histogram()
+        other.observe(700)
+
+        self.histogram.merge(metrics.Histogram.from_dict(other.to_dict()))
+
+        self.assertEqual(2, self.histogram.count)
+        self.assertEqual(703, self.histogram.total_ms)
+        self.assertEqual(700, self.histogram.max_ms)
+
+
+class WhenTestingScopes(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.MetricsRegistry()
+        patcher = patch.object(metrics, 'get_registry',
+                               return_value=self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_should_record_scope_and_stages(self):
+        with metrics.scope('route'):
+            with metrics.stage('crypto'):
+                pass
+            with metrics.stage('crypto'):
+                pass
+            with metrics.stage('repo'):
+                pass
+
+        summary = self.registry.summary()['route']
+        self.assertEqual(1, summary['count'])
+        self.assertEqual(0, summary['errors'])
+        self.assertEqual(1, summary['stages']['crypto']['count'])
+        self.assertEqual(1, summary['stages']['repo']['count'])
+
+    def test_should_count_failed_scopes(self):
+        with self.assertRaises(ValueError):
+            with metrics.scope('route'):
+                raise ValueError()
+
+        self.assertEqual(1, self.registry.summary()['route']['errors'])
+
+    def test_should_not_time_stages_outside_scope(self):
+        with metrics.stage('crypto'):
+            pass
+
+        self.assertEqual({}, self.registry.summary())
+
+    def test_should_record_nested_scope_as_stage(self):
+        with metrics.scope('route'):
+            with metrics.scope('task'):
+                with metrics.stage('crypto'):
+                    pass
+
+        summary = self.registry.summary()
+        self.assertEqual(['task'], summary['route']['stages'].keys())
+        self.assertEqual(['crypto'], summary['task']['stages'].keys())
+
+    def test_should_name_decorated_methods_by_class(self):
+        class Repo(object):
+            @metrics.timed()
+            def get(self):
+                return 'entity'
+
+        class Resource(object):
+            @metrics.scoped()
+            def on_get(self):
+                return Repo().get()
+
+        self.assertEqual('entity', Resource().on_get())
+
+        summary = self.registry.summary()
+        self.assertEqual(['Repo.get'],
+                         summary['Resource.on_get']['stages'].keys())
+
+
+class WhenTestingMetricsFiles(unittest.TestCase):
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir)
+        metrics.CONF.set_override('metrics_dir', self.metrics_dir)
+        self.addCleanup(metrics.CONF.clear_override, 'metrics_dir')
+
+        self.registry = metrics.MetricsRegistry()
+        patcher = patch.object(metrics, 'get_registry',
+                               return_value=self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _write_other_process(self, pid, elapsed):
+        other = metrics.MetricsRegistry()
+        other.record('route', elapsed, {'crypto': elapsed})
+        metrics._write_file(self.metrics_dir, pid, other.to_dict())
+
+    def test_should_flush_after_interval(self):
+        now = [1000.0]
+        registry = metrics.MetricsRegistry(timer=lambda: now[0])
+        path = os.path.join(self.metrics_dir, '{0}.json'.format(os.getpid()))
+
+        registry.record('route', 0.001, {})
+        self.assertFalse(os.path.exists(path))
+
+        now[0] += metrics.CONF.metrics_flush_interval
+        registry.record('route', 0.001, {})
+        self.assertTrue(os.path.exists(path))
+
+    def test_should_collect_running_processes(self):
+        self.registry.record('route', 0.001, {})
+        self._write_other_process(os.getppid(), 0.2)
+
+        summary = metrics.collect()['route']
+
+        self.assertEqual(2, summary['count'])
+        self.assertEqual(200, summary['max_ms'])
+        self.assertEqual(1, summary['stages']['crypto']['count'])
+
+    def test_should_remove_exited_processes(self):
+        self._write_other_process(12345, 0.2)
+
+        with patch.object(metrics, '_is_running', return_value=False):
+            self.assertEqual({}, metrics.collect())
+
+        self.assertEqual([], os.listdir(self.metrics_dir))
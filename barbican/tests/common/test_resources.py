@@ -0,0 +1,65 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from mock import MagicMock
+import unittest
+
+from barbican.common import exception
+from barbican.common import resources as res
+from barbican.model import models
+
+
+class WhenGettingOrCreatingTenant(unittest.TestCase):
+    def setUp(self):
+        self.keystone_id = 'keystone-cache-1234'
+        self.tenant = models.Tenant()
+        self.tenant.id = 'tenant-cache-1234'
+        self.tenant.keystone_id = self.keystone_id
+
+        self.tenant_repo = MagicMock()
+        self.tenant_repo.find_by_keystone_id.return_value = self.tenant
+
+        res.get_tenant_cache().clear()
+
+    def tearDown(self):
+        res.get_tenant_cache().clear()
+
+    def test_should_cache_tenant_id_after_lookup(self):
+        res.get_or_create_tenant(self.keystone_id, self.tenant_repo)
+        tenant = res.get_or_create_tenant(self.keystone_id, self.tenant_repo)
+
+        self.assertEqual(1, self.tenant_repo.find_by_keystone_id.call_count)
+        self.assertEqual(self.tenant.id, tenant.id)
+        self.assertEqual(self.keystone_id, tenant.keystone_id)
+        self.assertEqual(1, res.get_tenant_cache().hits)
+
+    def test_should_create_tenant_if_not_found(self):
+        self.tenant_repo.find_by_keystone_id.return_value = None
+
+        tenant = res.get_or_create_tenant(self.keystone_id, self.tenant_repo)
+
+        args, kwargs = self.tenant_repo.create_from.call_args
+        self.assertIs(tenant, args[0])
+        self.assertEqual(self.keystone_id, tenant.keystone_id)
+
+    def test_should_use_existing_tenant_if_created_concurrently(self):
+        self.tenant_repo.find_by_keystone_id.side_effect = [None, self.tenant]
+        self.tenant_repo.create_from.side_effect = exception.Duplicate()
+
+        tenant = res.get_or_create_tenant(self.keystone_id, self.tenant_repo)
+
+        self.assertIs(self.tenant, tenant)
+        self.assertEqual(self.tenant.id,
+                         res.get_tenant_cache().get(self.keystone_id))
@@ -0,0 +1,64 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+from mock import MagicMock, patch
+import unittest
+
+from barbican.crypto import entropy
+
+
+class WhenUsingEntropyPool(unittest.TestCase):
+
+    def setUp(self):
+        self.source = MagicMock(side_effect=os.urandom)
+        self.pool = entropy.EntropyPool(64, source=self.source)
+
+    def test_should_serve_requested_number_of_bytes(self):
+        for num_bytes in (1, 16, 32, 64):
+            self.assertEqual(num_bytes, len(self.pool.get_bytes(num_bytes)))
+
+    def test_should_refill_in_large_reads(self):
+        for _ in range(8):
+            self.pool.get_bytes(16)
+
+        self.assertEqual(2, self.source.call_count)
+        self.source.assert_called_with(64)
+
+    def test_should_never_serve_bytes_twice(self):
+        self.source.side_effect = lambda n: ''.join(chr(i) for i in range(n))
+
+        served = ''.join(self.pool.get_bytes(16) for _ in range(4))
+
+        self.assertEqual(''.join(chr(i) for i in range(64)), served)
+
+    def test_should_read_large_requests_directly(self):
+        self.assertEqual(100, len(self.pool.get_bytes(100)))
+        self.source.assert_called_once_with(100)
+        self.assertEqual(0, self.pool.refills)
+
+    def test_should_discard_buffer_after_fork(self):
+        first = self.pool.get_bytes(16)
+
+        with patch('os.getpid', return_value=-1):
+            second = self.pool.get_bytes(16)
+
+        self.assertEqual(2, self.source.call_count)
+        self.assertNotEqual(first, second)
+
+    def test_should_share_process_wide_pool(self):
+        self.assertIs(entropy.get_pool(), entropy.get_pool())
+        self.assertEqual(32, len(entropy.get_random_bytes(32)))
@@ -0,0 +1,161 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from mock import MagicMock, patch
+import unittest
+
+from barbican.crypto import extension_manager as em
+from barbican.model.models import EncryptedDatum, Secret
+
+
+def _extension(name, supported_types=None, supports=None):
+    ext = MagicMock()
+    ext.name = name
+    ext.obj.supported_types = supported_types
+    ext.obj.supports.side_effect = supports or (lambda mime_type: False)
+    ext.obj.decrypt.return_value = name
+    return ext
+
+
+class WhenTestingCryptoExtensionManager(unittest.TestCase):
+
+    def setUp(self):
+        conf = MagicMock()
+        conf.crypto.namespace = 'barbican.test.crypto.plugin'
+        conf.crypto.enabled_crypto_plugins = ['test_crypto']
+        self.manager = em.CryptoExtensionManager(conf=conf)
+
+        self.declared = _extension('declared', ['application/octet-stream'])
+        self.undeclared = _extension(
+            'undeclared', supports=lambda mime_type: mime_type == 'text/csv')
+        self._use_extensions(self.declared, self.undeclared)
+
+        self.secret = Secret({'mime_type': 'application/octet-stream'})
+
+    def _use_extensions(self, *extensions):
+        self.manager.extensions = list(extensions)
+        self.manager.build_dispatch_table()
+
+    def _add_datum(self, secret, mime_type):
+        datum = EncryptedDatum(secret)
+        datum.mime_type = mime_type
+        datum.cypher_text = 'cypher{0}'.format(len(secret.encrypted_data))
+        secret.encrypted_data.append(datum)
+
+    def test_should_dispatch_declared_types_without_calling_supports(self):
+        self.assertTrue(self.manager.supports(self.secret, None))
+        self.assertFalse(self.declared.obj.supports.called)
+        self.assertFalse(self.undeclared.obj.supports.called)
+
+    def test_should_resolve_undeclared_types_once(self):
+        self.secret.mime_type = 'text/csv'
+        self.manager.supports(self.secret, None)
+        self.manager.supports(self.secret, None)
+
+        self.assertEqual(1, self.undeclared.obj.supports.call_count)
+        self.assertIs(self.undeclared.obj,
+                      self.manager.plugins_by_mime_type['text/csv'])
+
+    def test_should_not_index_unsupported_types(self):
+        self.secret.mime_type = 'bogus'
+        self.assertRaises(em.CryptoMimeTypeNotSupportedException,
+                          self.manager.supports, self.secret, None)
+        self.assertNotIn('bogus', self.manager.plugins_by_mime_type)
+
+    def test_should_raise_on_conflicting_declared_types(self):
+        conflicting = _extension('conflicting', ['application/octet-stream'])
+
+        with self.assertRaises(em.CryptoPluginConflictException) as cm:
+            self._use_extensions(self.declared, conflicting)
+
+        self.assertEqual('application/octet-stream', cm.exception.mime_type)
+        self.assertEqual(['declared', 'conflicting'],
+                         cm.exception.plugin_names)
+
+    def test_should_encrypt_stream(self):
+        self.declared.obj.encrypt_stream.return_value = ('cypher', 'kek')
+
+        datum = self.manager.encrypt_stream(['a', 'b'], self.secret, None)
+
+        self.assertEqual('cypher', datum.cypher_text)
+        self.assertEqual('application/octet-stream', datum.mime_type)
+
+    def test_should_reject_invalid_utf8_text_stream(self):
+        self.secret.mime_type = 'text/plain'
+        text_plugin = _extension('text', ['text/plain'])
+        text_plugin.obj.encrypt_stream.side_effect = \
+            lambda chunks, tenant: (b''.join(chunks), 'kek')
+        self._use_extensions(text_plugin)
+
+        datum = self.manager.encrypt_stream(['caf\xc3', '\xa9'], self.secret,
+                                            None)
+        self.assertEqual('caf\xc3\xa9', datum.cypher_text)
+        self.assertRaises(UnicodeDecodeError, self.manager.encrypt_stream,
+                          ['caf\xc3'], self.secret, None)
+
+    def test_should_decrypt_datum_of_accepted_type(self):
+        self._add_datum(self.secret, 'text/csv')
+        self._add_datum(self.secret, 'application/octet-stream')
+
+        self.assertEqual('declared', self.manager.decrypt(
+            'application/octet-stream', self.secret, None))
+
+    def test_should_decrypt_first_datum_of_accepted_type(self):
+        self._add_datum(self.secret, 'application/octet-stream')
+        self._add_datum(self.secret, 'application/octet-stream')
+
+        self.manager.decrypt('application/octet-stream', self.secret, None)
+
+        self.assertEqual('cypher0',
+                         self.declared.obj.decrypt.call_args[0][0])
+
+    def test_should_decrypt_batch_with_each_secrets_datum(self):
+        csv_secret = Secret({'mime_type': 'text/csv'})
+        self._add_datum(csv_secret, 'application/octet-stream')
+        self._add_datum(csv_secret, 'text/csv')
+        self._add_datum(self.secret, 'text/csv')
+        self._add_datum(self.secret, 'application/octet-stream')
+        self.declared.obj.decrypt_batch.side_effect = lambda data, tenant: [
+            'declared'] * len(data)
+        self.undeclared.obj.decrypt_batch.side_effect = lambda data, tenant: [
+            'undeclared'] * len(data)
+
+        self.assertEqual(['declared', 'undeclared'],
+                         self.manager.decrypt_batch(
+                             [self.secret, csv_secret], None))
+        encrypted_list = self.undeclared.obj.decrypt_batch.call_args[0][0]
+        self.assertEqual('cypher1', encrypted_list[0][0])
+
+    def test_should_raise_accept_not_supported_without_datum(self):
+        self._add_datum(self.secret, 'application/octet-stream')
+
+        self.assertRaises(em.CryptoAcceptNotSupportedException,
+                          self.manager.decrypt, 'text/csv', self.secret, None)
+
+
+class WhenGettingSharedCryptoExtensionManager(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.object(em, '_MANAGER', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_should_create_one_manager_per_process(self):
+        with patch.object(em, 'CryptoExtensionManager') as manager_class:
+            first = em.get_manager()
+            second = em.get_manager()
+
+        self.assertIs(first, second)
+        manager_class.assert_called_once_with()
@@ -13,11 +13,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from Crypto.Cipher import AES
 from Crypto import Random
 from mock import MagicMock
 import unittest
 
+from barbican.common import exception
+from barbican.crypto import plugin
 from barbican.crypto.plugin import CryptoPluginBase, SimpleCryptoPlugin
+from barbican.model.models import Tenant
 from barbican.openstack.common import jsonutils as json
 
 
@@ -42,7 +46,9 @@ class TestCryptoPlugin(CryptoPluginBase):
 class WhenTestingSimpleCryptoPlugin(unittest.TestCase):
 
     def setUp(self):
-        self.plugin = SimpleCryptoPlugin()
+        self.plugin = SimpleCryptoPlugin(tenant_kek_repo=MagicMock())
+        self.plugin.tenant_kek_repo.find_by_tenant_id.return_value = None
+        self.tenant = MagicMock()
 
     def test_pad_binary_string(self):
         binary_string = b'some_binary_string'
@@ -75,20 +81,87 @@ class WhenTestingSimpleCryptoPlugin(unittest.TestCase):
         secret = MagicMock()
         secret.mime_type = 'text/plain'
         with self.assertRaises(ValueError):
-            self.plugin.encrypt(unencrypted, MagicMock())
+            self.plugin.encrypt(unencrypted, self.tenant)
 
     def test_byte_string_encryption(self):
         unencrypted = b'some_secret'
-        encrypted, kek_metadata = self.plugin.encrypt(unencrypted, MagicMock())
-        decrypted = self.plugin.decrypt(encrypted, kek_metadata, MagicMock())
+        encrypted, kek_metadata = self.plugin.encrypt(unencrypted, self.tenant)
+        decrypted = self.plugin.decrypt(encrypted, kek_metadata, self.tenant)
         self.assertEqual(unencrypted, decrypted)
 
     def test_random_bytes_encryption(self):
         unencrypted = Random.get_random_bytes(10)
-        encrypted, kek_metadata = self.plugin.encrypt(unencrypted, MagicMock())
-        decrypted = self.plugin.decrypt(encrypted, kek_metadata, MagicMock())
+        encrypted, kek_metadata = self.plugin.encrypt(unencrypted, self.tenant)
+        decrypted = self.plugin.decrypt(encrypted, kek_metadata, self.tenant)
         self.assertEqual(unencrypted, decrypted)
 
+    def test_encrypt_batch(self):
+        unencrypted_list = [b'first', b'second', Random.get_random_bytes(10)]
+        results = self.plugin.encrypt_batch(unencrypted_list, self.tenant)
+
+        self.assertEqual(len(unencrypted_list), len(results))
+        for unencrypted, (encrypted, kek_metadata) in zip(unencrypted_list,
+                                                         results):
+            self.assertEqual(unencrypted, self.plugin.decrypt(
+                encrypted, kek_metadata, self.tenant))
+
+    def test_encrypt_stream(self):
+        chunks = [b'first', Random.get_random_bytes(21), b'', b'last']
+        encrypted, kek_metadata = self.plugin.encrypt_stream(iter(chunks),
+                                                             self.tenant)
+        self.assertEqual(b''.join(chunks), self.plugin.decrypt(
+            encrypted, kek_metadata, self.tenant))
+
+    def test_decrypt_stream(self):
+        encrypted, kek_metadata = self.plugin.encrypt(b'some_secret',
+                                                      self.tenant)
+        decrypted = self.plugin.decrypt_stream(encrypted, kek_metadata,
+                                               self.tenant)
+        self.assertEqual(b'secret', ''.join(decrypted.iter_range(5, 11, 4)))
+
+    def test_encrypt_stream_unicode_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            self.plugin.encrypt_stream([b'bytes', u'unicode'], self.tenant)
+
+    def test_encrypt_batch_unicode_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            self.plugin.encrypt_batch([b'bytes', u'unicode'], self.tenant)
+
+    def test_encrypt_with_static_kek_metadata(self):
+        _, first = self.plugin.encrypt(b'first', self.tenant)
+        _, second = self.plugin.encrypt(b'second', self.tenant)
+        self.assertIs(first, second)
+        self.assertEqual('aes-ctr-hmac-sha256',
+                         json.loads(first)['encryption'])
+
+    def test_decrypt_legacy_cbc_secret(self):
+        cbc = plugin.AESCBCEngine(self.plugin.kek)
+        kek_metadata = json.dumps({'plugin': 'SimpleCryptoPlugin',
+                                   'encryption': 'aes-128-cbc',
+                                   'kek': 'kek_id'})
+        encrypted = cbc.encrypt(b'legacy')
+        decrypted = self.plugin.decrypt(encrypted, kek_metadata, self.tenant)
+        self.assertEqual(b'legacy', decrypted)
+
+    def test_decrypt_tampered_data_raises_value_error(self):
+        encrypted, kek_metadata = self.plugin.encrypt(b'some_secret',
+                                                      MagicMock())
+        tampered = encrypted[:10] + chr(ord(encrypted[10]) ^ 1) + \
+            encrypted[11:]
+        with self.assertRaises(ValueError):
+            self.plugin.decrypt(tampered, kek_metadata, self.tenant)
+
+    def test_decrypt_unknown_engine_raises_value_error(self):
+        kek_metadata = json.dumps({'encryption': 'rot13'})
+        with self.assertRaises(ValueError):
+            self.plugin.decrypt(b'data', kek_metadata, self.tenant)
+
+    def test_unknown_configured_engine_raises_value_error(self):
+        conf = MagicMock()
+        conf.simple_crypto_plugin.encryption_engine = 'rot13'
+        with self.assertRaises(ValueError):
+            SimpleCryptoPlugin(conf)
+
     def test_create_256_bit_key(self):
         key = self.plugin.create("aes", 256)
         self.assertEqual(len(key), 32)
@@ -101,6 +174,165 @@ class WhenTestingSimpleCryptoPlugin(unittest.TestCase):
         key = self.plugin.create("aes", 128)
         self.assertEqual(len(key), 16)
 
+    def test_create_random_keys(self):
+        self.assertNotEqual(self.plugin.create("aes", 256),
+                            self.plugin.create("aes", 256))
+
     def test_create_unsupported_bit_key(self):
         with self.assertRaises(ValueError):
             self.plugin.create("aes", 129)
+
+
+class WhenTestingSimpleCryptoPluginTenantKEKs(unittest.TestCase):
+
+    def setUp(self):
+        self.tenant_keks = {}
+        self.tenant_kek_repo = MagicMock()
+        self.tenant_kek_repo.find_by_tenant_id.side_effect = \
+            lambda tenant_id, plugin_name, **kwargs: \
+            self.tenant_keks.get((tenant_id, plugin_name))
+        self.tenant_kek_repo.create_from.side_effect = self._create_from
+
+        self.plugin = SimpleCryptoPlugin(tenant_kek_repo=self.tenant_kek_repo)
+        self.tenant = self._tenant('tenant1')
+
+    def _create_from(self, tenant_kek):
+        key = (tenant_kek.tenant_id, tenant_kek.plugin_name)
+        if key in self.tenant_keks:
+            raise exception.Duplicate()
+        self.tenant_keks[key] = tenant_kek
+
+    def _tenant(self, tenant_id):
+        tenant = Tenant()
+        tenant.id = tenant_id
+        return tenant
+
+    def test_should_create_wrapped_kek_for_new_tenant(self):
+        _, kek_metadata = self.plugin.encrypt(b'secret', self.tenant)
+
+        self.assertEqual('tenant_kek', json.loads(kek_metadata)['kek'])
+        tenant_kek = self.tenant_keks[('tenant1', 'SimpleCryptoPlugin')]
+        self.assertEqual(self.plugin.kek_metadata, tenant_kek.wrap_metadata)
+        self.assertEqual(len(self.plugin.kek), len(
+            self.plugin.engine.decrypt(tenant_kek.wrapped_kek)))
+
+    def test_should_round_trip_with_tenant_kek(self):
+        encrypted, kek_metadata = self.plugin.encrypt(b'secret', self.tenant)
+        self.assertEqual(b'secret', self.plugin.decrypt(
+            encrypted, kek_metadata, self.tenant))
+
+    def test_should_not_decrypt_with_other_tenant_kek(self):
+        encrypted, kek_metadata = self.plugin.encrypt(b'secret', self.tenant)
+        with self.assertRaises(ValueError):
+            self.plugin.decrypt(encrypted, kek_metadata,
+                                self._tenant('tenant2'))
+
+    def test_should_not_decrypt_tenant_data_without_tenant(self):
+        encrypted, kek_metadata = self.plugin.encrypt(b'secret', self.tenant)
+        with self.assertRaises(ValueError):
+            self.plugin.decrypt(encrypted, kek_metadata, None)
+
+    def test_should_use_master_kek_without_tenant(self):
+        encrypted, kek_metadata = self.plugin.encrypt(b'secret', None)
+
+        self.assertIs(self.plugin.kek_metadata, kek_metadata)
+        self.assertEqual(b'secret', self.plugin.engine.decrypt(encrypted))
+        self.assertFalse(self.tenant_kek_repo.find_by_tenant_id.called)
+
+    def test_should_cache_unwrapped_tenant_kek(self):
+        self.plugin.encrypt(b'first', self.tenant)
+        self.plugin.encrypt_batch([b'second', b'third'], self.tenant)
+
+        self.assertEqual(1, self.tenant_kek_repo.find_by_tenant_id.call_count)
+
+    def test_should_unwrap_stored_tenant_kek_after_cache_expiry(self):
+        encrypted, kek_metadata = self.plugin.encrypt(b'secret', self.tenant)
+        self.plugin.tenant_kek_cache.clear()
+
+        self.assertEqual(b'secret', self.plugin.decrypt(
+            encrypted, kek_metadata, self.tenant))
+        self.assertEqual(1, len(self.tenant_keks))
+
+    def test_should_use_concurrently_created_tenant_kek(self):
+        other_plugin = SimpleCryptoPlugin(
+            tenant_kek_repo=self.tenant_kek_repo)
+        encrypted, kek_metadata = other_plugin.encrypt(b'secret', self.tenant)
+        self.tenant_kek_repo.find_by_tenant_id.side_effect = [
+            None, self.tenant_keks[('tenant1', 'SimpleCryptoPlugin')]]
+
+        self.assertEqual(b'secret', self.plugin.decrypt(
+            encrypted, kek_metadata, self.tenant))
+
+
+class WhenTestingEncryptionEngines(unittest.TestCase):
+
+    def setUp(self):
+        self.key = b'sixteen_byte_key'
+
+    def test_engines_round_trip_all_lengths(self):
+        for engine_class in plugin.ENCRYPTION_ENGINES.values():
+            engine = engine_class(self.key)
+            for length in (0, 1, 15, 16, 17, 1000):
+                unencrypted = Random.get_random_bytes(length)
+                self.assertEqual(unencrypted,
+                                 engine.decrypt(engine.encrypt(unencrypted)))
+
+    def test_engines_encrypt_chunks_as_if_joined(self):
+        unencrypted = Random.get_random_bytes(100)
+        for engine_class in plugin.ENCRYPTION_ENGINES.values():
+            engine = engine_class(self.key)
+            for chunk_size in (1, 7, 16, 33, 100):
+                chunks = [unencrypted[i:i + chunk_size]
+                          for i in xrange(0, len(unencrypted), chunk_size)]
+                self.assertEqual(unencrypted, engine.decrypt(
+                    engine.encrypt_chunks(chunks)))
+
+    def test_engines_decrypt_stream_by_range(self):
+        unencrypted = Random.get_random_bytes(100)
+        for engine_class in plugin.ENCRYPTION_ENGINES.values():
+            engine = engine_class(self.key)
+            decrypted = engine.decrypt_stream(engine.encrypt(unencrypted))
+            self.assertEqual(100, decrypted.length)
+            for start, stop, chunk_size in ((0, 100, 16), (0, 100, 7),
+                                            (3, 50, 16), (17, 18, 1),
+                                            (99, 100, 64), (5, 5, 16)):
+                self.assertEqual(unencrypted[start:stop], ''.join(
+                    decrypted.iter_range(start, stop, chunk_size)))
+
+    def test_ctr_engine_authenticates_before_streaming(self):
+        engine = plugin.AESCTRHMACEngine(self.key)
+        encrypted = engine.encrypt(b'some_secret')
+        tampered = encrypted[:-1] + chr(ord(encrypted[-1]) ^ 1)
+        self.assertRaises(ValueError, engine.decrypt_stream, tampered)
+
+    def test_ctr_engine_does_not_pad(self):
+        engine = plugin.AESCTRHMACEngine(self.key)
+        encrypted = engine.encrypt(b'some_secret')
+        self.assertEqual(len(b'some_secret') + engine.nonce_size +
+                         engine.tag_size, len(encrypted))
+
+    def test_ctr_engine_uses_unique_nonces(self):
+        engine = plugin.AESCTRHMACEngine(self.key)
+        self.assertNotEqual(engine.encrypt(b'same'), engine.encrypt(b'same'))
+
+    def test_ctr_engine_uses_96_bit_nonces_and_32_bit_block_counters(self):
+        engine = plugin.AESCTRHMACEngine(self.key)
+        encrypted = engine.encrypt(b'\0' * 2 * AES.block_size)
+        nonce = encrypted[:12]
+        key_stream = encrypted[12:-engine.tag_size]
+
+        block_cipher = AES.new(engine.enc_key, AES.MODE_ECB)
+        self.assertEqual(block_cipher.encrypt(nonce + b'\0\0\0\0') +
+                         block_cipher.encrypt(nonce + b'\0\0\0\1'),
+                         key_stream)
+
+    def test_ctr_engine_rejects_truncated_data(self):
+        engine = plugin.AESCTRHMACEngine(self.key)
+        with self.assertRaises(ValueError):
+            engine.decrypt(b'short')
+
+    def test_ctr_engine_rejects_data_for_other_key(self):
+        encrypted = plugin.AESCTRHMACEngine(self.key).encrypt(b'secret')
+        other = plugin.AESCTRHMACEngine(b'another_16b_key!')
+        with self.assertRaises(ValueError):
+            other.decrypt(encrypted)
@@ -0,0 +1,323 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from mock import MagicMock, patch
+import sqlalchemy
+import sqlalchemy.orm as sa_orm
+import threading
+import unittest
+
+from datetime import datetime
+from barbican.common import exception
+from barbican.model import models
+from barbican.model import repositories as repo
+
+
+class WhenEncodingPagingMarkers(unittest.TestCase):
+    def setUp(self):
+        self.secret = models.Secret({'mime_type': 'text/plain'})
+        self.secret.id = 'c6e1b5d4-7f6c-4a0f-9c1e-2b1f0f2a1c3d'
+        self.secret.created_at = datetime(2013, 6, 1, 12, 30, 15, 1234)
+
+    def test_should_round_trip_marker(self):
+        marker = repo.encode_marker(self.secret)
+
+        created_at, entity_id, before = repo.decode_marker(marker)
+
+        self.assertEqual(self.secret.created_at, created_at)
+        self.assertEqual(self.secret.id, entity_id)
+        self.assertFalse(before)
+
+    def test_should_round_trip_backward_marker(self):
+        marker = repo.encode_marker(self.secret, before=True)
+
+        created_at, entity_id, before = repo.decode_marker(marker)
+
+        self.assertEqual(self.secret.created_at, created_at)
+        self.assertEqual(self.secret.id, entity_id)
+        self.assertTrue(before)
+
+    def test_should_produce_url_safe_marker(self):
+        marker = repo.encode_marker(self.secret)
+
+        for char in '=+/&?':
+            self.assertNotIn(char, marker)
+
+    def test_should_raise_invalid_on_malformed_marker(self):
+        with self.assertRaises(exception.Invalid):
+            repo.decode_marker('not-a-marker')
+
+
+class WhenPagingOrdersWithMarkers(unittest.TestCase):
+    def setUp(self):
+        engine = sqlalchemy.create_engine('sqlite://')
+        models.register_models(engine)
+        self.session = sa_orm.sessionmaker(bind=engine, autocommit=True,
+                                           expire_on_commit=False)()
+
+        with self.session.begin():
+            tenant = models.Tenant()
+            tenant.keystone_id = 'keystone1234'
+            self.session.add(tenant)
+            self.session.flush()
+            self.orders = []
+            for index in xrange(5):
+                order = models.Order()
+                order.tenant_id = tenant.id
+                order.secret_mime_type = 'text/plain'
+                # Two orders share a created_at, so ids break the tie.
+                order.created_at = datetime(2013, 6, 1, 12, 0, index // 2)
+                self.session.add(order)
+                self.orders.append(order)
+        self.orders.sort(key=lambda order: (order.created_at, order.id))
+
+        self.order_repo = repo.OrderRepo()
+        self.order_repo.get_session = lambda session=None: self.session
+
+    def _get_page(self, marker):
+        orders, offset, limit = self.order_repo.get_by_create_date(
+            'keystone1234', limit_arg=2, marker_arg=marker)
+        return orders
+
+    def test_should_get_page_after_marker(self):
+        marker = repo.encode_marker(self.orders[1])
+
+        self.assertEqual(self.orders[2:4], self._get_page(marker))
+
+    def test_should_get_page_before_marker_in_ascending_order(self):
+        marker = repo.encode_marker(self.orders[3], before=True)
+
+        self.assertEqual(self.orders[1:3], self._get_page(marker))
+
+    def test_should_get_short_page_before_marker_near_start(self):
+        marker = repo.encode_marker(self.orders[1], before=True)
+
+        self.assertEqual(self.orders[:1], self._get_page(marker))
+
+
+class WhenGettingSharedRepositories(unittest.TestCase):
+    def test_should_return_same_instance(self):
+        self.assertIs(repo.get_secret_repository(),
+                      repo.get_secret_repository())
+        self.assertIs(repo.get_order_repository(),
+                      repo.get_repository(repo.OrderRepo))
+
+    def test_should_not_configure_db_on_construction(self):
+        with patch.object(repo, 'configure_db') as mock_configure:
+            repo.TenantRepo()
+            repo.OrderRepo()
+
+        self.assertFalse(mock_configure.called)
+
+
+class WhenBulkCreatingEntities(unittest.TestCase):
+    def setUp(self):
+        self.session = MagicMock()
+        self.secret_repo = repo.SecretRepo()
+        self.secrets = [models.Secret({'mime_type': 'text/plain'})
+                        for _ in range(3)]
+
+    def test_should_assign_ids_and_flush_once(self):
+        self.secret_repo.create_all_from(self.secrets, self.session)
+
+        self.assertEqual(3, len(set(s.id for s in self.secrets)))
+        self.session.add_all.assert_called_once_with(self.secrets)
+        self.session.flush.assert_called_once_with()
+        self.assertFalse(self.session.begin.called)
+
+    def test_should_reject_entities_with_ids(self):
+        self.secrets[1].id = 'existing-id'
+
+        with self.assertRaises(exception.Invalid):
+            self.secret_repo.create_all_from(self.secrets, self.session)
+
+    def test_should_raise_duplicate_on_integrity_error(self):
+        self.session.flush.side_effect = sqlalchemy.exc.IntegrityError(
+            'statement', 'params', 'orig')
+
+        with self.assertRaises(exception.Duplicate):
+            self.secret_repo.create_all_from(self.secrets, self.session)
+
+
+class WhenConfiguringConnectionPool(unittest.TestCase):
+    def tearDown(self):
+        for opt in ('sql_pool_class', 'sql_pool_size', 'sql_max_overflow',
+                    'sql_pool_timeout'):
+            repo.CONF.clear_override(opt)
+
+    def test_should_pass_configured_pool_args(self):
+        repo.CONF.set_override('sql_pool_class', 'QueuePool')
+        repo.CONF.set_override('sql_pool_size', 20)
+        repo.CONF.set_override('sql_max_overflow', 5)
+        repo.CONF.set_override('sql_pool_timeout', 3)
+
+        pool_args = repo._get_pool_args()
+
+        self.assertIs(sqlalchemy.pool.QueuePool, pool_args['poolclass'])
+        self.assertEqual(20, pool_args['pool_size'])
+        self.assertEqual(5, pool_args['max_overflow'])
+        self.assertEqual(3, pool_args['pool_timeout'])
+
+    def test_should_leave_pool_defaults_if_not_configured(self):
+        self.assertEqual({}, repo._get_pool_args())
+
+    def test_should_raise_invalid_for_unknown_pool_class(self):
+        repo.CONF.set_override('sql_pool_class', 'BogusPool')
+
+        with self.assertRaises(exception.Invalid):
+            repo._get_pool_args()
+
+    def test_should_raise_disconnection_error_on_failed_ping(self):
+        dbapi_conn = MagicMock()
+        dbapi_conn.cursor.return_value.execute.side_effect = Exception()
+
+        with self.assertRaises(sqlalchemy.exc.DisconnectionError):
+            repo.ping_listener(dbapi_conn, MagicMock(), MagicMock())
+
+
+class WhenTrackingPoolStats(unittest.TestCase):
+    def setUp(self):
+        stats = dict((name, 0) for name in repo._POOL_STATS)
+        patcher = patch.object(repo, '_POOL_STATS', stats)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.pool = MagicMock(spec=sqlalchemy.pool.QueuePool)
+        self.pool.size.return_value = 5
+        engine = MagicMock()
+        engine.pool = self.pool
+        patcher = patch.object(repo, '_ENGINE', engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(repo.CONF.clear_override, 'sql_max_overflow')
+
+    def _checkout(self, checked_out):
+        self.pool.checkedout.return_value = checked_out
+        repo.pool_stats_listener(MagicMock(), MagicMock(), MagicMock())
+        return repo.get_pool_stats()
+
+    def test_should_count_saturation_against_configured_overflow(self):
+        repo.CONF.set_override('sql_max_overflow', 2)
+
+        self.assertEqual(0, self._checkout(6)['saturated_checkouts'])
+        stats = self._checkout(7)
+
+        self.assertEqual(2, stats['checkouts'])
+        self.assertEqual(2, stats['overflow_checkouts'])
+        self.assertEqual(1, stats['saturated_checkouts'])
+
+    def test_should_use_default_overflow_if_not_configured(self):
+        self.assertEqual(0, self._checkout(14)['saturated_checkouts'])
+        self.assertEqual(1, self._checkout(15)['saturated_checkouts'])
+
+    def test_should_count_checkouts_from_many_threads(self):
+        self.pool.checkedout.return_value = 1
+
+        def checkout():
+            for _ in xrange(1000):
+                repo.pool_stats_listener(None, None, None)
+
+        threads = [threading.Thread(target=checkout) for _ in xrange(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(4000, repo.get_pool_stats()['checkouts'])
+
+
+class WhenTrackingQueries(unittest.TestCase):
+    def setUp(self):
+        self.conn = MagicMock()
+        self.statement = 'SELECT * FROM secrets WHERE id = ?'
+
+    def tearDown(self):
+        for opt in ('sql_slow_query_ms', 'sql_repeated_query_threshold'):
+            repo.CONF.clear_override(opt)
+
+    def _execute(self, statement=None, elapsed=0.002, failed=False):
+        context = MagicMock()
+        listeners = [repo.query_start_listener]
+        if not failed:
+            # A failed statement raises before its end event.
+            listeners.append(repo.query_end_listener)
+        with patch.object(repo.time, 'time', side_effect=[1000.0,
+                                                          1000.0 + elapsed]):
+            for listener in listeners:
+                listener(self.conn, MagicMock(), statement or self.statement,
+                         (), context, False)
+
+    def test_should_count_statements_and_time(self):
+        with repo.track_queries('outer') as outer:
+            self._execute()
+            with repo.track_queries('inner') as inner:
+                self._execute(elapsed=0.003)
+
+        self.assertEqual(2, outer.count)
+        self.assertAlmostEqual(0.005, outer.elapsed)
+        self.assertEqual(1, inner.count)
+        self._execute()
+        self.assertEqual(2, outer.count)
+
+    def test_should_warn_of_repeated_statements(self):
+        repo.CONF.set_override('sql_repeated_query_threshold', 3)
+
+        with patch.object(repo.LOG, 'warning') as mock_warning:
+            with repo.track_queries('request'):
+                for _ in range(3):
+                    self._execute()
+                self._execute('SELECT 1')
+
+        self.assertEqual(1, mock_warning.call_count)
+        self.assertEqual(3, mock_warning.call_args[0][1]['count'])
+
+    def test_should_log_slow_statements_without_parameters(self):
+        repo.CONF.set_override('sql_slow_query_ms', 100)
+
+        with patch.object(repo.SLOW_QUERY_LOG, 'warning') as mock_warning:
+            with repo.track_queries('request'):
+                self._execute(elapsed=0.05)
+                self._execute(elapsed=0.25)
+
+        self.assertEqual(1, mock_warning.call_count)
+        values = mock_warning.call_args[0][1]
+        self.assertEqual('request', values['name'])
+        self.assertEqual(self.statement, values['statement'])
+
+    def test_should_not_pair_later_statements_with_a_failed_one(self):
+        with repo.track_queries('request') as tracker:
+            self._execute(elapsed=5.0, failed=True)
+            self._execute(elapsed=0.003)
+
+        self.assertEqual(1, tracker.count)
+        self.assertAlmostEqual(0.003, tracker.elapsed)
+
+    def test_should_time_statements_after_a_failed_one_on_an_engine(self):
+        engine = sqlalchemy.create_engine('sqlite://')
+        for event, listener in (('before_cursor_execute',
+                                 repo.query_start_listener),
+                                ('after_cursor_execute',
+                                 repo.query_end_listener)):
+            sqlalchemy.event.listen(engine, event, listener)
+        engine.execute('CREATE TABLE test (id INTEGER PRIMARY KEY)')
+        engine.execute('INSERT INTO test VALUES (1)')
+
+        with repo.track_queries('request') as tracker:
+            with self.assertRaises(sqlalchemy.exc.IntegrityError):
+                engine.execute('INSERT INTO test VALUES (1)')
+            engine.execute('SELECT id FROM test')
+
+        self.assertEqual(1, tracker.count)
+        self.assertTrue(0 <= tracker.elapsed < 1)
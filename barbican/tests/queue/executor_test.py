@@ -0,0 +1,108 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from mock import MagicMock, patch
+import threading
+import unittest
+
+from barbican.common import exception
+from barbican.queue.executor import pool
+from barbican.queue.executor import resources
+
+
+class WhenUsingWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = pool.WorkerPool(1, 1, submit_timeout=0.01, name='test')
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.pool.shutdown(timeout=5)
+
+    def _block(self):
+        self.started.set()
+        self.release.wait(5)
+
+    def test_should_run_submitted_work(self):
+        done = threading.Event()
+        self.pool.submit(done.set)
+
+        self.assertTrue(done.wait(5))
+
+    def test_should_reject_work_when_queue_full(self):
+        self.pool.submit(self._block)
+        self.assertTrue(self.started.wait(5))
+        self.pool.submit(self._block)
+
+        with self.assertRaises(exception.ServiceUnavailable):
+            self.pool.submit(self._block)
+
+        self.assertEqual(1, self.pool.stats()['rejected'])
+
+    def test_should_drain_queued_work_on_shutdown(self):
+        work = MagicMock()
+        self.pool.submit(self._block)
+        self.pool.submit(work, 'arg', key='value')
+        self.release.set()
+
+        self.assertTrue(self.pool.shutdown(timeout=5))
+
+        work.assert_called_once_with('arg', key='value')
+        self.assertEqual(2, self.pool.stats()['completed'])
+
+    def test_should_reject_work_after_shutdown(self):
+        self.pool.shutdown()
+
+        with self.assertRaises(exception.ServiceUnavailable):
+            self.pool.submit(MagicMock())
+
+    def test_should_count_failed_work(self):
+        self.pool.submit(MagicMock(side_effect=ValueError()))
+
+        self.assertTrue(self.pool.shutdown(timeout=5))
+        self.assertEqual(1, self.pool.stats()['failed'])
+
+    def test_should_restart_workers_after_fork(self):
+        self.pool.submit(MagicMock())
+        parent_workers = list(self.pool._workers)
+
+        with patch('os.getpid', return_value=-1):
+            done = threading.Event()
+            self.pool.submit(done.set)
+            self.assertTrue(done.wait(5))
+            self.assertNotEqual(parent_workers, self.pool._workers)
+            self.pool.shutdown(timeout=5)
+
+
+class WhenProcessingOrdersWithExecutor(unittest.TestCase):
+
+    def test_should_submit_order_to_pool(self):
+        mock_pool = MagicMock()
+
+        with patch.object(resources, 'get_pool', return_value=mock_pool):
+            resources.process_order('order1', 'keystone1')
+
+        mock_pool.submit.assert_called_once_with(resources._process_order,
+                                                 'order1', 'keystone1')
+
+    def test_should_process_order_with_shared_task(self):
+        task = MagicMock()
+
+        with patch.object(resources, '_get_begin_order', return_value=task):
+            resources._process_order('order1', 'keystone1')
+
+        task.process.assert_called_once_with('order1', 'keystone1')
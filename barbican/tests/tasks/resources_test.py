@@ -13,15 +13,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from mock import MagicMock
+import contextlib
+from mock import MagicMock, patch
 import json
 import unittest
 
-from datetime import datetime
+from datetime import datetime, timedelta
+import sqlalchemy
+import sqlalchemy.orm as sa_orm
+
 from barbican.crypto.extension_manager import CryptoExtensionManager
 from barbican.tasks.resources import BeginOrder
+from barbican.model import models
 from barbican.model.models import (Tenant, Secret, TenantSecret,
                                    EncryptedDatum, Order, States)
+from barbican.model import repositories
 from barbican.model.repositories import OrderRepo
 from barbican.common import config
 from barbican.common import exception
@@ -117,5 +123,265 @@ class WhenBeginningOrder(unittest.TestCase):
         assert datum.kek_metadata is not None
 
 
+class WhenBeginningOrderBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime(2013, 6, 1, 12, 0, 0)
+        timeutils.set_time_override(self.now)
+        self.addCleanup(timeutils.clear_time_override)
+
+        self.tenants = {}
+        for tenant_id in ('tenant1', 'tenant2'):
+            tenant = Tenant()
+            tenant.id = tenant_id
+            self.tenants[tenant_id] = tenant
+        self.tenant_repo = MagicMock()
+        self.tenant_repo.get.side_effect = \
+            lambda tenant_id, session: self.tenants[tenant_id]
+
+        self.orders = [self._create_order('order1', 'tenant1'),
+                       self._create_order('order2', 'tenant2'),
+                       self._create_order('order3', 'tenant1')]
+
+        self.events = []
+
+        @contextlib.contextmanager
+        def begin():
+            self.events.append('begin')
+            yield
+            self.events.append('commit')
+
+        def get_pending(limit, stale_before=None, order_id=None,
+                        session=None):
+            self.events.append('claim')
+            return [order for order in self.orders
+                    if order.status == States.PENDING and
+                    order_id in (None, order.id)][:limit]
+
+        self.session = MagicMock()
+        self.session.begin.side_effect = begin
+        self.order_repo = MagicMock()
+        self.order_repo.get_session.return_value = self.session
+        self.order_repo.get_pending.side_effect = get_pending
+
+        def assign_ids(entities, session):
+            self.events.append('write')
+            for entity in entities:
+                entity.id = 'secret-{0}'.format(entity.name)
+            return entities
+
+        self.secret_repo = MagicMock()
+        self.secret_repo.create_all_from.side_effect = assign_ids
+        self.tenant_secret_repo = MagicMock()
+        self.datum_repo = MagicMock()
+
+        self.conf = MagicMock()
+        self.conf.crypto.namespace = 'barbican.test.crypto.plugin'
+        self.conf.crypto.enabled_crypto_plugins = ['test_crypto']
+        self.crypto_mgr = CryptoExtensionManager(conf=self.conf)
+        generate_keys = self.crypto_mgr.generate_data_encryption_keys
+
+        def generate_data_encryption_keys(secrets, tenant):
+            self.events.append('crypto')
+            return generate_keys(secrets, tenant)
+
+        self.crypto_mgr.generate_data_encryption_keys = \
+            generate_data_encryption_keys
+
+        self.resource = BeginOrder(self.crypto_mgr,
+                                   self.tenant_repo, self.order_repo,
+                                   self.secret_repo, self.tenant_secret_repo,
+                                   self.datum_repo)
+
+    def _create_order(self, order_id, tenant_id):
+        order = Order()
+        order.id = order_id
+        order.tenant_id = tenant_id
+        order.status = States.PENDING
+        order.secret_name = 'name-{0}'.format(order_id)
+        order.secret_algorithm = 'aes'
+        order.secret_bit_length = 128
+        order.secret_mime_type = 'text/plain'
+        return order
+
+    def test_should_process_pending_orders(self):
+        processed = self.resource.process_batch(limit=10)
+
+        self.assertEqual(3, processed)
+        self.order_repo.get_pending.assert_called_once_with(
+            10, stale_before=self.now - timedelta(seconds=600),
+            session=self.session)
+        self.assertEqual(2, self.tenant_repo.get.call_count)
+
+        for order in self.orders:
+            self.assertEqual(States.ACTIVE, order.status)
+            self.assertEqual('secret-name-{0}'.format(order.id),
+                             order.secret_id)
+
+        for call in self.datum_repo.create_all_from.call_args_list:
+            datums, session = call[0]
+            self.assertIs(self.session, session)
+            for datum in datums:
+                self.assertIsInstance(datum, EncryptedDatum)
+                self.assertEqual('cypher_text', datum.cypher_text)
+
+    def test_should_claim_orders_before_crypto_work(self):
+        statuses = []
+        self.tenant_repo.get.side_effect = lambda tenant_id, session: (
+            statuses.extend(order.status for order in self.orders) or
+            self.tenants[tenant_id])
+
+        self.resource.process_batch(limit=10)
+
+        self.assertEqual([States.PROCESSING] * 3, statuses[:3])
+        for order in self.orders:
+            self.assertEqual(self.now, order.claimed_at)
+        # The claim commits before any crypto work, and each tenant's
+        #   transaction writes only once its crypto work is done.
+        self.assertEqual(['begin', 'claim', 'commit'] +
+                         ['begin', 'crypto', 'write', 'commit'] * 2,
+                         self.events)
+
+    def test_should_mark_tenant_orders_in_error_if_processing_fails(self):
+        self.tenants.pop('tenant2')
+
+        self.resource.process_batch(limit=10)
+
+        self.assertEqual(States.ERROR, self.orders[1].status)
+        self.assertEqual(States.ACTIVE, self.orders[0].status)
+        self.assertEqual(States.ACTIVE, self.orders[2].status)
+
+    def test_should_mark_order_in_error_if_secret_not_created(self):
+        self.orders[1].secret_mime_type = 'bogus'
+
+        self.resource.process_batch(limit=10)
+
+        self.assertEqual(States.ERROR, self.orders[1].status)
+        self.assertIsNone(self.orders[1].secret_id)
+        self.assertEqual(States.ACTIVE, self.orders[0].status)
+
+    def test_should_do_nothing_without_pending_orders(self):
+        self.orders[:] = []
+
+        self.assertEqual(0, self.resource.process_batch(limit=10))
+        self.assertFalse(self.secret_repo.create_all_from.called)
+
+    def test_should_process_batch_when_batch_size_configured(self):
+        config.CONF.set_override('order_batch_size', 5)
+        self.addCleanup(config.CONF.clear_override, 'order_batch_size')
+
+        self.resource.process('order1', 'keystone1234')
+
+        stale_before = self.now - timedelta(seconds=600)
+        self.assertEqual(
+            [((1,), {'stale_before': stale_before, 'order_id': 'order1',
+                     'session': self.session}),
+             ((4,), {'stale_before': stale_before, 'session': self.session})],
+            self.order_repo.get_pending.call_args_list)
+        self.assertFalse(self.order_repo.get.called)
+
+    def test_should_claim_requested_order_before_older_ones(self):
+        self.resource.process_batch(limit=2, order_id='order3')
+
+        self.assertEqual(States.ACTIVE, self.orders[2].status)
+        self.assertEqual(States.ACTIVE, self.orders[0].status)
+        self.assertEqual(States.PENDING, self.orders[1].status)
+
+    def test_should_fill_batch_if_requested_order_already_claimed(self):
+        self.orders[2].status = States.ACTIVE
+
+        processed = self.resource.process_batch(limit=2, order_id='order3')
+
+        self.assertEqual(2, processed)
+        self.assertEqual(States.ACTIVE, self.orders[0].status)
+        self.assertEqual(States.ACTIVE, self.orders[1].status)
+
+
+
+class WhenClaimingOrdersFromDatabase(unittest.TestCase):
+
+    def setUp(self):
+        engine = sqlalchemy.create_engine('sqlite://')
+        models.register_models(engine)
+        self.session = sa_orm.sessionmaker(bind=engine, autocommit=True,
+                                           expire_on_commit=False)()
+
+        self.now = datetime(2013, 6, 1, 12, 0, 0)
+        timeutils.set_time_override(self.now)
+        self.addCleanup(timeutils.clear_time_override)
+
+        with self.session.begin():
+            tenant = Tenant()
+            tenant.keystone_id = 'keystone1234'
+            self.session.add(tenant)
+            self.session.flush()
+            self.orders = []
+            for index in xrange(2):
+                order = Order()
+                order.tenant_id = tenant.id
+                order.secret_name = 'name{0}'.format(index)
+                order.secret_algorithm = 'aes'
+                order.secret_bit_length = 128
+                order.secret_mime_type = 'text/plain'
+                self.session.add(order)
+                self.orders.append(order)
+
+        order_repo = OrderRepo()
+        order_repo.get_session = lambda session=None: self.session
+
+        conf = MagicMock()
+        conf.crypto.namespace = 'barbican.test.crypto.plugin'
+        conf.crypto.enabled_crypto_plugins = ['test_crypto']
+        self.crypto_mgr = CryptoExtensionManager(conf=conf)
+
+        self.resource = BeginOrder(self.crypto_mgr,
+                                   repositories.TenantRepo(), order_repo,
+                                   repositories.SecretRepo(),
+                                   repositories.TenantSecretRepo(),
+                                   repositories.EncryptedDatumRepo())
+
+    def _crash_after_claim(self):
+        """Processes a batch whose worker dies once it has been claimed."""
+        def die(secrets, tenant):
+            raise SystemExit()
+
+        with patch.object(self.crypto_mgr, 'generate_data_encryption_keys',
+                          side_effect=die):
+            self.assertRaises(SystemExit, self.resource.process_batch,
+                              limit=10)
+
+    def test_should_claim_requested_order_before_older_ones(self):
+        self.assertEqual(1, self.resource.process_batch(
+            limit=1, order_id=self.orders[1].id))
+
+        for order in self.orders:
+            self.session.refresh(order)
+        self.assertEqual(States.PENDING, self.orders[0].status)
+        self.assertEqual(States.ACTIVE, self.orders[1].status)
+
+    def test_should_leave_orders_claimed_after_a_crash(self):
+        self._crash_after_claim()
+
+        for order in self.orders:
+            self.session.refresh(order)
+            self.assertEqual(States.PROCESSING, order.status)
+            self.assertEqual(self.now, order.claimed_at)
+
+        # Another worker does not take over a recent claim.
+        self.assertEqual(0, self.resource.process_batch(limit=10))
+
+    def test_should_reclaim_orders_after_claim_timeout(self):
+        self._crash_after_claim()
+        later = self.now + timedelta(seconds=601)
+        timeutils.set_time_override(later)
+
+        self.assertEqual(2, self.resource.process_batch(limit=10))
+
+        for order in self.orders:
+            self.session.refresh(order)
+            self.assertEqual(States.ACTIVE, order.status)
+            self.assertEqual(later, order.claimed_at)
+            self.assertIsNotNone(order.secret_id)
+
 if __name__ == '__main__':
     unittest.main()
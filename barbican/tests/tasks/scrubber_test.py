@@ -0,0 +1,145 @@
+# Copyright (c) 2013 Rackspace, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from datetime import datetime, timedelta
+import sqlalchemy
+import sqlalchemy.orm as sa_orm
+
+from barbican.model import models
+from barbican.tasks import scrubber
+
+
+class WhenScrubbingDeletedEntities(unittest.TestCase):
+    def setUp(self):
+        engine = sqlalchemy.create_engine('sqlite://')
+        models.register_models(engine)
+        self.maker = sa_orm.sessionmaker(bind=engine, autocommit=True,
+                                         expire_on_commit=False)
+        self.session = self.maker()
+
+        self.now = datetime(2013, 6, 1, 12, 0, 0)
+        self.long_ago = self.now - timedelta(days=1)
+        self.datadir = tempfile.mkdtemp()
+        scrubber.CONF.set_override('scrub_time', 3600)
+        scrubber.CONF.set_override('scrub_batch_size', 2)
+        scrubber.CONF.set_override('scrubber_datadir', self.datadir)
+
+        with self.session.begin():
+            self.tenant = models.Tenant()
+            self.tenant.keystone_id = 'keystone1234'
+            self.session.add(self.tenant)
+        self.scrubber = scrubber.Scrubber(get_session=self.maker)
+
+    def tearDown(self):
+        for opt in ('scrub_time', 'scrub_batch_size', 'scrubber_datadir'):
+            scrubber.CONF.clear_override(opt)
+        shutil.rmtree(self.datadir)
+
+    def _create_secret(self, deleted_at=None):
+        with self.session.begin():
+            secret = models.Secret({'mime_type': 'text/plain'})
+            self.session.add(secret)
+            self.session.flush()
+
+            datum = models.EncryptedDatum(secret)
+            datum.cypher_text = 'cypher\x00text'
+            assoc = models.TenantSecret()
+            assoc.tenant_id = self.tenant.id
+            assoc.secret_id = secret.id
+            self.session.add_all([datum, assoc])
+
+            if deleted_at:
+                for entity in (secret, datum):
+                    entity.deleted = True
+                    entity.deleted_at = deleted_at
+        return secret
+
+    def _create_order(self, secret=None, deleted_at=None):
+        with self.session.begin():
+            order = models.Order()
+            order.tenant_id = self.tenant.id
+            order.secret_mime_type = 'text/plain'
+            order.secret_id = secret.id if secret else None
+            if deleted_at:
+                order.deleted = True
+                order.deleted_at = deleted_at
+            self.session.add(order)
+        return order
+
+    def _count(self, model):
+        return self.session.query(model).count()
+
+    def _archived(self):
+        rows = []
+        for name in os.listdir(self.datadir):
+            with open(os.path.join(self.datadir, name)) as archive_file:
+                rows.extend(json.loads(line) for line in archive_file)
+        return rows
+
+    def test_should_purge_entities_deleted_before_scrub_time(self):
+        for _ in range(3):
+            self._create_secret(deleted_at=self.long_ago)
+        self._create_secret(deleted_at=self.now - timedelta(minutes=5))
+        self._create_secret()
+
+        purged = self.scrubber.scrub(now=self.now)
+
+        self.assertEqual({'secrets': 3, 'encrypted_data': 3,
+                          'tenant_secret': 3}, purged)
+        self.assertEqual(2, self._count(models.Secret))
+        self.assertEqual(2, self._count(models.EncryptedDatum))
+        self.assertEqual(2, self._count(models.TenantSecret))
+
+    def test_should_archive_purged_rows(self):
+        secret = self._create_secret(deleted_at=self.long_ago)
+
+        self.scrubber.scrub(now=self.now)
+
+        archived = dict((row['table'], row['row'])
+                        for row in self._archived())
+        self.assertEqual(secret.id, archived['secrets']['id'])
+        self.assertEqual(self.long_ago.isoformat(),
+                         archived['secrets']['deleted_at'])
+        self.assertEqual('cypher\x00text', base64.b64decode(
+            archived['encrypted_data']['cypher_text']))
+        self.assertEqual(secret.id, archived['tenant_secret']['secret_id'])
+
+    def test_should_keep_secrets_referenced_by_orders(self):
+        secret = self._create_secret(deleted_at=self.long_ago)
+        order = self._create_order(secret)
+
+        self.assertEqual({}, self.scrubber.scrub(now=self.now))
+
+        with self.session.begin():
+            order.deleted = True
+            order.deleted_at = self.long_ago
+        purged = self.scrubber.scrub(now=self.now)
+
+        self.assertEqual(1, purged['orders'])
+        self.assertEqual(1, purged['secrets'])
+
+    def test_should_purge_without_archiving_if_no_datadir(self):
+        scrubber.CONF.set_override('scrubber_datadir', None)
+        self._create_order(deleted_at=self.long_ago)
+
+        self.assertEqual({'orders': 1}, self.scrubber.scrub(now=self.now))
+        self.assertEqual([], os.listdir(self.datadir))